@@ -0,0 +1,19 @@
+# Generated by Django 4.2.13 on 2026-10-18 03:27
+
+from django.db import migrations, models
+import uploads.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_alter_user_account_type'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='avatar',
+            field=models.ImageField(blank=True, null=True, storage=uploads.storage.ContentAddressedStorage(), upload_to='accounts/avatars/'),
+        ),
+    ]
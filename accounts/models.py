@@ -2,6 +2,7 @@
 import uuid
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from uploads.storage import media_storage
 from visitors.models import Visitor
 
 
@@ -20,7 +21,7 @@ class User(AbstractUser):
     ACCOUNT_TYPE_CHOICES  = [('personal', 'Personal'), ('admin', 'Administrator'),]
     account_type  = models.CharField(max_length=20, choices=ACCOUNT_TYPE_CHOICES, default='admin')
     # Avatar User For profile
-    avatar = models.ImageField(upload_to="accounts/avatars/", blank=True, null=True)
+    avatar = models.ImageField(upload_to="accounts/avatars/", storage=media_storage, blank=True, null=True)
     # security field if this = True mean can logged
     is_blocked = models.BooleanField(default=False)
     visitor = models.ForeignKey(Visitor, on_delete=models.SET_NULL, null=True, blank=True, related_name="users")
@@ -1,7 +1,7 @@
 
 from django.urls import path
 from .views import (
-        AdminCreateUserView, AdminUpdateUserView, UserListView, UserDeleteView, CustomLoginView, UserDetailView,
+        AdminCreateUserView, AdminUpdateUserView, UserListView, UserExportView, UserDeleteView, CustomLoginView, UserDetailView,
         PersonalRegisterView, ProfileView, ToggleStatusUser
     )
 from rest_framework_simplejwt.views import (TokenObtainPairView, TokenRefreshView,)
@@ -17,6 +17,7 @@ urlpatterns = [
 
     # Urls User in admin panel  
     path('ad/users/', UserListView.as_view(), name='user-list'),
+    path('ad/users/export/', UserExportView.as_view(), name='user-export'),
     path('ad/user/new/', AdminCreateUserView.as_view(), name='admin-create-user'),
     path('ad/user/<uuid:pk>/delete/', UserDeleteView.as_view(), name='user-delete'),
     path('ad/user/<uuid:pk>/update/', AdminUpdateUserView.as_view(), name='user-update'),
@@ -5,6 +5,7 @@ from rest_framework import generics, status, filters
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from accounts.paginations import CustomPagination
+from utils.exports import ExportMixin
 from rest_framework_simplejwt.tokens import RefreshToken
 
 from django_filters.rest_framework import DjangoFilterBackend
@@ -159,6 +160,23 @@ class UserListView(generics.ListAPIView):
 # 
 # 
 # 
+# 
+# =====================================================================================================================
+# Export of the user list with the same filters, search and ordering as UserListView.
+# Streamed as CSV or NDJSON (?output=csv|ndjson) in chunks, whatever the number of users.
+# permissions required : AUTH, ADMIN, CAN VIEW LIST USERS
+# =====================================================================================================================
+class UserExportView(ExportMixin, UserListView):
+    export_filename = 'users'
+    export_columns = [
+        ('id', 'id'), ('username', 'username'), ('email', 'email'), ('phone', 'phone'),
+        ('first_name', 'first_name'), ('last_name', 'last_name'), ('account_type', 'account_type'),
+        ('is_active', 'is_active'), ('is_staff', 'is_staff'), ('is_blocked', 'is_blocked'), ('created_at', 'created_at'),
+    ]
+# =====================================================================================================================
+# 
+# 
+# 
 #  
 # =====================================================================================================================
 # An interface for permanently deleting a user from the system.
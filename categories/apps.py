@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class CategoriesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'categories'
+
+    def ready(self):
+        # =====================================================
+        # version of the category lists (ETag / Last-Modified)
+        # =====================================================
+        import categories.signals
+        # =====================================================
@@ -0,0 +1,28 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from utils.cache import bump_cache_version
+from utils.reference import invalidate_references
+from .models import CategoryType, MainCategory, SubCategory
+
+
+# ==========================================================================================================
+# Any write on a category (or on the types of a sub category) changes the public category lists,
+# bumping the version changes their ETag and Last-Modified (see BaseClientLis),
+# and makes every process reload its copy of the table (utils/reference.py).
+# ==========================================================================================================
+@receiver(post_save, sender=CategoryType)
+@receiver(post_delete, sender=CategoryType)
+@receiver(post_save, sender=MainCategory)
+@receiver(post_delete, sender=MainCategory)
+@receiver(post_save, sender=SubCategory)
+@receiver(post_delete, sender=SubCategory)
+def invalidate_categories_cache(sender, instance, **kwargs):
+    bump_cache_version('categories')
+    invalidate_references(sender)
+
+
+@receiver(m2m_changed, sender=SubCategory.types.through)
+def invalidate_sub_category_types(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_cache_version('categories')
+# ==========================================================================================================
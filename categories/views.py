@@ -12,6 +12,8 @@ from categories.permissions import (
     CanCreateMainCategory, CanDeleteMainCategory, CanUpdateMainCategory, CanViewMainCategory,
     CanCreateSubCategory, CanDeleteSubCategory, CanUpdateSubCategory, CanViewSubCategory,
 )
+from django.db.models import Count, Max
+from utils.cache import ConditionalGetMixin, get_cache_modified, get_cache_versions
 from utils.paginations import CustomDynamicPagination
 from .models import CategoryType, MainCategory, SubCategory
 from .serializers import (
@@ -279,13 +281,26 @@ class AdminSubCategoryUpdateView(BaseAdminUpdateView):
 
 # ===========================================================================================================
 # BaseClientList: public list of active items only (status=True)
+# Polling clients get a 304 while the categories and the properties counted by the list did not change:
+# the ETag comes from the number and the latest updated_at of the items and the versions of both namespaces
 # ===========================================================================================================
-class BaseClientLis(generics.ListAPIView):
+class BaseClientLis(ConditionalGetMixin, generics.ListAPIView):
     model = None             
     serializer_class = None
     permission_classes = [AllowAny]
+    # categories: written by categories/signals.py, properties: properties_count of each item
+    conditional_namespaces = ['categories', 'properties']
+
     def get_queryset(self):
         return self.model.objects.filter(status=True)   
+
+    def get_conditional_validators(self, request):
+        totals = self.get_queryset().aggregate(count=Count('pk'), updated_at=Max('updated_at'))
+        versions = get_cache_versions(self.conditional_namespaces)
+        last_modified = get_cache_modified(self.conditional_namespaces)
+        if totals['updated_at'] is not None:
+            last_modified = max(last_modified, totals['updated_at'])
+        return [totals['count'], totals['updated_at'], *versions.values()], last_modified
 # ===========================================================================================================
 #  
 # ===========================================================================================================
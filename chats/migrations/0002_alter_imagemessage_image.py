@@ -0,0 +1,20 @@
+# Generated by Django 4.2.13 on 2026-10-18 03:27
+
+import chats.models
+from django.db import migrations, models
+import uploads.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='imagemessage',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=uploads.storage.ContentAddressedStorage(), upload_to=chats.models.image_message_upload_path),
+        ),
+    ]
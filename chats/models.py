@@ -1,6 +1,7 @@
 import uuid
 from django.db import models
 from django.conf import settings
+from uploads.storage import media_storage
 
 # ==========================================================================================================
 # This model is designed for user-to-user conversations.
@@ -129,7 +130,7 @@ def image_message_upload_path(instance, filename):
 
 class ImageMessage(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    image = models.ImageField(upload_to=image_message_upload_path, blank=True, null=True)
+    image = models.ImageField(upload_to=image_message_upload_path, storage=media_storage, blank=True, null=True)
     message = models.ForeignKey(Message, on_delete=models.CASCADE, related_name='images')
     created_at = models.DateTimeField(auto_now_add=True)
 
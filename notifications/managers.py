@@ -94,6 +94,33 @@ class NotificationManager(models.Manager):
     # 
     # 
     # =======================================================================================================
+    # The same notification for many items at once (bulk moderation of the admin): a single INSERT.
+    # items are (target_user_id, item_id, item_name), the items of the action user are skipped
+    # like in create_notification. Returns the number of notifications created.
+    # =======================================================================================================
+    def create_notifications(self, action_user, notification_type, items, type_item=None, action=None):
+        notifications = [
+            self.model(
+                target_user_id = target_user_id,
+                action_user = action_user,
+                type = notification_type,
+                type_item = type_item,
+                item_id = item_id,
+                message = self._generate_message(notification_type, {
+                    'user': action_user.username,
+                    'item_name': item_name,
+                    'action': action
+                }),
+            )
+            for target_user_id, item_id, item_name in items if target_user_id != action_user.pk
+        ]
+        self.bulk_create(notifications)
+        return len(notifications)
+    # =======================================================================================================
+    # 
+    # 
+    # 
+    # =======================================================================================================
     # Notifications are returned for a specific user when that user is the target user in the notification.
     # =======================================================================================================
     def get_user_notifications(self, user):
@@ -1,11 +1,15 @@
 from django.contrib import admin
-from .models import PriceType, Property, PropertyImage, Comment
+from .models import PriceType, Property, PropertyImage, PropertyImageVariant, Comment, PropertyImport, PropertyDailyView, PropertySimilarity
 
 # ========================================================
-#  register PriceType, Property, PropertyImage, Comment, Models
+#  register PriceType, Property, PropertyImage, PropertyImageVariant, Comment, PropertyImport, PropertyDailyView, PropertySimilarity Models
 # ========================================================
 admin.site.register(PriceType)
 admin.site.register(Property)
 admin.site.register(PropertyImage)
+admin.site.register(PropertyImageVariant)
 admin.site.register(Comment)
+admin.site.register(PropertyImport)
+admin.site.register(PropertyDailyView)
+admin.site.register(PropertySimilarity)
 # ========================================================
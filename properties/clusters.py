@@ -0,0 +1,16 @@
+import atexit
+from utils.background import RefreshQueue, run_task
+from .models import PropertyCluster
+
+
+# ==============================================================================
+# The writes schedule the refresh of the map clusters instead of running it: the geohashes
+# (old and new positions) of the committed writes are collected by the process for
+# PROPERTY_CLUSTERS_REFRESH_DELAY seconds, then one background task recomputes their cells
+# (a burst of saves in a neighbourhood costs one refresh of its cells), see RefreshQueue.
+#   cluster_refreshes.schedule([property.geohash])
+# ==============================================================================
+cluster_refreshes = RefreshQueue(PropertyCluster.refresh_cells, 'PROPERTY_CLUSTERS_REFRESH_DELAY')
+# the refreshes still waiting when the process exits normally (management commands) are run
+atexit.register(lambda: run_task(cluster_refreshes.run))
+# ==============================================================================
@@ -0,0 +1,111 @@
+from django.db.models import Count, F, Q
+from utils.cache import hash_query_params
+from .filters import PropertyFilter
+
+
+# ==============================================================================
+# Facet counts of a filtered property list (city, categories, price type, price and area ranges).
+# Each facet is counted with all the current filters except its own parameters,
+# so selecting a city still shows how many properties every other city has.
+# A foreign key facet costs one GROUP BY query, all the ranges sharing the same
+# filters are counted in a single aggregate with one conditional COUNT per range.
+# ==============================================================================
+class PropertyFacets:
+    # facet => (foreign key, label of the related row)
+    FIELD_FACETS = {
+        'city': ('city', 'city__name'),
+        'category_type': ('category_type', 'category_type__title'),
+        'main_category': ('main_category', 'main_category__title'),
+        'sub_category': ('sub_category', 'sub_category__title'),
+        'price_type': ('price_type', 'price_type__name'),
+    }
+    # facet => (field, bounds of the ranges), the last range has no upper bound
+    RANGE_FACETS = {
+        'price': ('price', [0, 250000, 500000, 1000000, 2000000, 5000000]),
+        'area': ('area', [0, 50, 100, 150, 250, 500]),
+    }
+    # facet => filter parameters ignored when counting it
+    FACET_PARAMS = {
+        'city': ('city',),
+        'category_type': ('category_type',),
+        'main_category': ('main_category',),
+        'sub_category': ('sub_category',),
+        'price_type': ('price_type',),
+        'price': ('min_price', 'max_price', 'price_range'),
+        'area': ('min_area', 'max_area'),
+    }
+
+    def __init__(self, queryset, data, request=None):
+        self.queryset = queryset
+        self.data = data
+        self.request = request
+
+    # ==========================================================================
+    # filter parameters of a facet, and the base queryset filtered with them
+    # ==========================================================================
+    def get_facet_data(self, facet):
+        data = self.data.copy()
+        for param in self.FACET_PARAMS[facet]:
+            data.pop(param, None)
+        return data
+
+    def get_facet_queryset(self, data):
+        return PropertyFilter(data, queryset=self.queryset, request=self.request).qs.order_by()
+    # ==========================================================================
+
+    # ==========================================================================
+    # number of properties per related row: [{"id", "name", "count"}], the largest first
+    # ==========================================================================
+    def count_field(self, facet):
+        field, label = self.FIELD_FACETS[facet]
+        queryset = self.get_facet_queryset(self.get_facet_data(facet))
+        rows = (
+            queryset.filter(**{f'{field}__isnull': False})
+            .values(facet_id=F(field), facet_name=F(label))
+            .annotate(count=Count('pk'))
+            .order_by('-count', 'facet_name')
+        )
+        return [{'id': row['facet_id'], 'name': row['facet_name'], 'count': row['count']} for row in rows]
+    # ==========================================================================
+
+    # ==========================================================================
+    # number of properties per range for several range facets sharing the same filters:
+    # {"price": [{"min", "max", "count"}], ...} computed in one aggregate query
+    # ==========================================================================
+    def count_ranges(self, facets, data):
+        aggregates, ranges = {}, {}
+        for facet in facets:
+            field, bounds = self.RANGE_FACETS[facet]
+            ranges[facet] = []
+            for index, lower in enumerate(bounds):
+                upper = bounds[index + 1] if index + 1 < len(bounds) else None
+                condition = Q(**{f'{field}__gte': lower})
+                if upper is not None:
+                    condition &= Q(**{f'{field}__lt': upper})
+                key = f'{facet}_{index}'
+                aggregates[key] = Count('pk', filter=condition)
+                ranges[facet].append((key, lower, upper))
+
+        totals = self.get_facet_queryset(data).aggregate(**aggregates)
+        return {
+            facet: [{'min': lower, 'max': upper, 'count': totals[key]} for key, lower, upper in items]
+            for facet, items in ranges.items()
+        }
+    # ==========================================================================
+
+    # ==========================================================================
+    # all the facets of the list
+    # ==========================================================================
+    def as_dict(self):
+        facets = {facet: self.count_field(facet) for facet in self.FIELD_FACETS}
+
+        # range facets whose own parameters are not used share the same filters and the same query
+        groups = {}
+        for facet in self.RANGE_FACETS:
+            data = self.get_facet_data(facet)
+            groups.setdefault(hash_query_params(data), (data, []))[1].append(facet)
+        for data, group in groups.values():
+            facets.update(self.count_ranges(group, data))
+        return facets
+    # ==========================================================================
+# ==============================================================================
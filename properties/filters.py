@@ -1,6 +1,11 @@
+import math
 from django_filters import rest_framework as filters
+from django.db.models import ExpressionWrapper, F, FloatField, Q
+from django.db.models.functions import Sqrt
+from rest_framework.filters import OrderingFilter
 from .models import Property
-from django.db.models import Q
+from search.models import SearchToken
+from utils.geo import KM_PER_DEGREE, bounding_box, geohash_cells, geohash_range, parse_bbox, parse_point
 
 
 # ==============================================================================
@@ -12,9 +17,9 @@ class PropertyFilter(filters.FilterSet):
     description = filters.CharFilter(field_name='description', lookup_expr='icontains')
     address = filters.CharFilter(field_name='address', lookup_expr='icontains')
     city = filters.CharFilter(field_name='city__name', lookup_expr='icontains')
-    category_type = filters.CharFilter(field_name='category_type__name', lookup_expr='icontains')
-    main_category = filters.CharFilter(field_name='main_category__name', lookup_expr='icontains')
-    sub_category = filters.CharFilter(field_name='sub_category__name', lookup_expr='icontains')
+    category_type = filters.CharFilter(field_name='category_type__title', lookup_expr='icontains')
+    main_category = filters.CharFilter(field_name='main_category__title', lookup_expr='icontains')
+    sub_category = filters.CharFilter(field_name='sub_category__title', lookup_expr='icontains')
     price_type = filters.CharFilter(field_name='price_type__name', lookup_expr='icontains')
     user = filters.CharFilter(field_name='user__username', lookup_expr='icontains')
     min_price = filters.NumberFilter(field_name='price', lookup_expr='gte')
@@ -30,6 +35,14 @@ class PropertyFilter(filters.FilterSet):
     created_at__month = filters.NumberFilter(field_name='created_at', lookup_expr='month')
     created_at__day = filters.NumberFilter(field_name='created_at', lookup_expr='day')
     price_range = filters.CharFilter(method='filter_price_range', label="نطاق السعر")
+    near = filters.CharFilter(method='filter_near', label="lat,lng (radius_km, default 10)")
+    bbox = filters.CharFilter(method='filter_bbox', label="min_lat,min_lng,max_lat,max_lng")
+
+    # parameters read by the filter methods (?search= and ?near=), not filters by themselves
+    OPTIONS = ('fuzzy', 'radius_km')
+    # radius of ?near= in kilometers: default and maximum
+    DEFAULT_RADIUS_KM = 10
+    MAX_RADIUS_KM = 200
 
     class Meta:
         model = Property
@@ -41,19 +54,51 @@ class PropertyFilter(filters.FilterSet):
             'created_at__year', 'created_at__month', 'created_at__day',           
         ]
     
+    # full-text search on the inverted index of the search app, annotates the rows with "search_rank"
+    # ?fuzzy=1 also matches the misspelled words of titles, addresses, cities and categories
     def filter_search(self, queryset, name, value):
-        return queryset.filter(
-            Q(title__icontains=value) |
-            Q(description__icontains=value) |
-            Q(address__icontains=value) |
-            Q(city__name__icontains=value) |
-            Q(category_type__name__icontains=value) |
-            Q(main_category__name__icontains=value) |
-            Q(sub_category__name__icontains=value) |
-            Q(price_type__name__icontains=value) |
-            Q(user__username__icontains=value)
-        ).distinct()
+        fuzzy = str(self.data.get('fuzzy', '')).lower() in ('1', 'true')
+        return SearchToken.objects.search(queryset, value, fuzzy=fuzzy)
     
+    # ==========================================================================
+    # Geographic filters: the geohash cells covering the area are matched by prefix on the indexed
+    # geohash column, then the coordinates refine the candidates of the cells to the exact area.
+    # ?near=lat,lng&radius_km=5 annotates the rows with "distance_km" (sorted by distance by default)
+    # ==========================================================================
+    def filter_near(self, queryset, name, value):
+        point = parse_point(value)
+        if point is None:
+            return queryset.none()
+        latitude, longitude = point
+        try:
+            radius = float(self.data.get('radius_km') or self.DEFAULT_RADIUS_KM)
+        except (TypeError, ValueError):
+            radius = self.DEFAULT_RADIUS_KM
+        radius = min(max(radius, 0), self.MAX_RADIUS_KM)
+
+        queryset = self.filter_area(queryset, bounding_box(latitude, longitude, radius))
+        # equirectangular distance: exact to a few meters at the scale of the radius
+        scale = math.cos(math.radians(latitude))
+        delta_lat = F('latitude') - latitude
+        delta_lng = (F('longitude') - longitude) * scale
+        distance = ExpressionWrapper(Sqrt(delta_lat * delta_lat + delta_lng * delta_lng) * KM_PER_DEGREE, output_field=FloatField())
+        return queryset.annotate(distance_km=distance).filter(distance_km__lte=radius)
+
+    def filter_bbox(self, queryset, name, value):
+        box = parse_bbox(value)
+        if box is None:
+            return queryset.none()
+        return self.filter_area(queryset, box)
+
+    def filter_area(self, queryset, box):
+        min_lat, min_lng, max_lat, max_lng = box
+        prefixes = Q()
+        for cell in geohash_cells(min_lat, min_lng, max_lat, max_lng):
+            lower, upper = geohash_range(cell)
+            prefixes |= Q(geohash__gte=lower, geohash__lt=upper) if upper else Q(geohash__gte=lower)
+        return queryset.filter(prefixes, latitude__range=(min_lat, max_lat), longitude__range=(min_lng, max_lng))
+    # ==========================================================================
+
     def filter_price_range(self, queryset, name, value):
         try:
             if '-' in value:
@@ -67,4 +112,17 @@ class PropertyFilter(filters.FilterSet):
 
 
 
-
+# ==============================================================================
+# Ordering of the property lists: an explicit ?ordering= always wins,
+# otherwise a list filtered with ?near= is sorted by distance,
+# and a searched list by relevance, then by date
+# ==============================================================================
+class PropertyOrderingFilter(OrderingFilter):
+    def get_ordering(self, request, queryset, view):
+        if not request.query_params.get(self.ordering_param):
+            annotations = queryset.query.annotations
+            ordering = [field for field in ('distance_km', '-search_rank') if field.lstrip('-') in annotations]
+            if ordering:
+                return ordering + ['-created_at']
+        return super().get_ordering(request, queryset, view)
+# ==============================================================================
@@ -0,0 +1,139 @@
+import io
+from PIL import Image, ImageOps
+from django.core.files.base import ContentFile
+from django.db import DatabaseError
+from uploads.models import MediaBlob
+from utils.helpers import safe_delete_file
+from .models import Property, PropertyImage, PropertyImageVariant
+
+
+# ==============================================================================
+# Resized variants of the property images, generated off the request path.
+# The original is decoded once (JPEG files directly at a reduced scale with draft()),
+# rotated according to its EXIF orientation, then resized from the largest to the smallest size,
+# each size being resized from the previous one, and encoded in WebP and JPEG.
+# An image that cannot be decoded is marked "failed" and keeps being served as the original.
+# An image whose file is shared with another image (same content) reuses the variants of that image.
+# ==============================================================================
+class ImageVariantGenerator:
+    # size => longest side in pixels, largest first, the images are never enlarged
+    SIZES = {'large': 1600, 'medium': 800, 'thumbnail': 320}
+    # format => (Pillow format, file extension, encoder options)
+    FORMATS = {
+        'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+        'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+    }
+
+    def __init__(self, image):
+        self.image = image
+
+    # ==========================================================================
+    # decoded original as RGB, transparent pixels on a white background
+    # ==========================================================================
+    def open(self):
+        largest = max(self.SIZES.values())
+        with self.image.image.open('rb') as file:
+            source = Image.open(file)
+            source.draft('RGB', (largest, largest))
+            source = ImageOps.exif_transpose(source)
+            source.load()
+        if source.mode in ('RGBA', 'LA', 'P'):
+            source = source.convert('RGBA')
+            background = Image.new('RGB', source.size, 'white')
+            background.paste(source, mask=source.getchannel('A'))
+            return background
+        return source.convert('RGB')
+
+    def resize(self, picture, longest):
+        width, height = picture.size
+        if max(width, height) <= longest:
+            return picture
+        scale = longest / max(width, height)
+        return picture.resize((max(round(width * scale), 1), max(round(height * scale), 1)), Image.LANCZOS, reducing_gap=3.0)
+
+    def encode(self, picture, format):
+        pillow_format, extension, options = self.FORMATS[format]
+        buffer = io.BytesIO()
+        picture.save(buffer, pillow_format, **options)
+        return buffer.getvalue(), extension
+    # ==========================================================================
+
+    # ==========================================================================
+    # unsaved variants of the image, their files are written to the storage
+    # ==========================================================================
+    def build_variants(self):
+        variants = []
+        try:
+            picture = self.open()
+            for size, longest in self.SIZES.items():
+                picture = self.resize(picture, longest)
+                for format in self.FORMATS:
+                    content, extension = self.encode(picture, format)
+                    variant = PropertyImageVariant(
+                        image=self.image, size=size, format=format,
+                        width=picture.width, height=picture.height, bytes=len(content),
+                    )
+                    variant.file.save(f"{self.image.pk}-{size}.{extension}", ContentFile(content), save=False)
+                    variants.append(variant)
+        except Exception:
+            for variant in variants:
+                safe_delete_file(variant.file)
+            raise
+        return variants
+
+    # ==========================================================================
+    # Unsaved copies of the variants of another image with the same content (same blob of the
+    # content-addressed storage), they reference the same files: nothing is decoded nor encoded.
+    # ==========================================================================
+    def shared_variants(self):
+        source = (
+            PropertyImage.objects.filter(image=self.image.image.name, variants_status=PropertyImage.VARIANTS_READY)
+            .exclude(pk=self.image.pk).prefetch_related('variants').first()
+        )
+        if source is None or not source.variants.all():
+            return None
+        variants = []
+        for variant in source.variants.all():
+            MediaBlob.retain(variant.file.name)
+            variants.append(PropertyImageVariant(
+                image=self.image, size=variant.size, format=variant.format, file=variant.file.name,
+                width=variant.width, height=variant.height, bytes=variant.bytes,
+            ))
+        return variants
+
+    # ==========================================================================
+    # (re)generate the variants and record the result on the image, returns the variants
+    # share=False always encodes them again (new sizes or encoder options)
+    # ==========================================================================
+    def generate(self, share=True):
+        for variant in self.image.variants.all():
+            variant.delete()
+        try:
+            variants = self.shared_variants() if share else None
+            if variants is None:
+                variants = self.build_variants()
+        except (OSError, ValueError, SyntaxError, Image.DecompressionBombError):
+            PropertyImage.objects.filter(pk=self.image.pk).update(variants_status=PropertyImage.VARIANTS_FAILED)
+            return []
+        try:
+            PropertyImageVariant.objects.bulk_create(variants)
+        except DatabaseError:
+            # the image was deleted while its variants were generated
+            for variant in variants:
+                safe_delete_file(variant.file)
+            return []
+        PropertyImage.objects.filter(pk=self.image.pk).update(variants_status=PropertyImage.VARIANTS_READY)
+        # the srcset of the property responses changed
+        Property.bump_cache_versions([self.image.property_id])
+        return variants
+# ==============================================================================
+
+
+# ==============================================================================
+# background task submitted when an image is uploaded (see signals.py)
+# ==============================================================================
+def generate_image_variants(image_id):
+    image = PropertyImage.objects.filter(pk=image_id).first()
+    if image is not None:
+        ImageVariantGenerator(image).generate()
+# ==============================================================================
@@ -0,0 +1,326 @@
+import csv
+import http.client
+import io
+import ipaddress
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import urllib.request
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from urllib.parse import urlparse
+import django
+from PIL import Image
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.utils import timezone
+from rest_framework import serializers
+from search.models import SearchToken
+from utils.background import submit_task
+from utils.cache import bump_cache_version
+from utils.reference import get_reference
+from .clusters import cluster_refreshes
+from .models import Property, PropertyImage, PropertyImport
+from .serializers import PropertyFeedRowSerializer
+from .similar import similar_refreshes
+
+logger = logging.getLogger(__name__)
+
+
+# ==============================================================================
+# Rows of a feed file opened in binary mode: (number, row, error), numbered from 1
+# without the CSV header. CSV rows drop their empty cells and split their images on "|",
+# a JSON line that cannot be parsed is reported as the error of its row.
+# The file is read as a stream, never loaded whole.
+# ==============================================================================
+class PropertyFeedReader:
+    def __init__(self, file, format):
+        self.file = file
+        self.format = format
+
+    def __iter__(self):
+        text = io.TextIOWrapper(self.file, encoding='utf-8-sig', newline='')
+        if self.format == PropertyImport.FORMAT_CSV:
+            for number, row in enumerate(csv.DictReader(text), 1):
+                row = {key.strip(): value.strip() for key, value in row.items() if key and value and value.strip()}
+                if 'images' in row:
+                    row['images'] = [source.strip() for source in row['images'].split('|') if source.strip()]
+                yield number, row, None
+            return
+
+        number = 0
+        for line in text:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                row = json.loads(line)
+            except ValueError as error:
+                yield number, None, f"Invalid JSON: {error}"
+                continue
+            if not isinstance(row, dict):
+                yield number, None, "Each line must be a JSON object"
+                continue
+            if isinstance(row.get('images'), str):
+                row['images'] = [row['images']]
+            yield number, row, None
+# ==============================================================================
+
+
+# ==============================================================================
+# Validate a batch of rows with PropertyFeedRowSerializer (DynamicValidator + PROPERTY_RULES).
+# Runs in the worker processes: it receives and returns plain values only,
+# [(number, values or None, errors or None)], the errors as {field: [messages]}.
+# ==============================================================================
+def validate_feed_rows(rows):
+    # one serializer for the batch: its fields are built once, not for every row
+    serializer = PropertyFeedRowSerializer()
+    results = []
+    for number, row, error in rows:
+        if error:
+            results.append((number, None, {'row': [error]}))
+            continue
+        try:
+            values = serializer.get_row_values(serializer.run_validation(row))
+        except serializers.ValidationError as error:
+            results.append((number, None, json.loads(json.dumps(error.detail))))
+            continue
+        results.append((number, values, None))
+    return results
+# ==============================================================================
+
+
+# ==============================================================================
+# Import a feed for one owner: the rows are read in batches of batch_size, validated in
+# `workers` processes (0 validates in this process), and each batch is inserted in its
+# own transaction: one bulk INSERT of the properties, their search index and their map
+# clusters, then the progress of the import. A batch committed is never imported again:
+# run(offset=...) skips the rows already processed.
+# The images of the rows are fetched after the commit by the background tasks.
+#   PropertyImporter(owner, batch_size=500, workers=4).run(file, 'csv', offset=0, on_batch=print)
+# ==============================================================================
+class PropertyImporter:
+    def __init__(self, owner, batch_size=None, workers=None, job=None):
+        self.owner = owner
+        self.batch_size = batch_size or getattr(settings, 'IMPORT_BATCH_SIZE', 500)
+        self.workers = workers if workers is not None else getattr(settings, 'IMPORT_WORKERS', 2)
+        self.max_errors = getattr(settings, 'IMPORT_MAX_REPORTED_ERRORS', 1000)
+        # PropertyImport followed by the admin endpoint, optional
+        self.job = job
+        self.offset = self.created = self.failed = 0
+
+    def batches(self, file, format, offset):
+        rows = islice(PropertyFeedReader(file, format), offset, None)
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                return
+            yield batch
+
+    # ==========================================================================
+    # validated batches in the order of the file, at most two batches ahead per worker
+    # ==========================================================================
+    def validated_batches(self, batches):
+        if not self.workers:
+            yield from map(validate_feed_rows, batches)
+            return
+        # the worker processes open their own connections
+        connections.close_all()
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context, initializer=django.setup) as executor:
+            pending = deque()
+            for batch in batches:
+                pending.append(executor.submit(validate_feed_rows, batch))
+                if len(pending) >= self.workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    # ==========================================================================
+    # import the file, on_batch(importer, errors) is called after each committed batch
+    # ==========================================================================
+    def run(self, file, format, offset=0, on_batch=None):
+        self.offset = offset
+        for results in self.validated_batches(self.batches(file, format, offset)):
+            errors = self.save_batch(results)
+            if on_batch is not None:
+                on_batch(self, errors)
+        return self
+    # ==========================================================================
+
+    # ==========================================================================
+    # insert the valid rows of a batch, returns the errors of the rejected rows
+    # ==========================================================================
+    def build_property(self, values):
+        property = Property(user=self.owner, **{
+            key: value for key, value in values.items() if not key.endswith('_id')
+        })
+        # instances of the reference cache: the search index reads their names without a query
+        for field, model in PropertyFeedRowSerializer.REFERENCE_MODELS.items():
+            if f'{field}_id' in values:
+                setattr(property, field, get_reference(model, values[f'{field}_id']))
+        # bulk_create does not call save()
+        property.geohash = property.compute_geohash()
+        return property
+
+    def save_batch(self, results):
+        properties, images, errors = [], [], []
+        for number, values, row_errors in results:
+            if values is None:
+                errors.append({'row': number, 'errors': row_errors})
+                continue
+            images.append(values.pop('images', []))
+            properties.append(self.build_property(values))
+
+        with transaction.atomic():
+            Property.objects.bulk_create(properties)
+            # bulk_create sends no post_save: index the batch at once (see the signals)
+            SearchToken.objects.index_properties(properties)
+            self.offset += len(results)
+            self.created += len(properties)
+            self.failed += len(errors)
+            if self.job is not None:
+                self.save_progress(errors)
+            transaction.on_commit(lambda: self.after_commit(properties, images))
+        return errors
+
+    def save_progress(self, errors):
+        job = self.job
+        job.offset = self.offset
+        job.created_count = self.created
+        job.failed_count = self.failed
+        job.errors = (job.errors + errors)[:self.max_errors]
+        job.save(update_fields=['offset', 'created_count', 'failed_count', 'errors', 'updated_at'])
+
+    def after_commit(self, properties, images):
+        bump_cache_version('properties')
+        for property, sources in zip(properties, images):
+            if sources:
+                submit_task(import_property_images, property.pk, sources)
+        # bulk_create sends no post_save: the batch gets its clusters and similar properties at once
+        cluster_refreshes.schedule([property.geohash for property in properties])
+        similar_refreshes.schedule([property.pk for property in properties])
+# ==============================================================================
+
+
+# ==============================================================================
+# The images of a feed are fetched from the public internet only: every connection, the redirects included,
+# resolves the host, refuses it when one of its addresses is loopback, private, link-local or reserved
+# (169.254.169.254 ...), then connects to the checked address so a second DNS answer cannot change it.
+# IMPORT_IMAGE_HOSTS restricts the fetched hosts further (the domains and their subdomains).
+# ==============================================================================
+def get_public_address(host, port):
+    host = host.lower().rstrip('.')
+    domains = getattr(settings, 'IMPORT_IMAGE_HOSTS', None)
+    if domains and not any(host == domain or host.endswith(f".{domain}") for domain in domains):
+        raise ValueError(f"{host} is not an allowed feed host")
+    addresses = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    for *_, address in addresses:
+        ip = ipaddress.ip_address(address[0])
+        if not ip.is_global or ip.is_multicast:
+            raise ValueError(f"{host} resolves to the non public address {ip}")
+    return addresses[0][4][:2]
+
+
+class PublicHTTPConnection(http.client.HTTPConnection):
+    def connect(self):
+        self.sock = socket.create_connection(get_public_address(self.host, self.port), self.timeout)
+
+
+class PublicHTTPSConnection(http.client.HTTPSConnection):
+    def connect(self):
+        sock = socket.create_connection(get_public_address(self.host, self.port), self.timeout)
+        self.sock = self._context.wrap_socket(sock, server_hostname=self.host)
+
+
+class PublicHTTPHandler(urllib.request.HTTPHandler):
+    def http_open(self, request):
+        return self.do_open(PublicHTTPConnection, request)
+
+
+class PublicHTTPSHandler(urllib.request.HTTPSHandler):
+    def https_open(self, request):
+        return self.do_open(PublicHTTPSConnection, request, context=self._context)
+
+
+# http(s) only, without the proxies of the environment: a redirect to another scheme fails
+def build_feed_opener():
+    opener = urllib.request.OpenerDirector()
+    for handler in (PublicHTTPHandler(), PublicHTTPSHandler(), urllib.request.HTTPRedirectHandler(),
+                    urllib.request.HTTPDefaultErrorHandler(), urllib.request.HTTPErrorProcessor(), urllib.request.UnknownHandler()):
+        opener.add_handler(handler)
+    return opener
+# ==============================================================================
+
+
+# ==============================================================================
+# Background task of the imported rows: fetch their images (URLs, or paths under
+# IMPORT_MEDIA_ROOT) and attach them, the variants follow like for any upload.
+# A source that cannot be fetched or is not an image is logged and skipped.
+# ==============================================================================
+def fetch_feed_image(source):
+    max_size = getattr(settings, 'IMPORT_IMAGE_MAX_SIZE', 10 * 1024 * 1024)
+    if source.startswith(('http://', 'https://')):
+        request = urllib.request.Request(source, headers={'User-Agent': 'property-management-import'})
+        with build_feed_opener().open(request, timeout=getattr(settings, 'IMPORT_IMAGE_TIMEOUT', 15)) as response:
+            content = response.read(max_size + 1)
+        name = os.path.basename(urlparse(source).path)
+    else:
+        root = os.path.realpath(settings.IMPORT_MEDIA_ROOT)
+        path = os.path.realpath(os.path.join(root, source))
+        if not path.startswith(root + os.sep):
+            raise ValueError("outside of IMPORT_MEDIA_ROOT")
+        with open(path, 'rb') as file:
+            content = file.read(max_size + 1)
+        name = os.path.basename(path)
+    if len(content) > max_size:
+        raise ValueError(f"larger than {max_size} bytes")
+    with Image.open(io.BytesIO(content)) as image:
+        image.verify()
+        extension = f".{(image.format or 'jpeg').lower()}"
+    if not os.path.splitext(name)[1]:
+        name = f"{name or 'image'}{extension}"
+    return ContentFile(content, name=name)
+
+
+def import_property_images(property_id, sources):
+    property = Property.objects.filter(pk=property_id).first()
+    if property is None:
+        return
+    for source in sources:
+        try:
+            file = fetch_feed_image(source)
+        except (OSError, ValueError, SyntaxError, Image.DecompressionBombError) as error:
+            logger.warning("Import image %s of property %s skipped: %s", source, property_id, error)
+            continue
+        PropertyImage.objects.create(property=property, image=file)
+# ==============================================================================
+
+
+# ==============================================================================
+# Background task of the admin endpoint: run (or resume) an import from its offset.
+# Only a pending import is run: moving it to running is a conditional update,
+# so a task submitted twice for the same import runs it once
+# ==============================================================================
+def run_property_import(import_id):
+    claimed = PropertyImport.objects.filter(pk=import_id, status=PropertyImport.STATUS_PENDING).update(
+        status=PropertyImport.STATUS_RUNNING, message='', updated_at=timezone.now()
+    )
+    if not claimed:
+        return
+    job = PropertyImport.objects.select_related('owner').get(pk=import_id)
+    importer = PropertyImporter(job.owner, job=job)
+    importer.created, importer.failed = job.created_count, job.failed_count
+    try:
+        with job.file.open('rb') as file:
+            importer.run(file, job.format, offset=job.offset)
+    except Exception as error:
+        logger.exception("Property import %s failed at row %s", job.pk, importer.offset)
+        PropertyImport.objects.filter(pk=job.pk).update(status=PropertyImport.STATUS_FAILED, message=str(error))
+        return
+    PropertyImport.objects.filter(pk=job.pk).update(status=PropertyImport.STATUS_DONE)
+# ==============================================================================
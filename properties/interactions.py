@@ -0,0 +1,56 @@
+from .models import Property
+
+
+# ==============================================================================
+# Likes and favorites of the current user, resolved once per request.
+# The ids of the serialized properties are loaded in one query per relationship
+# (the list serializer primes the whole page before the rows are serialized),
+# then is_liked / is_favorited are dictionary lookups. Anonymous users cost no query.
+# ==============================================================================
+class PropertyInteractionResolver:
+    RELATIONS = ('likes', 'favorites')
+
+    def __init__(self, user):
+        self.user = user if user is not None and user.is_authenticated else None
+        self.resolved = set()
+        self.ids = {relation: set() for relation in self.RELATIONS}
+
+    # ==========================================================================
+    # the resolver of a request, created on first use and shared by all its serializers
+    # ==========================================================================
+    @classmethod
+    def for_request(cls, request):
+        if request is None:
+            return cls(None)
+        resolver = getattr(request, '_property_interactions', None)
+        if resolver is None:
+            resolver = cls(getattr(request, 'user', None))
+            request._property_interactions = resolver
+        return resolver
+
+    # ==========================================================================
+    # load the likes / favorites of the user among the given properties
+    # ==========================================================================
+    def prime(self, property_ids):
+        property_ids = set(property_ids) - self.resolved
+        if self.user is None or not property_ids:
+            return
+        for relation in self.RELATIONS:
+            through = getattr(Property, relation).through
+            self.ids[relation].update(
+                through.objects.filter(user_id=self.user.pk, property_id__in=property_ids).values_list('property_id', flat=True)
+            )
+        self.resolved.update(property_ids)
+
+    def has(self, relation, property_id):
+        if self.user is None:
+            return False
+        self.prime([property_id])
+        return property_id in self.ids[relation]
+
+    def is_liked(self, property_id):
+        return self.has('likes', property_id)
+
+    def is_favorited(self, property_id):
+        return self.has('favorites', property_id)
+# ==============================================================================
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from properties.images import ImageVariantGenerator
+from properties.models import PropertyImage
+
+
+# ==========================================================================================================
+# Generate the resized variants of the property images in this process (images uploaded before
+# the variants existed, images whose background task was lost by a restart, failed images after a fix).
+# By default the images still pending, --failed adds the failed ones, --all regenerates every image.
+#   python manage.py generate_image_variants [--failed] [--all]
+# ==========================================================================================================
+class Command(BaseCommand):
+    help = "Generate the thumbnail / medium / large variants of the property images"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--failed', action='store_true', help="Also retry the images whose generation failed")
+        parser.add_argument('--all', action='store_true', help="Regenerate the variants of every image")
+
+    def handle(self, *args, **options):
+        images = PropertyImage.objects.order_by('created_at')
+        if not options['all']:
+            statuses = [PropertyImage.VARIANTS_PENDING]
+            if options['failed']:
+                statuses.append(PropertyImage.VARIANTS_FAILED)
+            images = images.filter(variants_status__in=statuses)
+
+        ready = failed = 0
+        for image in images.iterator(chunk_size=100):
+            if ImageVariantGenerator(image).generate(share=not options['all']):
+                ready += 1
+            else:
+                failed += 1
+        self.stdout.write(self.style.SUCCESS(f"Done: {ready} images ready, {failed} failed"))
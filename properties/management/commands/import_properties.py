@@ -0,0 +1,62 @@
+import json
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from properties.imports import PropertyImporter
+from properties.models import PropertyImport
+
+
+# ==========================================================================================================
+# Import the listings of a feed file (CSV with a header row, or JSON Lines) for one owner, see imports.py.
+# The progress is printed after each committed batch with the offset to resume from (--offset) if the
+# import stops, the rejected rows are written to --report (one JSON line per row: its number and its errors).
+#   python manage.py import_properties feed.csv --owner agency_username [--format csv|jsonl]
+#       [--batch-size 500] [--workers 2] [--offset 0] [--report errors.jsonl]
+# ==========================================================================================================
+class Command(BaseCommand):
+    help = "Import properties from a CSV or JSON Lines feed"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Feed file")
+        parser.add_argument('--owner', required=True, help="Id, username or phone of the owner of the imported properties")
+        parser.add_argument('--format', choices=[PropertyImport.FORMAT_CSV, PropertyImport.FORMAT_JSONL], help="Default: from the extension of the file")
+        parser.add_argument('--batch-size', type=int, default=None, help="Rows per batch and transaction (default: IMPORT_BATCH_SIZE)")
+        parser.add_argument('--workers', type=int, default=None, help="Validation processes, 0 validates in this process (default: IMPORT_WORKERS)")
+        parser.add_argument('--offset', type=int, default=0, help="Number of data rows to skip (rows already imported)")
+        parser.add_argument('--report', help="File receiving the rejected rows as JSON lines")
+
+    def handle(self, *args, **options):
+        owner = self.get_owner(options['owner'])
+        format = options['format'] or (PropertyImport.FORMAT_CSV if options['path'].lower().endswith('.csv') else PropertyImport.FORMAT_JSONL)
+        importer = PropertyImporter(owner, batch_size=options['batch_size'], workers=options['workers'])
+        report = open(options['report'], 'a', encoding='utf-8') if options['report'] else None
+
+        def on_batch(importer, errors):
+            if report is not None:
+                for error in errors:
+                    report.write(json.dumps(error) + '\n')
+                report.flush()
+            self.stdout.write(f"offset {importer.offset}: {importer.created} created, {importer.failed} rejected")
+
+        try:
+            with open(options['path'], 'rb') as file:
+                importer.run(file, format, offset=options['offset'], on_batch=on_batch)
+        except (Exception, KeyboardInterrupt):
+            self.stderr.write(f"Stopped, resume with --offset {importer.offset}")
+            raise
+        finally:
+            if report is not None:
+                report.close()
+        self.stdout.write(self.style.SUCCESS(f"Done: {importer.created} properties created, {importer.failed} rows rejected"))
+
+    def get_owner(self, value):
+        User = get_user_model()
+        lookup = Q(username=value) | Q(phone=value)
+        try:
+            lookup |= Q(pk=User._meta.pk.to_python(value))
+        except Exception:
+            pass
+        owner = User.objects.filter(lookup).first()
+        if owner is None:
+            raise CommandError(f'No user "{value}"')
+        return owner
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from properties.models import PropertyCluster
+
+
+# ==========================================================================================================
+# Recompute every map cluster from the visible properties (first deployment, after imports or bulk updates
+# made with queryset.update() which do not send the signals).
+# One GROUP BY query per geohash precision, all the rows are replaced in a single transaction.
+#   python manage.py rebuild_property_clusters
+# ==========================================================================================================
+class Command(BaseCommand):
+    help = "Rebuild the precomputed map clusters of the properties"
+
+    def handle(self, *args, **options):
+        total = PropertyCluster.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Done: {total} clusters for precisions 1 to {PropertyCluster.MAX_PRECISION}"))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from properties.similar import rebuild_similar_properties
+
+
+# ==========================================================================================================
+# Recompute the similar properties of every property, one city per process of the pool (see similar.py).
+# The saves of the properties keep them up to date in the background, run it after a restore,
+# a change of the weights, or periodically to catch up the lists shortened by deletions.
+#   python manage.py rebuild_similar_properties [--workers 2]
+# ==========================================================================================================
+class Command(BaseCommand):
+    help = "Rebuild the precomputed similar properties"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help="Processes, 0 computes in this process (default: SIMILAR_PROPERTIES_WORKERS)")
+
+    def handle(self, *args, **options):
+        totals = {'cities': 0, 'properties': 0}
+
+        def on_city(city_id, count):
+            totals['cities'] += 1
+            totals['properties'] += count
+            self.stdout.write(f"city {city_id or '-'}: {count} properties")
+
+        rebuild_similar_properties(workers=options['workers'], on_city=on_city)
+        self.stdout.write(self.style.SUCCESS(f"Done: {totals['properties']} properties in {totals['cities']} cities"))
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from properties.models import Property
+
+
+# ==========================================================================================================
+# Recompute the counter columns of Property (views, likes, favorites, comments) that drifted
+# from their source tables, for example after raw SQL, restored backups or failed requests.
+# Properties are walked in primary key order in batches, each batch costs one query per counter to compare,
+# and only the drifted properties are rewritten with Property.refresh_counters().
+#   python manage.py reconcile_property_counters --batch-size 1000 --dry-run
+# ==========================================================================================================
+class Command(BaseCommand):
+    help = "Recompute drifted views/likes/favorites/comments counters on properties"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Number of properties checked per batch")
+        parser.add_argument('--dry-run', action='store_true', help="Only report the drifted properties")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        fields = list(Property.COUNTER_SOURCES)
+        last_pk = None
+        checked = drifted = 0
+
+        while True:
+            queryset = Property.objects.order_by('pk')
+            if last_pk is not None:
+                queryset = queryset.filter(pk__gt=last_pk)
+            batch = list(queryset.values('pk', *fields)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1]['pk']
+            ids = [row['pk'] for row in batch]
+
+            actual = {field: self.count_rows(field, ids) for field in fields}
+            drifted_ids = [
+                row['pk'] for row in batch
+                if any(row[field] != actual[field].get(row['pk'], 0) for field in fields)
+            ]
+
+            if drifted_ids and not options['dry_run']:
+                Property.refresh_counters(drifted_ids)
+
+            checked += len(batch)
+            drifted += len(drifted_ids)
+            self.stdout.write(f"checked {checked} properties, {drifted} drifted")
+
+        action = "found" if options['dry_run'] else "fixed"
+        self.stdout.write(self.style.SUCCESS(f"Done: {drifted} drifted properties {action} out of {checked}"))
+
+    def count_rows(self, field, ids):
+        model = Property.counter_model(field)
+        rows = model.objects.filter(property_id__in=ids).order_by().values('property_id').annotate(total=Count('*'))
+        return {row['property_id']: row['total'] for row in rows}
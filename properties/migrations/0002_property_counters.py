@@ -0,0 +1,64 @@
+# Generated by Django 4.2.13 on 2026-10-18 02:48
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Property = apps.get_model('properties', 'Property')
+    Comment = apps.get_model('properties', 'Comment')
+    sources = {
+        'views_count': Property.views.through,
+        'likes_count': Property.likes.through,
+        'favorites_count': Property.favorites.through,
+        'comments_count': Comment,
+    }
+    values = {}
+    for field, model in sources.items():
+        rows = model.objects.filter(property_id=OuterRef('pk')).order_by().values('property_id').annotate(total=Count('*')).values('total')
+        values[field] = Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+    Property.objects.update(**values)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Comments Count'),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Favorites Count'),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Likes Count'),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='views_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Views Count'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['views_count'], name='properties__views_c_030cbc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['likes_count'], name='properties__likes_c_f06fe5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['favorites_count'], name='properties__favorit_78d7a9_idx'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.13 on 2026-10-18 03:04
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0003_property_coordinates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PropertyCluster',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('precision', models.PositiveSmallIntegerField(verbose_name='Geohash Precision')),
+                ('cell', models.CharField(max_length=12, verbose_name='Geohash Cell')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('latitude', models.FloatField(verbose_name='Centroid Latitude')),
+                ('longitude', models.FloatField(verbose_name='Centroid Longitude')),
+                ('min_price', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('max_price', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Property Cluster',
+                'verbose_name_plural': 'Property Clusters',
+                'unique_together': {('precision', 'cell')},
+            },
+        ),
+    ]
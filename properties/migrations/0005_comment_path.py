@@ -0,0 +1,56 @@
+# Generated by Django 4.2.13 on 2026-10-18 03:07
+
+from django.db import migrations, models
+
+
+def backfill_paths(apps, schema_editor):
+    Comment = apps.get_model('properties', 'Comment')
+    parents = dict(Comment.objects.values_list('pk', 'parent_id'))
+    visible_replies = {}
+    for parent_id in Comment.objects.filter(parent__isnull=False, status=True).values_list('parent_id', flat=True):
+        visible_replies[parent_id] = visible_replies.get(parent_id, 0) + 1
+
+    paths = {}
+    def get_path(pk):
+        if pk not in paths:
+            parent_id = parents[pk]
+            paths[pk] = (get_path(parent_id) if parent_id else '') + pk.hex
+        return paths[pk]
+
+    batch = []
+    for comment in Comment.objects.only('pk').iterator():
+        comment.path = get_path(comment.pk)
+        comment.depth = len(comment.path) // 32 - 1
+        comment.reply_count = visible_replies.get(comment.pk, 0)
+        batch.append(comment)
+        if len(batch) >= 1000:
+            Comment.objects.bulk_update(batch, ['path', 'depth', 'reply_count'])
+            batch = []
+    if batch:
+        Comment.objects.bulk_update(batch, ['path', 'depth', 'reply_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0004_property_clusters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=1024),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+    ]
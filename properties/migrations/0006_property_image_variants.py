@@ -0,0 +1,44 @@
+# Generated by Django 4.2.13 on 2026-10-18 03:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+import properties.models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0005_comment_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='propertyimage',
+            name='variants_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], db_index=True, default='pending', editable=False, max_length=10, verbose_name='Variants Status'),
+        ),
+        migrations.CreateModel(
+            name='PropertyImageVariant',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('size', models.CharField(choices=[('thumbnail', 'Thumbnail'), ('medium', 'Medium'), ('large', 'Large')], max_length=10, verbose_name='Size')),
+                ('format', models.CharField(choices=[('webp', 'WebP'), ('jpeg', 'JPEG')], max_length=4, verbose_name='Format')),
+                ('file', models.ImageField(max_length=255, upload_to=properties.models.property_image_variant_upload_path, verbose_name='File')),
+                ('width', models.PositiveIntegerField(default=0)),
+                ('height', models.PositiveIntegerField(default=0)),
+                ('bytes', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('image', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='properties.propertyimage', verbose_name='Property Image')),
+            ],
+            options={
+                'verbose_name': 'Property Image Variant',
+                'verbose_name_plural': 'Property Image Variants',
+                'ordering': ['width'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='propertyimagevariant',
+            constraint=models.UniqueConstraint(fields=('image', 'size', 'format'), name='unique_property_image_variant'),
+        ),
+    ]
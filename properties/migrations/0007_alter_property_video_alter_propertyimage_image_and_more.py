@@ -0,0 +1,30 @@
+# Generated by Django 4.2.13 on 2026-10-18 03:27
+
+from django.db import migrations, models
+import properties.models
+import uploads.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0006_property_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='property',
+            name='video',
+            field=models.FileField(blank=True, null=True, storage=uploads.storage.ContentAddressedStorage(), upload_to='properties/videos/', verbose_name='Property Video'),
+        ),
+        migrations.AlterField(
+            model_name='propertyimage',
+            name='image',
+            field=models.ImageField(storage=uploads.storage.ContentAddressedStorage(), upload_to=properties.models.property_image_upload_path, verbose_name='Property Image'),
+        ),
+        migrations.AlterField(
+            model_name='propertyimagevariant',
+            name='file',
+            field=models.ImageField(max_length=255, storage=uploads.storage.ContentAddressedStorage(), upload_to=properties.models.property_image_variant_upload_path, verbose_name='File'),
+        ),
+    ]
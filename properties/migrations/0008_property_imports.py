@@ -0,0 +1,41 @@
+# Generated by Django 4.2.13 on 2026-10-18 03:34
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import properties.models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('properties', '0007_alter_property_video_alter_propertyimage_image_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PropertyImport',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('file', models.FileField(max_length=255, upload_to=properties.models.property_import_upload_path, verbose_name='Feed File')),
+                ('format', models.CharField(choices=[('csv', 'CSV'), ('jsonl', 'JSON Lines')], max_length=5, verbose_name='Format')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='pending', max_length=10, verbose_name='Status')),
+                ('offset', models.PositiveIntegerField(default=0, verbose_name='Rows Processed')),
+                ('created_count', models.PositiveIntegerField(default=0, verbose_name='Properties Created')),
+                ('failed_count', models.PositiveIntegerField(default=0, verbose_name='Rows Rejected')),
+                ('errors', models.JSONField(blank=True, default=list, verbose_name='Errors')),
+                ('message', models.TextField(blank=True, default='', verbose_name='Message')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Created By')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='property_imports', to=settings.AUTH_USER_MODEL, verbose_name='Owner')),
+            ],
+            options={
+                'verbose_name': 'Property Import',
+                'verbose_name_plural': 'Property Imports',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.13 on 2026-10-18 03:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0008_property_imports'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PropertyDailyView',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date', models.DateField(verbose_name='Date')),
+                ('views', models.PositiveIntegerField(default=0, verbose_name='Views')),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_views', to='properties.property', verbose_name='Property')),
+            ],
+            options={
+                'verbose_name': 'Property Daily View',
+                'verbose_name_plural': 'Property Daily Views',
+                'ordering': ['-date'],
+                'unique_together': {('property', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.13 on 2026-10-18 03:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0009_property_daily_views'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PropertySimilarity',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Rank')),
+                ('score', models.FloatField(verbose_name='Score')),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_properties', to='properties.property', verbose_name='Property')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_to', to='properties.property', verbose_name='Similar Property')),
+            ],
+            options={
+                'verbose_name': 'Property Similarity',
+                'verbose_name_plural': 'Property Similarities',
+                'ordering': ['property', 'rank'],
+                'unique_together': {('property', 'rank')},
+            },
+        ),
+    ]
@@ -2,9 +2,13 @@
 import uuid
 from django.db import models
 from django.conf import settings
+from django.core.validators import MaxValueValidator, MinValueValidator
 from categories.models import CategoryType, MainCategory, SubCategory
 from settings_app.models import City
+from uploads.storage import media_storage
 from visitors.models import Visitor
+from utils.cache import bump_cache_version
+from utils.geo import encode_geohash, geohash_range
 
 
 # ==========================================================================================================
@@ -95,12 +99,17 @@ class Property(models.Model):
     city = models.ForeignKey(City, on_delete=models.SET_NULL, null=True, blank=True, related_name='properties', verbose_name="City")
     
     address = models.TextField(blank=True, null=True, verbose_name="Full Address")
+    # Coordinates of the property, the geohash is computed from them on save() and indexed
+    # so the radius / bounding box filters are prefix lookups (see utils/geo.py)
+    latitude = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True, validators=[MinValueValidator(-90), MaxValueValidator(90)], verbose_name="Latitude")
+    longitude = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True, validators=[MinValueValidator(-180), MaxValueValidator(180)], verbose_name="Longitude")
+    geohash = models.CharField(max_length=12, blank=True, default='', db_index=True, editable=False, verbose_name="Geohash")
     area = models.DecimalField(max_digits=10, decimal_places=2)
     is_owner = models.BooleanField(default=True, verbose_name="Is Owner")
 
     price = models.DecimalField(max_digits=15, decimal_places=2,  verbose_name="Price")   
     price_type = models.ForeignKey(PriceType, on_delete=models.SET_NULL, null=True, blank=True, related_name='properties', verbose_name="Price Type")
-    video = models.FileField(upload_to="properties/videos/", blank=True, null=True, verbose_name="Property Video")
+    video = models.FileField(upload_to="properties/videos/", storage=media_storage, blank=True, null=True, verbose_name="Property Video")
 
     status = models.BooleanField(default=True)   
     is_blocked = models.BooleanField(default=False, verbose_name="Is Blocked")
@@ -112,10 +121,26 @@ class Property(models.Model):
     views = models.ManyToManyField(Visitor, blank=True, symmetrical=False, related_name='property_views')   
     likes = models.ManyToManyField(settings.AUTH_USER_MODEL, blank=True, symmetrical=False, related_name='property_likes')   
     favorites = models.ManyToManyField(settings.AUTH_USER_MODEL, blank=True, symmetrical=False, related_name='property_favorites')
+
+    # Denormalized counters of the relationships above and of the comments.
+    # They are kept up to date by the signals in signals.py so reading them never runs COUNT(*) over the join tables,
+    # and the reconcile_property_counters command repairs any drift.
+    views_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Views Count")
+    likes_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Likes Count")
+    favorites_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Favorites Count")
+    comments_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Comments Count")
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # counter column => relationship whose rows it counts
+    COUNTER_SOURCES = {
+        'views_count': 'views',
+        'likes_count': 'likes',
+        'favorites_count': 'favorites',
+        'comments_count': 'comments',
+    }
+
     class Meta:
         verbose_name = "Property"
         verbose_name_plural = "Properties"
@@ -124,11 +149,37 @@ class Property(models.Model):
             models.Index(fields=['status', 'is_blocked']),
             models.Index(fields=['city', 'price']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['views_count']),
+            models.Index(fields=['likes_count']),
+            models.Index(fields=['favorites_count']),
         ]
 
     def __str__(self):
         user_name = getattr(self.user, "username", None) or getattr(self.user, "phone", "Unknown User")
         return f"{self.title} - {user_name}"
+
+    # fields whose change moves the property on the map (see PropertyCluster)
+    CLUSTER_FIELDS = ('geohash', 'status', 'is_blocked', 'price')
+
+    # remember the values loaded from the database to detect what a save() changed
+    @classmethod
+    def from_db(modelClass, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {field: getattr(instance, field) for field in modelClass.CLUSTER_FIELDS if field in field_names}
+        return instance
+
+    # keep the geohash in sync with the coordinates
+    def save(self, *args, **kwargs):
+        self.geohash = self.compute_geohash()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and ('latitude' in update_fields or 'longitude' in update_fields):
+            kwargs['update_fields'] = {*update_fields, 'geohash'}
+        super().save(*args, **kwargs)
+
+    def compute_geohash(self):
+        if self.latitude is None or self.longitude is None:
+            return ''
+        return encode_geohash(float(self.latitude), float(self.longitude))
     
     # ===============================================================================================================
     # A function designed to retrieve all elements with the active status (status = True).
@@ -165,6 +216,115 @@ class Property(models.Model):
         self.save()
         return self
     # ===============================================================================================================
+    # 
+    # 
+    # ===============================================================================================================
+    # A function dedicated to recalculating the counter columns of the given properties from their source tables.
+    # It runs a single UPDATE with one correlated COUNT per counter, so it is safe under concurrent writes.
+    # It is called by the signals when rows are removed and by the reconcile_property_counters command.
+    # ===============================================================================================================
+    @classmethod
+    def refresh_counters(modelClass, property_ids, fields=None):
+        from django.db.models import Count, IntegerField, OuterRef, Subquery
+        from django.db.models.functions import Coalesce
+
+        values = {}
+        for field in (fields or modelClass.COUNTER_SOURCES):
+            model = modelClass.counter_model(field)
+            rows = model.objects.filter(property_id=OuterRef('pk')).order_by().values('property_id').annotate(total=Count('*')).values('total')
+            values[field] = Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+        return modelClass.objects.filter(pk__in=property_ids).update(**values)
+    # ===============================================================================================================
+    # 
+    # 
+    # ===============================================================================================================
+    # Returns the model whose rows are counted by a counter column (the M2M through table or Comment).
+    # ===============================================================================================================
+    @classmethod
+    def counter_model(modelClass, field):
+        relation = modelClass.COUNTER_SOURCES[field]
+        if relation == 'comments':
+            return Comment
+        return getattr(modelClass, relation).through
+    # ===============================================================================================================
+    # 
+    # 
+    # ===============================================================================================================
+    # Toggle the like / favorite of a user on a property in one transaction: a conditional DELETE of the row of
+    # the through table, or its INSERT when there was none, then an atomic F() update of the counter column.
+    # The new count is read back from the updated row, never counted. A concurrent double tap that inserts the
+    # same row first makes the INSERT fail on the unique pair: the relation stays added and is counted once.
+    # The through table is written directly, so the m2m_changed receivers are not involved.
+    # Returns (added, changed, count).
+    #   Property.toggle_relation(property.pk, user.pk, 'likes_count')
+    # ===============================================================================================================
+    @classmethod
+    def toggle_relation(modelClass, property_id, user_id, field):
+        from django.db import IntegrityError, transaction
+        from django.db.models import F
+
+        relation = modelClass._meta.get_field(modelClass.COUNTER_SOURCES[field])
+        through = relation.remote_field.through
+        row = {f"{relation.m2m_field_name()}_id": property_id, f"{relation.m2m_reverse_field_name()}_id": user_id}
+        properties = modelClass.objects.filter(pk=property_id)
+
+        with transaction.atomic():
+            if through.objects.filter(**row).delete()[0]:
+                added, changed = False, True
+                properties.filter(**{f"{field}__gt": 0}).update(**{field: F(field) - 1})
+            else:
+                try:
+                    with transaction.atomic():
+                        through.objects.create(**row)
+                    added, changed = True, True
+                    properties.update(**{field: F(field) + 1})
+                except IntegrityError:
+                    added, changed = True, False
+            count = properties.values_list(field, flat=True).get()
+
+        if changed:
+            def invalidate():
+                modelClass.bump_cache_versions([property_id], counters=True)
+                # the favorites list of the user changed, not the lists of the other users
+                if field == 'favorites_count':
+                    bump_cache_version(modelClass.favorites_cache_namespace(user_id))
+            transaction.on_commit(invalidate)
+        return added, changed, count
+    # ===============================================================================================================
+    # 
+    # 
+    # ===============================================================================================================
+    # Version stamps of the cached responses of the public endpoints (see utils.cache.CachedResponseMixin):
+    # "property:<id>" covers the detail and the comments of one property and its row in the cached lists,
+    # the membership of the lists being covered by the "properties" namespace and their order by a counter
+    # (?ordering=-likes_count ...) by "properties:counters", bumped with counters=True.
+    # Called by the signals on every write of a property, its images, comments, likes, favorites and views,
+    # the bump waits for the commit so no other process caches the old rows under the new versions.
+    # ===============================================================================================================
+    COUNTERS_CACHE_NAMESPACE = 'properties:counters'
+
+    @staticmethod
+    def cache_namespace(property_id):
+        return f"property:{property_id}"
+
+    @classmethod
+    def bump_cache_versions(modelClass, property_ids, counters=False):
+        from django.db import transaction
+
+        property_ids = set(property_ids)
+
+        def bump():
+            for property_id in property_ids:
+                bump_cache_version(modelClass.cache_namespace(property_id))
+            if counters:
+                bump_cache_version(modelClass.COUNTERS_CACHE_NAMESPACE)
+        transaction.on_commit(bump)
+
+    # the favorites of one user (count of UserFavoritesView), bumped when that user adds or removes a favorite
+    @staticmethod
+    def favorites_cache_namespace(user_id):
+        return f"properties:favorites:{user_id}"
+    # ===============================================================================================================
 
 # ==========================================================================================================
 # End Property Model
@@ -191,7 +351,14 @@ def property_image_upload_path(instance, filename):
 class PropertyImage(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)    
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='images')    
-    image = models.ImageField(upload_to=property_image_upload_path, verbose_name="Property Image")
+    image = models.ImageField(upload_to=property_image_upload_path, storage=media_storage, verbose_name="Property Image")
+
+    # state of the resized variants generated in the background (see images.py)
+    VARIANTS_PENDING = 'pending'
+    VARIANTS_READY = 'ready'
+    VARIANTS_FAILED = 'failed'
+    VARIANTS_STATUS_CHOICES = [(VARIANTS_PENDING, 'Pending'), (VARIANTS_READY, 'Ready'), (VARIANTS_FAILED, 'Failed')]
+    variants_status = models.CharField(max_length=10, choices=VARIANTS_STATUS_CHOICES, default=VARIANTS_PENDING, editable=False, db_index=True, verbose_name="Variants Status")
        
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -210,6 +377,47 @@ class PropertyImage(models.Model):
 # 
 # 
 # ==========================================================================================================
+# Resized copies of a property image (thumbnail, medium, large) in WebP and JPEG,
+# generated in the background after the upload so the lists download small files.
+# The dimensions and the size in bytes are stored to build the srcset of the serializer without opening the files.
+# ==========================================================================================================
+def property_image_variant_upload_path(instance, filename):
+    return f"properties/images/{instance.image.property_id}/variants/{filename}"
+
+
+class PropertyImageVariant(models.Model):
+    SIZE_CHOICES = [('thumbnail', 'Thumbnail'), ('medium', 'Medium'), ('large', 'Large')]
+    FORMAT_CHOICES = [('webp', 'WebP'), ('jpeg', 'JPEG')]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    image = models.ForeignKey(PropertyImage, on_delete=models.CASCADE, related_name='variants', verbose_name="Property Image")
+    size = models.CharField(max_length=10, choices=SIZE_CHOICES, verbose_name="Size")
+    format = models.CharField(max_length=4, choices=FORMAT_CHOICES, verbose_name="Format")
+    file = models.ImageField(upload_to=property_image_variant_upload_path, storage=media_storage, max_length=255, verbose_name="File")
+    width = models.PositiveIntegerField(default=0)
+    height = models.PositiveIntegerField(default=0)
+    bytes = models.PositiveIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Property Image Variant"
+        verbose_name_plural = "Property Image Variants"
+        ordering = ['width']
+        constraints = [
+            models.UniqueConstraint(fields=['image', 'size', 'format'], name='unique_property_image_variant'),
+        ]
+
+    def __str__(self):
+        return f"{self.size} {self.format} of {self.image_id}"
+# ==========================================================================================================
+# End PropertyImageVariant Model
+# ==========================================================================================================   
+# 
+# 
+# 
+# 
+# ==========================================================================================================
 # A dedicated form for managing property-related comments, where users can add comments
 # on any property, and they can also reply to other users' comments.
 # This form enables the creation of a threaded discussion system that supports main comments and sub-replies,
@@ -223,9 +431,22 @@ class Comment(models.Model):
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies')
     status = models.BooleanField(default=True)
 
+    # Materialized path of the reply tree: the hex ids of the ancestors followed by the id of the comment
+    # (32 characters per level). A whole sub thread is one indexed range scan on path (see subtree_range),
+    # and the ancestors of a reply are read from its path without walking up the parents.
+    # The threads displayed are read level by level on parent (see threads.py).
+    # depth is 0 for a root comment, reply_count the number of visible (status=True) direct replies.
+    path = models.CharField(max_length=1024, default='', db_index=True, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    reply_count = models.PositiveIntegerField(default=0, editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # characters of one level of path, and deepest reply allowed by its max_length
+    PATH_STEP = 32
+    MAX_DEPTH = 1024 // PATH_STEP - 1
+
     class Meta:
         verbose_name = "Comment"
         verbose_name_plural = "Comments"
@@ -239,6 +460,35 @@ class Comment(models.Model):
         user_name = getattr(self.user, "username", None) or getattr(self.user, "phone", "Unknown User")
         return f"Comment by {user_name} on {self.property.title}"
 
+    # remember the status loaded from the database, the signals update reply_count of the parent when it changes
+    @classmethod
+    def from_db(modelClass, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'status' in field_names:
+            instance._loaded_status = instance.status
+        return instance
+
+    # the path is set once on creation, a comment never changes of parent
+    def save(self, *args, **kwargs):
+        if not self.path:
+            self.path = (self.parent.path if self.parent_id else '') + self.id.hex
+            self.depth = len(self.path) // self.PATH_STEP - 1
+        super().save(*args, **kwargs)
+
+    # ======================================================================================
+    # (lower, upper) bounds of the paths of the replies below a path: lower < path < upper,
+    # the paths only contain 0-9 a-f so "g" sorts after all of them
+    # ======================================================================================
+    @classmethod
+    def subtree_range(modelClass, path):
+        return path, path + 'g'
+
+    # ======================================================================================
+    # ids of the parents of the comment, from the root to its direct parent, read from its path
+    # ======================================================================================
+    def ancestor_ids(self):
+        return [uuid.UUID(self.path[start:start + self.PATH_STEP]) for start in range(0, len(self.path) - self.PATH_STEP, self.PATH_STEP)]
+
     # ======================================================================================
     # A function dedicated to switching the suspension state between enabled and disabled,
     # where it flips the current value (True ↔ False) and saves the change in the database.
@@ -247,7 +497,272 @@ class Comment(models.Model):
         self.status = not self.status
         self.save()
         return self.status
+
+    # ======================================================================================
+    # Recount reply_count (visible direct replies) of the given comments in a single UPDATE,
+    # used after the bulk moderation which hides, shows or deletes comments without signals.
+    # ======================================================================================
+    @classmethod
+    def refresh_reply_counts(modelClass, comment_ids):
+        from django.db.models import Count, IntegerField, OuterRef, Subquery
+        from django.db.models.functions import Coalesce
+
+        rows = modelClass.objects.filter(parent_id=OuterRef('pk'), status=True).order_by().values('parent_id').annotate(total=Count('*')).values('total')
+        return modelClass.objects.filter(pk__in=comment_ids).update(reply_count=Coalesce(Subquery(rows, output_field=IntegerField()), 0))
 # ==========================================================================================================
 # End Comment Model
 # ==========================================================================================================
+# 
+# 
+# 
+# 
+# ==========================================================================================================
+# Precomputed marker clusters of the map: for each geohash precision (zoom level) and each cell,
+# the number of visible properties (active and not blocked) with their centroid and price range.
+# The map endpoint reads a few hundred rows instead of sending every property to the browser.
+# The cells of a property are refreshed by the signals when it is created, deleted, moved, blocked or disabled,
+# and the rebuild_property_clusters command recomputes everything.
+# ==========================================================================================================
+class PropertyCluster(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    precision = models.PositiveSmallIntegerField(verbose_name="Geohash Precision")
+    cell = models.CharField(max_length=12, verbose_name="Geohash Cell")
+    count = models.PositiveIntegerField(default=0)
+    latitude = models.FloatField(verbose_name="Centroid Latitude")
+    longitude = models.FloatField(verbose_name="Centroid Longitude")
+    min_price = models.DecimalField(max_digits=15, decimal_places=2)
+    max_price = models.DecimalField(max_digits=15, decimal_places=2)
+
+    updated_at = models.DateTimeField(auto_now=True)
 
+    # clusters are precomputed for the precisions 1 (continent) to MAX_PRECISION (a few hundred meters)
+    MAX_PRECISION = 7
+
+    class Meta:
+        verbose_name = "Property Cluster"
+        verbose_name_plural = "Property Clusters"
+        unique_together = [('precision', 'cell')]
+
+    def __str__(self):
+        return f"{self.cell} ({self.count})"
+
+    # ===============================================================================================================
+    # Geohash precision of the clusters displayed at a zoom level of the map (0 = whole world, 18 = street)
+    # every precision divides the cells by 32, about 2.5 zoom levels
+    # ===============================================================================================================
+    @classmethod
+    def precision_for_zoom(modelClass, zoom):
+        return min(max(1 + (int(zoom) * 2) // 5, 1), modelClass.MAX_PRECISION)
+    # ===============================================================================================================
+    # 
+    # 
+    # ===============================================================================================================
+    # Aggregates of the visible properties per cell of a precision, optionally limited to some cells:
+    # one GROUP BY query on the indexed geohash column
+    # ===============================================================================================================
+    @classmethod
+    def aggregate_cells(modelClass, precision, cells=None):
+        from django.db.models import Avg, Count, Max, Min, Q
+        from django.db.models.functions import Substr
+
+        queryset = Property.objects.filter(status=True, is_blocked=False).exclude(geohash='')
+        if cells is not None:
+            ranges = Q()
+            for cell in cells:
+                lower, upper = geohash_range(cell)
+                ranges |= Q(geohash__gte=lower, geohash__lt=upper) if upper else Q(geohash__gte=lower)
+            queryset = queryset.filter(ranges)
+        rows = queryset.order_by().annotate(cell=Substr('geohash', 1, precision)).values('cell').annotate(
+            total=Count('pk'), centroid_latitude=Avg('latitude'), centroid_longitude=Avg('longitude'),
+            lowest_price=Min('price'), highest_price=Max('price'),
+        )
+        return [
+            modelClass(
+                precision=precision, cell=row['cell'], count=row['total'],
+                latitude=float(row['centroid_latitude']), longitude=float(row['centroid_longitude']),
+                min_price=row['lowest_price'], max_price=row['highest_price'],
+            )
+            for row in rows
+        ]
+    # ===============================================================================================================
+    # 
+    # 
+    # ===============================================================================================================
+    # Recompute the clusters containing the given geohashes (old and new position of a property) at every precision:
+    # one aggregate query per precision, one DELETE and one INSERT in a transaction.
+    # The cells are locked before they are computed, so two refreshes of the same cells (two processes)
+    # replace them one after the other and the last one always reads the last committed properties.
+    # Run in the background by cluster_refreshes (see clusters.py), never on the request path.
+    # ===============================================================================================================
+    @classmethod
+    def refresh_cells(modelClass, geohashes):
+        from django.db import transaction
+        from django.db.models import Q
+
+        geohashes = {geohash for geohash in geohashes if geohash}
+        if not geohashes:
+            return 0
+        stale = Q()
+        for precision in range(1, modelClass.MAX_PRECISION + 1):
+            stale |= Q(precision=precision, cell__in=sorted({geohash[:precision] for geohash in geohashes}))
+        with transaction.atomic():
+            modelClass.lock_cells({geohash[0] for geohash in geohashes})
+            modelClass.objects.filter(stale).delete()
+            clusters = []
+            for precision in range(1, modelClass.MAX_PRECISION + 1):
+                clusters.extend(modelClass.aggregate_cells(precision, sorted({geohash[:precision] for geohash in geohashes})))
+            modelClass.objects.bulk_create(clusters)
+        return len(clusters)
+    # ===============================================================================================================
+    # 
+    # 
+    # ===============================================================================================================
+    # Lock the clusters under some top cells (precision 1) until the end of the transaction, in a fixed order:
+    # an advisory lock per cell on PostgreSQL, the rows of the top cells elsewhere
+    # (SQLite locks the whole database with the DELETE that follows)
+    # ===============================================================================================================
+    @classmethod
+    def lock_cells(modelClass, cells):
+        import zlib
+        from django.db import connections
+
+        connection = connections[modelClass.objects.db]
+        cells = sorted(cells)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                for cell in cells:
+                    cursor.execute("SELECT pg_advisory_xact_lock(%s)", [zlib.crc32(f"cluster:{cell}".encode())])
+        else:
+            list(modelClass.objects.select_for_update().filter(precision=1, cell__in=cells).order_by('cell').values_list('pk'))
+    # ===============================================================================================================
+    # 
+    # 
+    # ===============================================================================================================
+    # Recompute all the clusters (first deployment, after bulk updates)
+    # ===============================================================================================================
+    @classmethod
+    def rebuild(modelClass):
+        from django.db import transaction
+
+        with transaction.atomic():
+            modelClass.objects.all().delete()
+            total = 0
+            for precision in range(1, modelClass.MAX_PRECISION + 1):
+                total += len(modelClass.objects.bulk_create(modelClass.aggregate_cells(precision), batch_size=1000))
+        return total
+    # ===============================================================================================================
+# ==========================================================================================================
+# End PropertyCluster Model
+# ==========================================================================================================
+# 
+# 
+# 
+# 
+# ==========================================================================================================
+# A bulk import of listings from a feed file (CSV or JSON Lines) sent by an agency, run by the
+# import_properties command or in the background from the admin endpoint (see imports.py).
+# The offset is the number of data rows already processed and committed: a stopped import resumes from there.
+# The rows rejected by the validation are reported with their number and their errors.
+# ==========================================================================================================
+def property_import_upload_path(instance, filename):
+    import os
+    ext = os.path.splitext(filename)[1]
+    return f"properties/imports/{uuid.uuid4()}{ext}"
+
+
+class PropertyImport(models.Model):
+    FORMAT_CSV = 'csv'
+    FORMAT_JSONL = 'jsonl'
+    FORMAT_CHOICES = [(FORMAT_CSV, 'CSV'), (FORMAT_JSONL, 'JSON Lines')]
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [(STATUS_PENDING, 'Pending'), (STATUS_RUNNING, 'Running'), (STATUS_DONE, 'Done'), (STATUS_FAILED, 'Failed')]
+    # a running import saves its progress after every batch, a pending or running import silent
+    # for longer was stopped with its process and can be resumed
+    STALE_MINUTES = 10
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # the owner of the imported properties and the user who started the import
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='property_imports', verbose_name="Owner")
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name="Created By")
+    file = models.FileField(upload_to=property_import_upload_path, max_length=255, verbose_name="Feed File")
+    format = models.CharField(max_length=5, choices=FORMAT_CHOICES, verbose_name="Format")
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True, verbose_name="Status")
+    offset = models.PositiveIntegerField(default=0, verbose_name="Rows Processed")
+    created_count = models.PositiveIntegerField(default=0, verbose_name="Properties Created")
+    failed_count = models.PositiveIntegerField(default=0, verbose_name="Rows Rejected")
+    # [{"row": number of the data row (1 = first), "errors": {field: [messages]}}], the first IMPORT_MAX_REPORTED_ERRORS
+    errors = models.JSONField(default=list, blank=True, verbose_name="Errors")
+    message = models.TextField(blank=True, default='', verbose_name="Message")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Property Import"
+        verbose_name_plural = "Property Imports"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Import {self.id} ({self.status}, {self.offset} rows)"
+# ==========================================================================================================
+# End PropertyImport Model
+# ==========================================================================================================
+# 
+# 
+# 
+# 
+# ==========================================================================================================
+# Daily rollup of the views of a property: one row per property and day, incremented by the flushes of the
+# view tracking buffer (see tracking.py). A visitor is counted once per PROPERTY_VIEW_WINDOW_SECONDS,
+# while Property.views_count is the number of distinct visitors that ever viewed the property.
+# ==========================================================================================================
+class PropertyDailyView(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='daily_views', verbose_name="Property")
+    date = models.DateField(verbose_name="Date")
+    views = models.PositiveIntegerField(default=0, verbose_name="Views")
+
+    class Meta:
+        verbose_name = "Property Daily View"
+        verbose_name_plural = "Property Daily Views"
+        ordering = ['-date']
+        unique_together = [('property', 'date')]
+
+    def __str__(self):
+        return f"{self.property_id} {self.date}: {self.views}"
+# ==========================================================================================================
+# End PropertyDailyView Model
+# ==========================================================================================================
+# 
+# 
+# 
+# 
+# ==========================================================================================================
+# Precomputed "similar properties" of a property: its SIMILAR_PROPERTIES_COUNT nearest active listings
+# of the same city, ranked by score (see similar.py). The similar endpoint reads the rows of one property
+# by the (property, rank) index. The rows are rebuilt by the rebuild_similar_properties command and
+# refreshed in the background when a property is created or changes.
+# ==========================================================================================================
+class PropertySimilarity(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='similar_properties', verbose_name="Property")
+    similar = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='similar_to', verbose_name="Similar Property")
+    rank = models.PositiveSmallIntegerField(verbose_name="Rank")
+    score = models.FloatField(verbose_name="Score")
+
+    class Meta:
+        verbose_name = "Property Similarity"
+        verbose_name_plural = "Property Similarities"
+        ordering = ['property', 'rank']
+        unique_together = [('property', 'rank')]
+
+    def __str__(self):
+        return f"{self.property_id} #{self.rank}: {self.similar_id} ({self.score:.3f})"
+# ==========================================================================================================
+# End PropertySimilarity Model
+# ==========================================================================================================
@@ -0,0 +1,164 @@
+import contextvars
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from notifications.models import Notification
+from utils.cache import bump_cache_version
+from .clusters import cluster_refreshes
+from .models import Comment, Property, PropertySimilarity
+from .similar import similar_refreshes
+
+
+# ==============================================================================
+# True while a bulk action deletes rows: the receivers of each deleted property / comment
+# (cached responses, map clusters, counters, see signals.py) skip their work,
+# the action applies it once per chunk instead.
+# ==============================================================================
+_bulk_moderation = contextvars.ContextVar('bulk_moderation', default=False)
+
+
+def in_bulk_moderation():
+    return _bulk_moderation.get()
+
+
+class BulkModeration:
+    model = None
+    # action -> values written by the UPDATE
+    ACTIONS = {}
+
+    def __init__(self, action_user, chunk_size=None):
+        self.action_user = action_user
+        self.chunk_size = chunk_size or getattr(settings, 'BULK_MODERATION_CHUNK_SIZE', 500)
+
+    # ==========================================================================
+    # chunks of primary keys of a list of ids or of a queryset (read by primary key ranges,
+    # the rows updated or deleted by a chunk do not shift the next chunks)
+    # ==========================================================================
+    def chunks(self, targets):
+        if isinstance(targets, (list, tuple, set)):
+            targets = list(dict.fromkeys(targets))
+            for start in range(0, len(targets), self.chunk_size):
+                yield targets[start:start + self.chunk_size]
+            return
+        ids = targets.order_by('pk').values_list('pk', flat=True)
+        last = None
+        while True:
+            chunk = list((ids if last is None else ids.filter(pk__gt=last))[:self.chunk_size])
+            if not chunk:
+                return
+            yield chunk
+            last = chunk[-1]
+
+    # ==========================================================================
+    # apply an action to a list of ids or to a queryset, one transaction per chunk,
+    # returns the number of rows changed (rows already in the state of the action are skipped)
+    # ==========================================================================
+    def apply(self, action, targets):
+        method = self.delete_chunk if action == 'delete' else self.update_chunk
+        count = 0
+        for chunk in self.chunks(targets):
+            with transaction.atomic():
+                count += method(action, chunk)
+        return count
+
+    def delete_rows(self, ids):
+        token = _bulk_moderation.set(True)
+        try:
+            self.model.objects.filter(pk__in=ids).delete()
+        finally:
+            _bulk_moderation.reset(token)
+# ==============================================================================
+
+
+# ==============================================================================
+# Block / unblock / activate / deactivate / delete properties in bulk:
+# one UPDATE ... WHERE id IN (...) per chunk, the owners are notified of a block / unblock
+# with one INSERT, the map clusters and the cached responses are refreshed once per chunk.
+#   PropertyModeration(request.user).apply('block', [id1, id2])
+#   PropertyModeration(request.user).apply('delete', PropertyFilter(data, queryset).qs)
+# ==============================================================================
+class PropertyModeration(BulkModeration):
+    model = Property
+    ACTIONS = {
+        'block': {'is_blocked': True},
+        'unblock': {'is_blocked': False},
+        'activate': {'status': True},
+        'deactivate': {'status': False},
+    }
+    # notification type -> action word, like AdminPropertyBlockView
+    NOTIFICATIONS = {'block': 'blocked', 'unblock': 'unblocked'}
+
+    def update_chunk(self, action, ids):
+        values = self.ACTIONS[action]
+        rows = list(Property.objects.filter(pk__in=ids).exclude(**values).values_list('pk', 'user_id', 'title', 'geohash'))
+        if not rows:
+            return 0
+        changed = [row[0] for row in rows]
+        Property.objects.filter(pk__in=changed).update(updated_at=timezone.now(), **values)
+        # the blocked / disabled properties leave the map, the others come back
+        cluster_refreshes.schedule({row[3] for row in rows})
+        if action in self.NOTIFICATIONS:
+            Notification.objects.create_notifications(
+                self.action_user, action, [(user_id, pk, title) for pk, user_id, title, _ in rows],
+                type_item="property", action=self.NOTIFICATIONS[action],
+            )
+        transaction.on_commit(lambda: self.invalidate(changed))
+        # the blocked / disabled properties leave the similar lists, the others come back
+        similar_refreshes.schedule(changed)
+        return len(rows)
+
+    def delete_chunk(self, action, ids):
+        rows = list(Property.objects.filter(pk__in=ids).values_list('pk', 'geohash'))
+        if not rows:
+            return 0
+        deleted = [row[0] for row in rows]
+        listing = list(PropertySimilarity.objects.filter(similar_id__in=deleted).exclude(property_id__in=deleted).values_list('property_id', flat=True).distinct())
+        # the images, variants, comments and search tokens follow by cascade,
+        # the files of the images and videos are released by the uploads app
+        self.delete_rows(deleted)
+        cluster_refreshes.schedule({row[1] for row in rows})
+        transaction.on_commit(lambda: self.invalidate(deleted))
+        similar_refreshes.schedule(listing)
+        return len(rows)
+
+    def invalidate(self, property_ids):
+        bump_cache_version('properties')
+        Property.bump_cache_versions(property_ids)
+# ==============================================================================
+
+
+# ==============================================================================
+# Hide / show / delete comments in bulk: one UPDATE (or DELETE) per chunk, then the
+# counters the signals would have updated one comment at a time are recounted at once:
+# reply_count of the parents and comments_count of the properties.
+#   CommentModeration(request.user).apply('hide', [id1, id2])
+# ==============================================================================
+class CommentModeration(BulkModeration):
+    model = Comment
+    ACTIONS = {
+        'hide': {'status': False},
+        'show': {'status': True},
+    }
+
+    def update_chunk(self, action, ids):
+        values = self.ACTIONS[action]
+        rows = list(Comment.objects.filter(pk__in=ids).exclude(**values).values_list('pk', 'property_id', 'parent_id'))
+        if not rows:
+            return 0
+        Comment.objects.filter(pk__in=[row[0] for row in rows]).update(updated_at=timezone.now(), **values)
+        Comment.refresh_reply_counts({row[2] for row in rows if row[2]})
+        Property.bump_cache_versions({row[1] for row in rows})
+        return len(rows)
+
+    def delete_chunk(self, action, ids):
+        rows = list(Comment.objects.filter(pk__in=ids).values_list('pk', 'property_id', 'parent_id'))
+        if not rows:
+            return 0
+        # the replies of the deleted comments follow by cascade
+        self.delete_rows([row[0] for row in rows])
+        property_ids = {row[1] for row in rows}
+        Property.refresh_counters(property_ids, fields=['comments_count'])
+        Comment.refresh_reply_counts({row[2] for row in rows if row[2]})
+        Property.bump_cache_versions(property_ids, counters=True)
+        return len(rows)
+# ==============================================================================
@@ -135,3 +135,14 @@ class CanDeleteProperty(BasePermission):
             request.user.has_perm('properties.delete_property')
         )
 # ===============================================================================
+# 
+# ===============================================================================
+# permissions can import properties from a feed
+# ===============================================================================
+class CanImportProperties(BasePermission):
+    def has_permission(self, request, view):
+        return request.user.is_authenticated and (
+            request.user.is_staff or 
+            request.user.has_perm('properties.add_propertyimport')
+        )
+# ===============================================================================
@@ -1,10 +1,26 @@
 
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 from rest_framework import serializers
+from rest_framework.fields import get_error_detail
+from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.db import transaction
 from properties.rules import COMMENT_RULES, PRICETYPE_RULES, PROPERTY_RULES
-from utils.helpers import handle_file_update
+from utils.background import submit_task
+from utils.cache import bump_cache_version
+from utils.helpers import safe_delete_file
+from utils.reference import ReferenceField, get_reference, get_references
 from utils.validators import DynamicValidator
-from .models import PriceType, Property, PropertyImage, Comment
+from .models import PriceType, Property, PropertyImage, PropertyImageVariant, Comment, PropertyCluster, PropertyImport
+from .filters import PropertyFilter
+from .images import generate_image_variants
+from .threads import CommentThreadBuilder
+from uploads.models import UploadSession
+from uploads.serializers import UploadSessionField
+from .interactions import PropertyInteractionResolver
 from categories.models import CategoryType, MainCategory, SubCategory
 from settings_app.models import City
 from categories.models import CategoryType, MainCategory, SubCategory
@@ -80,10 +96,45 @@ class PriceTypeSerializer(serializers.ModelSerializer):
 #  Serializer (Property Images)                    
 # =============================================================================================================================
 class PropertyImageSerializer(serializers.ModelSerializer):
+    srcset = serializers.SerializerMethodField(read_only=True)
+    variants = serializers.SerializerMethodField(read_only=True)
     class Meta:
         model = PropertyImage
-        fields = ['id', 'image']
+        fields = ['id', 'image', 'srcset', 'variants']
         read_only_fields = ['id']
+
+    # the variants generated in the background (see images.py), prefetched by the views with images__variants
+    def get_ready_variants(self, image):
+        if image.variants_status != PropertyImage.VARIANTS_READY:
+            return []
+        return list(image.variants.all())
+
+    def get_file_url(self, file):
+        if not file:
+            return None
+        request = self.context.get('request')
+        return request.build_absolute_uri(file.url) if request is not None else file.url
+
+    # format => "url 320w, url 800w, url 1600w" for <source srcset>, the original image until the variants are ready
+    def get_srcset(self, image):
+        variants = self.get_ready_variants(image)
+        srcset = {}
+        for format, _ in PropertyImageVariant.FORMAT_CHOICES:
+            # a small original gives several variants of the same width, one candidate per width
+            candidates = {variant.width: self.get_file_url(variant.file) for variant in reversed(variants) if variant.format == format}
+            srcset[format] = ", ".join(f"{url} {width}w" for width, url in sorted(candidates.items())) if candidates else self.get_file_url(image.image)
+        return srcset
+
+    # size => {"webp", "jpeg", "width", "height"}, a missing variant falls back to the original image
+    def get_variants(self, image):
+        original = self.get_file_url(image.image)
+        variants = {
+            size: {'webp': original, 'jpeg': original, 'width': None, 'height': None}
+            for size, _ in PropertyImageVariant.SIZE_CHOICES
+        }
+        for variant in self.get_ready_variants(image):
+            variants[variant.size].update({variant.format: self.get_file_url(variant.file), 'width': variant.width, 'height': variant.height})
+        return variants
 # =============================================================================================================================
 # 
 # =============================================================================================================================
@@ -92,9 +143,11 @@ class PropertyImageSerializer(serializers.ModelSerializer):
 class CommentSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     replies = serializers.SerializerMethodField(read_only=True)   
+    replies_count = serializers.SerializerMethodField(read_only=True)
+    more_replies = serializers.SerializerMethodField(read_only=True)
     class Meta:
         model = Comment
-        fields = ['id', 'user', 'comment', 'property', 'parent', 'status', 'replies', 'created_at', 'updated_at']
+        fields = ['id', 'user', 'comment', 'property', 'parent', 'status', 'replies', 'replies_count', 'more_replies', 'created_at', 'updated_at']
         read_only_fields = ['id', 'user', 'created_at', 'updated_at', 'replies', 'property' ]
      
     #  get dynamic validation rules for create and update
@@ -107,79 +160,117 @@ class CommentSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(error.message_dict)
         return super().to_internal_value(validation_data)       
    
-    # get replies for comment 
+    # replies attached by CommentThreadBuilder (threads.py), no query here:
+    # a comment serialized outside of a thread (create, update) is returned without its replies
     def get_replies(self, object):
-        if object.replies.exists():
-            serializer = CommentSerializer(object.replies.all(), many=True)
-            return serializer.data
-        return []
+        replies = getattr(object, 'thread_replies', [])
+        return CommentSerializer(replies, many=True, context=self.context).data
+
+    # number of visible direct replies (maintained by the signals)
+    def get_replies_count(self, object):
+        return object.reply_count
+
+    # url of the replies not displayed (depth or replies limit reached), null when all are displayed
+    def get_more_replies(self, object):
+        return getattr(object, 'thread_more_replies', None)
     
+    # the path of the reply tree has a maximum depth (Comment.MAX_DEPTH)
+    def validate_parent(self, parent):
+        if parent is not None and parent.depth >= Comment.MAX_DEPTH:
+            raise serializers.ValidationError("This thread is too deep to reply to this comment.")
+        return parent
+
     # create comment with user from request
     def create(self, data):
         data['user'] = self.context['request'].user
         return super().create(data)
+
+    # a reply never moves to another parent (its path is set on creation)
+    def update(self, instance, data):
+        data.pop('parent', None)
+        return super().update(instance, data)
 # =============================================================================================================================
     
 
 
+# =============================================================================================================================
+# is_liked / is_favorited of the current user for every property serializer, read from the resolver of the request.
+# Lists go through PropertyInteractionListSerializer which loads the flags of the whole page first:
+# one query per relationship for the page instead of two queries per row.
+# =============================================================================================================================
+class PropertyInteractionListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        items = list(data.all() if hasattr(data, 'all') else data)
+        PropertyInteractionResolver.for_request(self.context.get('request')).prime([item.pk for item in items])
+        return super().to_representation(items)
+
+
+class PropertyInteractionMixin(serializers.Serializer):
+    is_liked = serializers.SerializerMethodField(read_only=True)
+    is_favorited = serializers.SerializerMethodField(read_only=True)
+
+    def get_is_liked(self, object):
+        return PropertyInteractionResolver.for_request(self.context.get('request')).is_liked(object.pk)
+
+    def get_is_favorited(self, object):
+        return PropertyInteractionResolver.for_request(self.context.get('request')).is_favorited(object.pk)
 # =============================================================================================================================
 # Serializer Property deteils                
 # =============================================================================================================================
-class PropertyDetailSerializer(serializers.ModelSerializer):
+class PropertyDetailSerializer(PropertyInteractionMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
-    city = serializers.StringRelatedField(read_only=True)
-    price_type = serializers.StringRelatedField(read_only=True)   
-    category_type = CateforyTypeSerializer(read_only=True)
-    main_category = MainCategorySerializer(read_only=True)
-    sub_category = SubCategorySerializer(read_only=True)
+    # read from the process-local reference cache, never joined (see utils/reference.py)
+    city = ReferenceField(City)
+    price_type = ReferenceField(PriceType)
+    category_type = ReferenceField(CategoryType, serializer=CateforyTypeSerializer)
+    main_category = ReferenceField(MainCategory, serializer=MainCategorySerializer)
+    sub_category = ReferenceField(SubCategory, serializer=SubCategorySerializer)
   
     comments = serializers.SerializerMethodField(read_only=True)
     images = PropertyImageSerializer(many=True, read_only=True)
-
-    comments_count = serializers.SerializerMethodField(read_only=True)
-    views_count = serializers.SerializerMethodField(read_only=True)
-    likes_count = serializers.SerializerMethodField(read_only=True)
-    favorites_count = serializers.SerializerMethodField(read_only=True)
-    is_liked = serializers.SerializerMethodField(read_only=True)
-    is_favorited = serializers.SerializerMethodField(read_only=True)
     
     class Meta:
         model = Property
         fields = ['id', 'title', 'description', 'user', 'category_type', 'main_category', 'sub_category',
-            'city', 'address', 'area', 'is_owner', 'price', 'price_type', 'video', 'status', 'is_blocked',
+            'city', 'address', 'latitude', 'longitude', 'area', 'is_owner', 'price', 'price_type', 'video', 'status', 'is_blocked',
             'views_count', 'comments_count', 'likes_count', 'favorites_count', 'is_liked', 'is_favorited', 'images', 'comments',
              'created_at', 'updated_at']
+        list_serializer_class = PropertyInteractionListSerializer
         # read_only_fields =  fields
 
+    # visible root comments with their threads: two queries whatever the size of the threads
     def get_comments(self, object):
-        if object.comments.exists():
-            serializer = CommentSerializer(object.comments.filter(parent=None), many=True)
-            return serializer.data
-        return []
-    
-    def get_comments_count(self, object):
-        return object.comments.count()
-    
-    def get_views_count(self, object):
-        return object.views.count()
-    
-    def get_likes_count(self, object):
-        return object.likes.count()
-    
-    def get_favorites_count(self, object):
-        return object.favorites.count()
-    
-    def get_is_liked(self, object):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return object.likes.filter(id=request.user.id).exists()
-        return False
+        roots = object.comments.filter(parent__isnull=True, status=True).select_related('user').order_by('-created_at', '-pk')
+        comments = CommentThreadBuilder(self.context.get('request')).attach(roots)
+        return CommentSerializer(comments, many=True, context=self.context).data
     
-    def get_is_favorited(self, object):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return object.favorites.filter(id=request.user.id).exists()
-        return False
+# =============================================================================================================================
+# 
+# =============================================================================================================================
+# ListField validating its items concurrently in a bounded pool of threads (IMAGE_VALIDATION_WORKERS):
+# each uploaded image is decoded and verified by Pillow, which releases the GIL while it works on the data.
+# The errors are reported per index like ListField.
+# =============================================================================================================================
+class ConcurrentListField(serializers.ListField):
+    def run_child_validation(self, data):
+        workers = min(len(data), getattr(settings, 'IMAGE_VALIDATION_WORKERS', 4))
+        if workers < 2:
+            return super().run_child_validation(data)
+
+        def validate(item):
+            try:
+                return self.child.run_validation(item), None
+            except serializers.ValidationError as error:
+                return None, error.detail
+            except ValidationError as error:
+                return None, get_error_detail(error)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(validate, data))
+        errors = {index: detail for index, (_, detail) in enumerate(results) if detail is not None}
+        if errors:
+            raise serializers.ValidationError(errors)
+        return [value for value, _ in results]
 # =============================================================================================================================
 # 
 # =============================================================================================================================
@@ -187,17 +278,30 @@ class PropertyDetailSerializer(serializers.ModelSerializer):
 # =============================================================================================================================
 class PropertyCreateSerializer(serializers.ModelSerializer):
 
-    images = serializers.ListField(child=serializers.ImageField(), write_only=True)   
+    # the images are sent in this request or uploaded beforehand (image_uploads), one of them is required on create
+    images = ConcurrentListField(child=serializers.ImageField(), write_only=True, required=False)   
     category_type = serializers.UUIDField(write_only=True)
     main_category = serializers.UUIDField(write_only=True)
     sub_category = serializers.UUIDField(write_only=True)
     city = serializers.UUIDField(write_only=True)
     price_type = serializers.UUIDField(write_only=True)
+    # ids of finalized resumable uploads (uploads app), moved to the property instead of sent in this request
+    image_uploads = UploadSessionField(kind=UploadSession.KIND_IMAGE, many=True, required=False, write_only=True)
+    video_upload = UploadSessionField(kind=UploadSession.KIND_VIDEO, required=False, write_only=True)
+
+    # reference fields sent as uuids => their model
+    REFERENCE_MODELS = {
+        'category_type': CategoryType,
+        'main_category': MainCategory,
+        'sub_category': SubCategory,
+        'city': City,
+        'price_type': PriceType,
+    }
     
     class Meta:
         model = Property
-        fields = ['title', 'description', 'category_type', 'main_category', 'sub_category', 'city', 'address', 'area',
-            'is_owner', 'price', 'price_type', 'video', 'images']
+        fields = ['title', 'description', 'category_type', 'main_category', 'sub_category', 'city', 'address', 'latitude', 'longitude', 'area',
+            'is_owner', 'price', 'price_type', 'video', 'images', 'image_uploads', 'video_upload']
         read_only_fields = ['user']
     
     # ========================================================================
@@ -212,97 +316,234 @@ class PropertyCreateSerializer(serializers.ModelSerializer):
         return super().to_internal_value(validation_data)
     # ========================================================================
 
+    def validate(self, data):
+        if self.instance is None and not data.get('images') and not data.get('image_uploads'):
+            raise serializers.ValidationError({'images': ['This field is required.']})
+        return self.resolve_references(data)
+
+    # ========================================================================
+    # check all the sent references against the process-local reference cache (no query,
+    # see utils/reference.py) and set them as instances, the search index reads their names
+    def resolve_references(self, data):
+        missing = []
+        for field, model in self.REFERENCE_MODELS.items():
+            if field in data:
+                data[field] = get_reference(model, data[field])
+                if data[field] is None:
+                    missing.append(field)
+        if missing:
+            raise serializers.ValidationError({field: ['Object with this id does not exist.'] for field in missing})
+        return data
+    # ========================================================================
+
+    # ========================================================================
+    # Insert the images of a property with one bulk INSERT: the files sent in the request
+    # and the files of the attached upload sessions (moved, not copied), then drop the sessions.
+    # bulk_create sends no post_save: the variants are queued here, and the cached responses
+    # are invalidated once the transaction is committed so no reader caches the old state meanwhile.
+    def save_images(self, property, images, image_uploads):
+        with ExitStack() as stack:
+            files = list(images) + [stack.enter_context(session.open_file()) for session in image_uploads]
+            created = PropertyImage.objects.bulk_create([PropertyImage(property=property, image=file) for file in files])
+        for session in image_uploads:
+            session.delete()
+        for image in created:
+            submit_task(generate_image_variants, image.pk)
+        return created
+
+    def save_video_upload(self, property, video_upload):
+        with video_upload.open_file() as file:
+            property.video = file
+            property.save(update_fields=['video', 'updated_at'])
+        video_upload.delete()
+
+    def invalidate_on_commit(self, property):
+        def invalidate():
+            bump_cache_version('properties')
+            Property.bump_cache_versions([property.pk])
+        transaction.on_commit(invalidate)
+    # ========================================================================
+
+    # ========================================================================
+    # the property, its images and its attached uploads are written in one transaction
     def create(self, data):
-        if "images" in data:
-            images = data.pop('images', [])       
-        data['category_type']   = CategoryType.objects.get(id=data.pop('category_type'))
-        data['main_category']   = MainCategory.objects.get(id=data.pop('main_category'))
-        data['sub_category']    = SubCategory.objects.get(id=data.pop('sub_category'))
-        data['city']            = City.objects.get(id=data.pop('city'))
-        data['price_type']      = PriceType.objects.get(id=data.pop('price_type'))
-        data['user']            = self.context['request'].user
-
-        property_created = super().create(data)
-        if property_created:
-            for image in images:
-                PropertyImage.objects.create(property=property_created, image=image)
-        
+        images = data.pop('images', [])
+        image_uploads = data.pop('image_uploads', [])
+        video_upload = data.pop('video_upload', None)
+        data['user'] = self.context['request'].user
+
+        with transaction.atomic():
+            property_created = super().create(data)
+            self.save_images(property_created, images, image_uploads)
+            if video_upload is not None:
+                self.save_video_upload(property_created, video_upload)
+            self.invalidate_on_commit(property_created)
         return property_created
     
     def update(self, instance, data):
-        if 'images' in data:
-            images = data.pop('images', [])
-        
-        if 'category_type' in data:
-            instance.category_type = CategoryType.objects.get(id=data.pop('category_type'))       
-        if 'main_category' in data:
-            instance.main_category = MainCategory.objects.get(id=data.pop('main_category'))       
-        if 'sub_category' in data:
-            instance.sub_category = SubCategory.objects.get(id=data.pop('sub_category'))        
-        if 'city' in data:
-            instance.city = City.objects.get(id=data.pop('city'))        
-        if 'price_type' in data:
-            instance.price_type = PriceType.objects.get(id=data.pop('price_type'))
-        
-        updated = super().update(instance, data)
-        
-        if updated:
-            if images:  
-                if isinstance(images, list):
-                    for image_file in images:
-                        PropertyImage.objects.create(property=updated, image=image_file)
-                elif isinstance(images, dict):
-                    if "image" in images:  
-                        image_file = images["image"]
-                        handle_file_update(image_file, instance.image)
-                    
-                    for key, image_file in images.items():
-                        if key != "image":  
-                            PropertyImage.objects.create(property=updated, image=image_file)
-            
+        images = data.pop('images', [])
+        image_uploads = data.pop('image_uploads', [])
+        video_upload = data.pop('video_upload', None)
+
+        with transaction.atomic():
+            updated = super().update(instance, data)
+            self.save_images(updated, images, image_uploads)
+            if video_upload is not None:
+                safe_delete_file(instance.video)
+                self.save_video_upload(updated, video_upload)
+            self.invalidate_on_commit(updated)
         return instance
 # =============================================================================================================================
 # 
 # =============================================================================================================================
 # Serializer Property globals 
 # =============================================================================================================================
-class PropertyListSerializer(serializers.ModelSerializer):
+class PropertyListSerializer(PropertyInteractionMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
-    city = serializers.StringRelatedField(read_only=True)
-    price_type = serializers.StringRelatedField(read_only=True)
-    category_type = CateforyTypeSerializer(read_only=True)
-    main_category = MainCategorySerializer(read_only=True)
-    sub_category = SubCategorySerializer(read_only=True)
+    # read from the process-local reference cache, never joined (see utils/reference.py)
+    city = ReferenceField(City)
+    price_type = ReferenceField(PriceType)
+    category_type = ReferenceField(CategoryType, serializer=CateforyTypeSerializer)
+    main_category = ReferenceField(MainCategory, serializer=MainCategorySerializer)
+    sub_category = ReferenceField(SubCategory, serializer=SubCategorySerializer)
     
     images = PropertyImageSerializer(many=True, read_only=True)
-    views_count = serializers.SerializerMethodField(read_only=True)
-    likes_count = serializers.SerializerMethodField(read_only=True)
-    comments_count = serializers.SerializerMethodField(read_only=True)
+    # only present when the list is filtered with ?near=lat,lng
+    distance_km = serializers.FloatField(read_only=True)
     
     class Meta:
         model = Property
         fields = ['id', 'title', 'description', 'user', 
-                  'city', 'address', 'area', 'category_type', 
+                  'city', 'address', 'latitude', 'longitude', 'distance_km', 'area', 'category_type', 
                   'price', 'price_type', 'main_category',
                   'sub_category', 'status', 'is_blocked', 
                   'views_count', 'likes_count', 'comments_count', 
-                  'images', 'created_at']
+                  'is_liked', 'is_favorited', 'images', 'created_at']
+        list_serializer_class = PropertyInteractionListSerializer
         
     
-    def get_views_count(self, object):
-        return object.views.count()
-    
-    def get_likes_count(self, object):
-        return object.likes.count()
-    
-    def get_comments_count(self, object):
-        return object.comments.count()
 # =============================================================================================================================
+# 
+# =============================================================================================================================
+# Serializer map clusters (read only)
+# =============================================================================================================================
+class PropertyClusterSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PropertyCluster
+        fields = ['cell', 'count', 'latitude', 'longitude', 'min_price', 'max_price']
+        read_only_fields = fields
+# =============================================================================================================================
+# 
+# =============================================================================================================================
+# One row of an import feed (see imports.py): the fields and the rules of PropertyCreateSerializer,
+# the references can be sent as ids or as names (city "Casablanca", price type "monthly_rent" ...),
+# and the images as URLs (http / https) or paths under IMPORT_MEDIA_ROOT, fetched in the background.
+# =============================================================================================================================
+class PropertyFeedRowSerializer(PropertyCreateSerializer):
+    images = serializers.ListField(child=serializers.CharField(max_length=1000), required=False, write_only=True)
+    category_type = serializers.CharField(write_only=True)
+    main_category = serializers.CharField(write_only=True)
+    sub_category = serializers.CharField(write_only=True)
+    city = serializers.CharField(write_only=True)
+    price_type = serializers.CharField(write_only=True)
+    image_uploads = None
+    video_upload = None
+
+    # field of the name of each reference model
+    REFERENCE_NAME_FIELDS = {
+        'category_type': 'title',
+        'main_category': 'title',
+        'sub_category': 'title',
+        'city': 'name',
+        'price_type': 'name',
+    }
+
+    class Meta(PropertyCreateSerializer.Meta):
+        fields = ['title', 'description', 'category_type', 'main_category', 'sub_category', 'city', 'address', 'latitude', 'longitude', 'area',
+            'is_owner', 'price', 'price_type', 'images']
 
+    # the images are optional, only the references are checked
+    def validate(self, data):
+        for field, name_field in self.REFERENCE_NAME_FIELDS.items():
+            if field in data:
+                data[field] = self.reference_id(self.REFERENCE_MODELS[field], name_field, data[field])
+        return self.resolve_references(data)
+
+    def reference_id(self, model, name_field, value):
+        try:
+            return uuid.UUID(value)
+        except ValueError:
+            value = value.strip().lower()
+            for row in get_references(model):
+                if str(getattr(row, name_field)).lower() == value:
+                    return row.pk
+        return None
 
+    def validate_images(self, images):
+        for source in images:
+            if not source.startswith(('http://', 'https://')) and (os.path.isabs(source) or '..' in source.split('/')):
+                raise serializers.ValidationError(f'"{source}" is neither a URL nor a path under the import media directory.')
+        return images
 
+    # validated values that can be sent back from a worker process: the references as <field>_id
+    def get_row_values(self, validated_data):
+        values = dict(validated_data)
+        for field in self.REFERENCE_MODELS:
+            if field in values:
+                values[f'{field}_id'] = values.pop(field).pk
+        return values
+# =============================================================================================================================
+# 
+# =============================================================================================================================
+# Serializer of the bulk imports (admin): the feed file is sent once, the progress is read from the same object
+# =============================================================================================================================
+class PropertyImportSerializer(serializers.ModelSerializer):
+    owner = serializers.PrimaryKeyRelatedField(queryset=User.objects.all(), required=False)
+    format = serializers.ChoiceField(choices=PropertyImport.FORMAT_CHOICES, required=False)
 
+    class Meta:
+        model = PropertyImport
+        fields = ['id', 'owner', 'created_by', 'file', 'format', 'status', 'offset', 'created_count', 'failed_count',
+            'errors', 'message', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'created_by', 'status', 'offset', 'created_count', 'failed_count', 'errors', 'message', 'created_at', 'updated_at']
 
+    # the format is taken from the extension of the file when it is not sent
+    def validate(self, data):
+        if not data.get('format'):
+            extension = os.path.splitext(data['file'].name)[1].lower().lstrip('.')
+            formats = {'csv': PropertyImport.FORMAT_CSV, 'jsonl': PropertyImport.FORMAT_JSONL, 'ndjson': PropertyImport.FORMAT_JSONL}
+            if extension not in formats:
+                raise serializers.ValidationError({'format': ['Send the format (csv or jsonl) of this file.']})
+            data['format'] = formats[extension]
+        return data
+# =============================================================================================================================
+# 
+# =============================================================================================================================
+# Bodies of the bulk moderation (admin): the ids of the properties, or the filters of the admin list (PropertyFilter).
+# The unknown or invalid filters are rejected (PropertyFilter would ignore them and select every property),
+# an action on every property is only accepted with "all": true.
+# =============================================================================================================================
+class PropertyBulkModerationSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.UUIDField(), required=False, allow_empty=False)
+    filters = serializers.DictField(required=False)
+    all = serializers.BooleanField(default=False)
 
+    def validate(self, data):
+        if data.get('ids'):
+            return data
+        filters = data.get('filters') or {}
+        unknown = sorted(set(filters) - set(PropertyFilter.base_filters) - set(PropertyFilter.OPTIONS))
+        if unknown:
+            raise serializers.ValidationError({'filters': [f"Unknown filter: {name}." for name in unknown]})
+        filterset = PropertyFilter(data=filters, queryset=Property.objects.none())
+        if not filterset.is_valid():
+            raise serializers.ValidationError({'filters': filterset.errors})
+        applied = [name for name, value in filterset.form.cleaned_data.items() if value not in (None, '', [])]
+        if not applied and not data['all']:
+            raise serializers.ValidationError({'filters': ['Send the ids or the filters of the properties, or "all": true to apply the action to every property.']})
+        return data
 
 
+class CommentBulkModerationSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.UUIDField(), allow_empty=False)
+# =============================================================================================================================
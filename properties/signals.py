@@ -1,9 +1,203 @@
-from django.db.models.signals import post_migrate
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_migrate, m2m_changed, post_save, post_delete, pre_delete
 from django.dispatch import receiver
+from utils.background import submit_task
+from utils.cache import bump_cache_version
+from utils.reference import invalidate_references
+from .clusters import cluster_refreshes
+from .images import generate_image_variants
+from .models import PriceType, Property, PropertyImage, Comment, PropertySimilarity
+from .moderation import in_bulk_moderation
+from .similar import SIMILAR_FIELDS, similar_refreshes
 
 @receiver(post_migrate)
 def create_default_settings(sender, **kwargs):
     if sender.name == 'properties':
-        from .models import PriceType
         PriceType.default_types()
 
+
+# ==========================================================================================================
+# the price types are read from the process-local reference cache (utils/reference.py)
+# ==========================================================================================================
+@receiver(post_save, sender=PriceType)
+@receiver(post_delete, sender=PriceType)
+def invalidate_price_types(sender, instance, **kwargs):
+    invalidate_references(PriceType)
+# ==========================================================================================================
+
+
+# ==========================================================================================================
+# Keep the counter columns of Property in sync with the views / likes / favorites relationships.
+# The signal is received from both sides: property.likes.add(user) and user.property_likes.add(property).
+# Additions are applied as an atomic F() increment because Django only reports the rows really added,
+# removals and clears recount the affected properties because Django does not filter the removed ids.
+# ==========================================================================================================
+def sync_relation_counter(field, sender, instance, action, reverse, pk_set):
+    if reverse and action == 'pre_clear':
+        # remember which properties are affected before the rows disappear
+        target = Property._meta.get_field(Property.COUNTER_SOURCES[field]).m2m_reverse_field_name()
+        instance._cleared_property_ids = list(sender.objects.filter(**{target: instance.pk}).values_list('property_id', flat=True))
+        return
+
+    if action == 'post_add':
+        if reverse:
+            property_ids = pk_set
+            Property.objects.filter(pk__in=pk_set).update(**{field: F(field) + 1})
+        else:
+            property_ids = [instance.pk]
+            Property.objects.filter(pk=instance.pk).update(**{field: F(field) + len(pk_set)})
+    elif action in ('post_remove', 'post_clear'):
+        if not reverse:
+            property_ids = [instance.pk]
+        elif action == 'post_clear':
+            property_ids = getattr(instance, '_cleared_property_ids', [])
+        else:
+            property_ids = pk_set
+        Property.refresh_counters(property_ids, fields=[field])
+    else:
+        return
+    # the counters are displayed by the cached responses and order the lists sorted by them
+    Property.bump_cache_versions(property_ids, counters=True)
+
+
+@receiver(m2m_changed, sender=Property.views.through)
+def sync_views_count(sender, instance, action, reverse, pk_set, **kwargs):
+    sync_relation_counter('views_count', sender, instance, action, reverse, pk_set)
+
+
+@receiver(m2m_changed, sender=Property.likes.through)
+def sync_likes_count(sender, instance, action, reverse, pk_set, **kwargs):
+    sync_relation_counter('likes_count', sender, instance, action, reverse, pk_set)
+
+
+@receiver(m2m_changed, sender=Property.favorites.through)
+def sync_favorites_count(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse and action == 'pre_clear':
+        # remember which users lose a favorite before the rows disappear
+        instance._cleared_favorite_user_ids = list(sender.objects.filter(property_id=instance.pk).values_list('user_id', flat=True))
+    sync_relation_counter('favorites_count', sender, instance, action, reverse, pk_set)
+    # only the favorites lists of the users concerned changed
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        if reverse:
+            user_ids = [instance.pk]
+        elif action == 'post_clear':
+            user_ids = getattr(instance, '_cleared_favorite_user_ids', [])
+        else:
+            user_ids = pk_set
+        for user_id in user_ids:
+            bump_cache_version(Property.favorites_cache_namespace(user_id))
+# ==========================================================================================================
+
+
+# ==========================================================================================================
+# Any write on a property changes the results of the filtered lists,
+# bumping the version invalidates the cached counts of CustomDynamicPagination
+# and the cached responses of the lists and of the property (see Property.bump_cache_versions).
+# The bulk moderation (moderation.py) skips the receivers of the rows it deletes and bumps once per chunk.
+# ==========================================================================================================
+@receiver(post_save, sender=Property)
+@receiver(post_delete, sender=Property)
+def invalidate_properties_cache(sender, instance, **kwargs):
+    if in_bulk_moderation():
+        return
+    transaction.on_commit(lambda: bump_cache_version('properties'))
+    Property.bump_cache_versions([instance.pk])
+
+
+# the images and the comments are displayed by the cached responses of their property,
+# a created or deleted comment also changes comments_count
+@receiver(post_save, sender=PropertyImage)
+@receiver(post_delete, sender=PropertyImage)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_property_responses(sender, instance, raw=False, **kwargs):
+    if not raw and not in_bulk_moderation():
+        Property.bump_cache_versions([instance.property_id], counters=sender is Comment and kwargs.get('created', True))
+# ==========================================================================================================
+
+
+# ==========================================================================================================
+# Refresh the map clusters of a property when it appears, disappears or moves on the map:
+# created, deleted, blocked / unblocked, enabled / disabled, new coordinates or new price.
+# Both the old and the new cells are recomputed in the background once the save is committed,
+# other saves (title, description ...) cost nothing.
+# ==========================================================================================================
+@receiver(post_save, sender=Property)
+def refresh_property_clusters(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    loaded = getattr(instance, '_loaded_values', None)
+    current = {field: getattr(instance, field) for field in Property.CLUSTER_FIELDS}
+    if created or not loaded or any(field in loaded and loaded[field] != value for field, value in current.items()):
+        cluster_refreshes.schedule([instance.geohash, (loaded or {}).get('geohash')])
+    instance._loaded_values = current
+
+
+@receiver(post_delete, sender=Property)
+def remove_property_from_clusters(sender, instance, **kwargs):
+    if in_bulk_moderation():
+        return
+    cluster_refreshes.schedule([instance.geohash])
+# ==========================================================================================================
+
+
+# ==========================================================================================================
+# Keep Property.comments_count in sync when a comment (or a reply) is created or deleted,
+# and Comment.reply_count of the parent when a visible reply is created, hidden, shown again or deleted.
+# Deleting a comment cascades to its replies, Django sends post_delete for each one of them.
+# ==========================================================================================================
+@receiver(post_save, sender=Comment)
+def increment_comments_count(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        Property.objects.filter(pk=instance.property_id).update(comments_count=F('comments_count') + 1)
+        if instance.parent_id and instance.status:
+            Comment.objects.filter(pk=instance.parent_id).update(reply_count=F('reply_count') + 1)
+    elif instance.parent_id and hasattr(instance, '_loaded_status') and instance._loaded_status != instance.status:
+        if instance.status:
+            Comment.objects.filter(pk=instance.parent_id).update(reply_count=F('reply_count') + 1)
+        else:
+            Comment.objects.filter(pk=instance.parent_id, reply_count__gt=0).update(reply_count=F('reply_count') - 1)
+    instance._loaded_status = instance.status
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comments_count(sender, instance, **kwargs):
+    if in_bulk_moderation():
+        return
+    Property.objects.filter(pk=instance.property_id, comments_count__gt=0).update(comments_count=F('comments_count') - 1)
+    if instance.parent_id and getattr(instance, '_loaded_status', instance.status):
+        Comment.objects.filter(pk=instance.parent_id, reply_count__gt=0).update(reply_count=F('reply_count') - 1)
+# ==========================================================================================================
+
+
+# ==========================================================================================================
+# Generate the resized variants of an uploaded image in the background once it is committed (see images.py).
+# The files of the deleted images and variants are released by the uploads app (content-addressed storage).
+# ==========================================================================================================
+@receiver(post_save, sender=PropertyImage)
+def generate_property_image_variants(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        submit_task(generate_image_variants, instance.pk)
+# ==========================================================================================================
+
+
+# ==========================================================================================================
+# Schedule the refresh of the similar properties (see similar.py) once the write is committed:
+# a property created or saved with one of the compared fields, and the properties that listed a deleted one.
+# ==========================================================================================================
+@receiver(post_save, sender=Property)
+def refresh_similar_on_save(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw or (update_fields is not None and not SIMILAR_FIELDS & set(update_fields)):
+        return
+    similar_refreshes.schedule([instance.pk])
+
+
+@receiver(pre_delete, sender=Property)
+def refresh_similar_on_delete(sender, instance, **kwargs):
+    if in_bulk_moderation():
+        return
+    similar_refreshes.schedule(PropertySimilarity.objects.filter(similar=instance).values_list('property_id', flat=True))
+# ==========================================================================================================
@@ -0,0 +1,272 @@
+import atexit
+import multiprocessing
+import zlib
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import django
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count
+from search.normalization import tokenize
+from settings_app.models import City
+from utils.background import RefreshQueue, run_task
+from utils.cache import bump_cache_version
+from .models import Property, PropertySimilarity
+
+
+# ==============================================================================
+# "Similar properties": the nearest active listings of the same city, precomputed in PropertySimilarity.
+# The score of two listings combines, with SIMILARITY_WEIGHTS (sum 1):
+#   - same sub category, same price type (1 or 0)
+#   - title: cosine of their token vectors (tokens of the search index, hashed on TITLE_DIMENSIONS columns)
+#   - price and area: exp(-gap), the gap of their logarithms in standard deviations of the city
+# The first three are the dot product of the rows of one normalized feature matrix of the city
+# (unit title vectors and one-hot columns, scaled by the square roots of their weights),
+# computed with NumPy a block of rows at a time.
+# ==============================================================================
+SIMILARITY_WEIGHTS = {
+    'sub_category': 0.30,
+    'price_type': 0.20,
+    'price': 0.20,
+    'area': 0.10,
+    'title': 0.20,
+}
+TITLE_DIMENSIONS = 128
+# scores computed at once by a block of rows: rows x properties of the city
+BLOCK_CELLS = 4_000_000
+FEATURE_FIELDS = ('pk', 'sub_category_id', 'price_type_id', 'price', 'area', 'title')
+# a save of a property changing one of these fields changes its neighbours and the neighbours of others
+SIMILAR_FIELDS = {'city', 'sub_category', 'price_type', 'price', 'area', 'title', 'status', 'is_blocked'}
+
+
+def similar_count():
+    return getattr(settings, 'SIMILAR_PROPERTIES_COUNT', 12)
+
+
+# the listings that can be recommended, one partition per city (city_id None: the properties without city)
+def partition_queryset(city_id):
+    return Property.objects.filter(status=True, is_blocked=False, city_id=city_id).order_by()
+
+
+class SimilarityMatrix:
+    def __init__(self, rows):
+        import numpy as np
+        self.ids = [row[0] for row in rows]
+        self.index = {pk: position for position, pk in enumerate(self.ids)}
+        weights = SIMILARITY_WEIGHTS
+        self.features = np.hstack([
+            np.sqrt(weights['title']) * self.title_vectors([row[5] for row in rows]),
+            np.sqrt(weights['sub_category']) * self.one_hot([row[1] for row in rows]),
+            np.sqrt(weights['price_type']) * self.one_hot([row[2] for row in rows]),
+        ]).astype(np.float32)
+        # exp(-|a - b|) = min(e^a / e^b, e^b / e^a): products instead of an exp per pair
+        self.price = np.exp(self.scaled([row[3] for row in rows]))
+        self.area = np.exp(self.scaled([row[4] for row in rows]))
+
+    def __len__(self):
+        return len(self.ids)
+
+    # one column per value, a missing value matches nothing
+    def one_hot(self, values):
+        import numpy as np
+        columns = {value: column for column, value in enumerate(dict.fromkeys(value for value in values if value is not None))}
+        matrix = np.zeros((len(values), len(columns)), dtype=np.float32)
+        for row, value in enumerate(values):
+            if value is not None:
+                matrix[row, columns[value]] = 1
+        return matrix
+
+    # unit vectors of the title tokens (crc32 is stable between processes, unlike hash())
+    def title_vectors(self, titles):
+        import numpy as np
+        matrix = np.zeros((len(titles), TITLE_DIMENSIONS), dtype=np.float32)
+        for row, title in enumerate(titles):
+            for token in set(tokenize(title)):
+                matrix[row, zlib.crc32(token.encode()) % TITLE_DIMENSIONS] += 1
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+
+    # logarithm centered and divided by its standard deviation in the city, missing values at the median
+    def scaled(self, values):
+        import numpy as np
+        logs = np.log1p(np.array([float(value) if value is not None else np.nan for value in values], dtype=np.float64))
+        if len(logs) == 0 or np.isnan(logs).all():
+            return np.zeros(len(logs), dtype=np.float32)
+        logs = np.where(np.isnan(logs), np.nanmedian(logs), logs)
+        return np.clip((logs - logs.mean()) / (logs.std() or 1.0), -30, 30).astype(np.float32)
+
+    def closeness(self, values, rows):
+        import numpy as np
+        ratio = np.multiply.outer(values[rows], 1 / values)
+        return np.minimum(ratio, 1 / ratio, out=ratio)
+
+    # ==========================================================================
+    # scores of the given rows against every property of the city: (len(rows), len(self)),
+    # a property is never similar to itself
+    # ==========================================================================
+    def scores(self, rows):
+        import numpy as np
+        rows = np.asarray(rows, dtype=np.int64)
+        scores = self.features[rows] @ self.features.T
+        scores += SIMILARITY_WEIGHTS['price'] * self.closeness(self.price, rows)
+        scores += SIMILARITY_WEIGHTS['area'] * self.closeness(self.area, rows)
+        scores[np.arange(len(rows)), rows] = -np.inf
+        return scores
+
+    # (row, [(neighbour row, score)]) of the given rows, the best `count` neighbours first
+    def neighbours(self, rows, count):
+        import numpy as np
+        rows = list(rows)
+        count = min(count, len(self) - 1)
+        block = max(1, BLOCK_CELLS // max(len(self), 1))
+        for start in range(0, len(rows), block):
+            batch = rows[start:start + block]
+            if count <= 0:
+                for row in batch:
+                    yield row, []
+                continue
+            scores = self.scores(batch)
+            top = np.argpartition(scores, -count, axis=1)[:, -count:]
+            for position, row in enumerate(batch):
+                best = top[position][np.argsort(-scores[position, top[position]])]
+                yield row, [(int(column), float(scores[position, column])) for column in best]
+# ==============================================================================
+
+
+# ==============================================================================
+# Lock of a city until the end of the current transaction: its rows are replaced by one process at a time.
+# An advisory lock on PostgreSQL (the properties without city included), a row lock of the city elsewhere
+# (SQLite already runs one writing transaction at a time).
+# ==============================================================================
+def lock_partition(city_id):
+    connection = connections[PropertySimilarity.objects.db]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", [zlib.crc32(f"similar:{city_id}".encode())])
+    elif city_id is not None:
+        list(City.objects.select_for_update().filter(pk=city_id).values_list('pk'))
+# ==============================================================================
+
+
+# ==============================================================================
+# write the neighbours of some properties: their old rows are replaced in the current transaction
+# ==============================================================================
+def save_neighbours(matrix, results, property_ids):
+    property_ids = list(property_ids)
+    for start in range(0, len(property_ids), 500):
+        PropertySimilarity.objects.filter(property_id__in=property_ids[start:start + 500]).delete()
+    PropertySimilarity.objects.bulk_create([
+        PropertySimilarity(property_id=matrix.ids[row], similar_id=matrix.ids[column], rank=rank, score=score)
+        for row, neighbours in results
+        for rank, (column, score) in enumerate(neighbours, 1)
+    ], batch_size=1000)
+# ==============================================================================
+
+
+# ==============================================================================
+# Batch job: the neighbours of every active property, one city per task of a process pool
+# (the largest cities first). The workers return plain values, the rows of each city are
+# replaced in one transaction by this process as soon as its city is computed.
+#   rebuild_similar_properties(workers=4, on_city=print)
+# ==============================================================================
+def compute_city_neighbours(city_id):
+    matrix = SimilarityMatrix(list(partition_queryset(city_id).values_list(*FEATURE_FIELDS)))
+    results = [
+        (matrix.ids[row], [(matrix.ids[column], score) for column, score in neighbours])
+        for row, neighbours in matrix.neighbours(range(len(matrix)), similar_count())
+    ]
+    return city_id, results
+
+
+def save_city_neighbours(city_id, results):
+    with transaction.atomic():
+        lock_partition(city_id)
+        PropertySimilarity.objects.filter(property__city_id=city_id).delete()
+        PropertySimilarity.objects.bulk_create([
+            PropertySimilarity(property_id=property_id, similar_id=similar_id, rank=rank, score=score)
+            for property_id, neighbours in results
+            for rank, (similar_id, score) in enumerate(neighbours, 1)
+        ], batch_size=1000)
+
+
+def rebuild_similar_properties(workers=None, on_city=None):
+    workers = workers if workers is not None else getattr(settings, 'SIMILAR_PROPERTIES_WORKERS', 2)
+    # every property is in one of these partitions, even inactive: its old rows are replaced
+    city_ids = list(Property.objects.order_by().values('city_id').annotate(total=Count('pk')).order_by('-total').values_list('city_id', flat=True))
+
+    if workers:
+        # the worker processes open their own connections
+        connections.close_all()
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=django.setup) as executor:
+            for city_id, results in executor.map(compute_city_neighbours, city_ids):
+                save_city_neighbours(city_id, results)
+                if on_city is not None:
+                    on_city(city_id, len(results))
+    else:
+        for city_id, results in map(compute_city_neighbours, city_ids):
+            save_city_neighbours(city_id, results)
+            if on_city is not None:
+                on_city(city_id, len(results))
+    bump_cache_version('properties:similar')
+# ==============================================================================
+
+
+# ==============================================================================
+# Background refresh after a property is created, changed or deleted (see the signals, the imports and the
+# bulk moderation): the neighbours are recomputed for
+#   - the changed properties still active,
+#   - the properties that list one of them (it may have left their city or the active listings),
+#   - the properties of the city whose lowest kept score is now beaten by one of them.
+# Only the city of each of these properties is loaded, the other rows are not touched. Each city is
+# computed and saved under its lock, so two refreshes of a city never interleave their rows.
+# ==============================================================================
+def refresh_similar_properties(property_ids):
+    import numpy as np
+    count = similar_count()
+    property_ids = list(property_ids)
+    changed = dict(Property.objects.filter(pk__in=property_ids).values_list('pk', 'city_id'))
+    dirty = defaultdict(set)
+    for property_id, city_id in changed.items():
+        dirty[city_id].add(property_id)
+    listing = PropertySimilarity.objects.filter(similar_id__in=property_ids).values_list('property_id', 'property__city_id')
+    for property_id, city_id in listing:
+        dirty[city_id].add(property_id)
+
+    refreshed = set()
+    for city_id, ids in dirty.items():
+        with transaction.atomic():
+            lock_partition(city_id)
+            matrix = SimilarityMatrix(list(partition_queryset(city_id).values_list(*FEATURE_FIELDS)))
+            active = [matrix.index[pk] for pk in changed if pk in matrix.index]
+            if active:
+                best = matrix.scores(active).max(axis=0)
+                # the lowest kept score is the one of the last rank, the properties with a short list stay at -inf
+                lowest = np.full(len(matrix), -np.inf)
+                last = PropertySimilarity.objects.filter(property__city_id=city_id, rank=min(count, len(matrix) - 1))
+                for property_id, score in last.values_list('property_id', 'score'):
+                    if property_id in matrix.index:
+                        lowest[matrix.index[property_id]] = score
+                ids.update(matrix.ids[column] for column in np.nonzero(best > lowest)[0])
+
+            rows = [matrix.index[pk] for pk in ids if pk in matrix.index]
+            # the properties no longer active lose their rows
+            save_neighbours(matrix, matrix.neighbours(rows, count), ids)
+        refreshed.update(ids)
+
+    # the similar lists are part of the responses of each property
+    for property_id in refreshed:
+        bump_cache_version(Property.cache_namespace(property_id))
+# ==============================================================================
+
+
+# ==============================================================================
+# The writes schedule the refresh instead of running it: the ids of the committed writes are collected by
+# the process for SIMILAR_PROPERTIES_REFRESH_DELAY seconds, then one background task refreshes all of them
+# (a burst of saves in a city costs one refresh of the city, not one per save), see RefreshQueue.
+#   similar_refreshes.schedule([property.pk])
+# ==============================================================================
+similar_refreshes = RefreshQueue(refresh_similar_properties, 'SIMILAR_PROPERTIES_REFRESH_DELAY')
+# the refreshes still waiting when the process exits normally (management commands) are run
+atexit.register(lambda: run_task(similar_refreshes.run))
+# ==============================================================================
@@ -0,0 +1,24 @@
+from django.contrib.auth import get_user_model
+from notifications.models import Notification
+from .models import Property
+
+
+# ==============================================================================
+# Background task of the like / favorite toggle (see BaseToggleView): the notification of the
+# owner, with its 24 hours duplicate check, is created after the response is sent.
+# ==============================================================================
+def notify_property_reaction(property_id, user_id, notification_type):
+    property = Property.objects.select_related('user').filter(pk=property_id).first()
+    action_user = get_user_model().objects.filter(pk=user_id).first()
+    if property is None or action_user is None:
+        return
+    Notification.objects.create_notification(
+        target_user = property.user,
+        action_user = action_user,
+        notification_type = notification_type,
+        type_item = "property",
+        item_id = str(property.id),
+        item_name = property.title,
+        action = notification_type,
+    )
+# ==============================================================================
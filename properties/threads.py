@@ -0,0 +1,104 @@
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.urls import reverse
+from rest_framework.utils.urls import replace_query_param
+from utils.paginations import KeysetCursorPagination
+from .models import Comment
+
+
+# ==============================================================================
+# Comment threads assembled in memory.
+# The visible replies (status=True) below the given comments are read one level at a time with their users,
+# each query only loads the first replies_limit replies of each parent shown at the level above
+# (ROW_NUMBER() per parent), so a thread costs at most max_depth queries whatever its number of replies,
+# then the replies are attached to their parent in Python: the serializers never query the replies.
+# A thread is cut at max_depth levels and each comment shows its first replies_limit replies,
+# the remaining replies are reached through the "more_replies" cursor link of the comment
+# (GET properties/comments/<uuid:pk>/replies/?pagination=cursor&cursor=...).
+# A hidden comment hides its whole sub thread.
+# ==============================================================================
+class CommentThreadBuilder:
+    # default and maximum values of ?depth= and ?replies_limit=
+    DEFAULT_MAX_DEPTH = 3
+    MAX_DEPTH = 10
+    DEFAULT_REPLIES_LIMIT = 3
+    MAX_REPLIES_LIMIT = 50
+
+    def __init__(self, request=None, max_depth=None, replies_limit=None):
+        self.request = request
+        params = request.query_params if request is not None and hasattr(request, 'query_params') else {}
+        self.max_depth = self.get_limit(params, 'depth', max_depth, self.DEFAULT_MAX_DEPTH, self.MAX_DEPTH)
+        self.replies_limit = self.get_limit(params, 'replies_limit', replies_limit, self.DEFAULT_REPLIES_LIMIT, self.MAX_REPLIES_LIMIT)
+
+    def get_limit(self, params, name, value, default, maximum):
+        if value is None:
+            try:
+                value = int(params.get(name, default))
+            except (TypeError, ValueError):
+                value = default
+        return min(max(value, 1), maximum)
+
+    # ==========================================================================
+    # first replies_limit visible replies of each of the given parents, newest first like Comment.Meta.ordering,
+    # the id breaks the ties like the cursor of the replies endpoint
+    # ==========================================================================
+    def get_replies_queryset(self, parent_ids):
+        ordering = [F('created_at').desc(), F('pk').desc()]
+        return (
+            Comment.objects.filter(parent_id__in=parent_ids, status=True)
+            .annotate(thread_rank=Window(RowNumber(), partition_by=[F('parent_id')], order_by=ordering))
+            .filter(thread_rank__lte=self.replies_limit)
+            .select_related('user')
+            .order_by(*ordering)
+        )
+
+    # ==========================================================================
+    # attach the threads to the given comments (a page of root comments, or of replies)
+    # with one query per level of replies, returns the comments
+    # ==========================================================================
+    def attach(self, comments):
+        comments = list(comments)
+        children = {}
+        level = comments
+        for _ in range(self.max_depth):
+            parent_ids = [comment.pk for comment in level if comment.reply_count]
+            if not parent_ids:
+                break
+            level = list(self.get_replies_queryset(parent_ids))
+            for reply in level:
+                children.setdefault(reply.parent_id, []).append(reply)
+        for comment in comments:
+            self.attach_replies(comment, children, depth=1)
+        return comments
+
+    def attach_replies(self, comment, children, depth):
+        replies = children.get(comment.pk, [])
+        comment.thread_replies = []
+        comment.thread_more_replies = None
+        if not comment.reply_count:
+            return
+        if depth > self.max_depth:
+            # the replies are not displayed at this depth: the link starts at the first reply
+            comment.thread_more_replies = self.get_more_replies_url(comment)
+            return
+        shown = replies[:self.replies_limit]
+        for reply in shown:
+            self.attach_replies(reply, children, depth + 1)
+        comment.thread_replies = shown
+        if comment.reply_count > len(shown):
+            comment.thread_more_replies = self.get_more_replies_url(comment, after=shown[-1])
+
+    # ==========================================================================
+    # link to the next replies of a comment, the cursor follows the last reply displayed
+    # ==========================================================================
+    def get_more_replies_url(self, comment, after=None):
+        url = reverse('comment_replies', kwargs={'pk': comment.pk})
+        if self.request is not None:
+            url = self.request.build_absolute_uri(url)
+        url = replace_query_param(url, 'pagination', 'cursor')
+        if after is not None:
+            cursor = KeysetCursorPagination()
+            cursor.ordering = Comment._meta.ordering[0]
+            url = replace_query_param(url, cursor.cursor_query_param, cursor.encode_cursor(after, 'next'))
+        return url
+# ==============================================================================
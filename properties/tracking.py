@@ -0,0 +1,141 @@
+import atexit
+import hashlib
+import ipaddress
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from utils.background import run_task, submit_task
+from utils.cache import bump_cache_version
+from visitors.models import Visitor
+from .models import Property, PropertyDailyView
+
+logger = logging.getLogger(__name__)
+
+
+# ==============================================================================
+# Write-behind tracking of the views of the property pages: the detail view only appends the view
+# to a buffer of the process (no query), a flusher thread writes the buffer every
+# PROPERTY_VIEW_FLUSH_SECONDS, or a background task as soon as it holds PROPERTY_VIEW_FLUSH_EVENTS views.
+# A visitor is counted once per property every PROPERTY_VIEW_WINDOW_SECONDS (a key in the shared cache).
+# The views still in the buffer when a process is killed are lost, they are only statistics.
+# ==============================================================================
+class PropertyViewBuffer:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # one flush at a time: the counters of a property are never written by two flushes at once
+        self.flush_lock = threading.Lock()
+        self.events = []
+        self.flusher = None
+
+    # ==========================================================================
+    # called on the request path: a cache key and an append
+    # ==========================================================================
+    # the cookie and X-Forwarded-For are sent by the client: the events are cleaned here,
+    # one invalid value would make the whole batch fail in write_property_views
+    def record(self, request, property_id):
+        key = Visitor.objects.get_visitor_key(request)[:Visitor._meta.get_field('key').max_length]
+        ip_address = self.get_ip_address(request)
+        if not key or ip_address is None:
+            return False
+        window = getattr(settings, 'PROPERTY_VIEW_WINDOW_SECONDS', 1800)
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        if not cache.add(f"property-view:{property_id}:{digest}", 1, timeout=window):
+            return False
+        agent = request.META.get('HTTP_USER_AGENT', '')
+        event = (property_id, key, ip_address, agent, timezone.localdate())
+        with self.lock:
+            self.events.append(event)
+            size = len(self.events)
+            if self.flusher is None or not self.flusher.is_alive():
+                self.flusher = threading.Thread(target=self.run, name='property-views', daemon=True)
+                self.flusher.start()
+        if size >= getattr(settings, 'PROPERTY_VIEW_FLUSH_EVENTS', 500) or getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+            submit_task(self.flush)
+        return True
+
+    # the client address (first of X-Forwarded-For), or the address of the connection when it is not an ip
+    def get_ip_address(self, request):
+        for value in (Visitor.objects.get_client_ip(request), request.META.get('REMOTE_ADDR')):
+            try:
+                return str(ipaddress.ip_address((value or '').strip()))
+            except ValueError:
+                continue
+        return None
+
+    def run(self):
+        while True:
+            time.sleep(getattr(settings, 'PROPERTY_VIEW_FLUSH_SECONDS', 10))
+            run_task(self.flush)
+
+    def flush(self):
+        with self.flush_lock:
+            with self.lock:
+                events, self.events = self.events, []
+            if events:
+                write_property_views(events)
+            return len(events)
+# ==============================================================================
+
+
+# ==============================================================================
+# Write a batch of views in one transaction: the relation property <-> visitor (bulk INSERT ignoring
+# the pairs already known) and views_count recounted from it, then the daily rollup
+# (one UPDATE per day and increment, not per property). The visitors seen for the first time
+# are created with one INSERT, their country is filled by their next tracked visit.
+# ==============================================================================
+def get_visitor_ids(events):
+    details = {key: (ip_address, agent) for _, key, ip_address, agent, _ in events}
+    visitor_ids = dict(Visitor.objects.filter(key__in=details).values_list('key', 'pk'))
+    missing = [key for key in details if key not in visitor_ids]
+    if missing:
+        Visitor.objects.bulk_create([
+            Visitor(
+                key=key,
+                ip_address=details[key][0],
+                browser_agent=details[key][1][:500],
+                browser=Visitor.objects.get_browser_from_user_agent(details[key][1]),
+                device_type=Visitor.objects.get_device_type(details[key][1]),
+            )
+            for key in missing
+        ], ignore_conflicts=True)
+        visitor_ids.update(Visitor.objects.filter(key__in=missing).values_list('key', 'pk'))
+    return visitor_ids
+
+
+def write_property_views(events):
+    # the properties deleted since their views were recorded
+    property_ids = set(Property.objects.filter(pk__in={event[0] for event in events}).values_list('pk', flat=True))
+    events = [event for event in events if event[0] in property_ids]
+    if not events:
+        return
+    visitor_ids = get_visitor_ids(events)
+    through = Property.views.through
+    pairs = {(property_id, visitor_ids[key]) for property_id, key, *_ in events}
+    daily = Counter((property_id, date) for property_id, _, _, _, date in events)
+    increments = defaultdict(list)
+    for (property_id, date), views in daily.items():
+        increments[(date, views)].append(property_id)
+
+    with transaction.atomic():
+        through.objects.bulk_create([through(property_id=property_id, visitor_id=visitor_id) for property_id, visitor_id in pairs], ignore_conflicts=True)
+        Property.refresh_counters(property_ids, fields=['views_count'])
+        PropertyDailyView.objects.bulk_create([PropertyDailyView(property_id=property_id, date=date) for property_id, date in daily], ignore_conflicts=True)
+        for (date, views), ids in increments.items():
+            PropertyDailyView.objects.filter(date=date, property_id__in=ids).update(views=F('views') + views)
+
+    # the detail responses and the rows of the lists show views_count, the lists sorted by views_count
+    # keep their order until the next change of another counter ("properties:counters" is not bumped by the views)
+    for property_id in property_ids:
+        bump_cache_version(Property.cache_namespace(property_id))
+# ==============================================================================
+
+
+property_views = PropertyViewBuffer()
+# the views of the buffer are written when the process exits normally
+atexit.register(lambda: run_task(property_views.flush))
@@ -19,20 +19,40 @@ urlpatterns = [
     # ==========================================================================
     # properties
     path('ad/properties/', views.AdminPropertyListView.as_view(), name='properties'), 
+    path('ad/properties/export/', views.AdminPropertyExportView.as_view(), name='properties_export'),
     path('ad/properties/<uuid:pk>/', views.AdminPropertyDetailView.as_view(), name='property'),
     path('ad/properties/<uuid:pk>/delete/', views.AdminDeletePropertyDeleteView.as_view(), name='property_delete'), 
     path('ad/properties/<uuid:pk>/block/', views.AdminPropertyBlockView.as_view(), name='property_block'),
+    # bulk moderation: {"ids": [...]} or {"filters": {...}}
+    path('ad/properties/bulk/block/', views.AdminPropertyBulkActionView.as_view(moderation_action='block'), name='properties_bulk_block'),
+    path('ad/properties/bulk/unblock/', views.AdminPropertyBulkActionView.as_view(moderation_action='unblock'), name='properties_bulk_unblock'),
+    path('ad/properties/bulk/activate/', views.AdminPropertyBulkActionView.as_view(moderation_action='activate'), name='properties_bulk_activate'),
+    path('ad/properties/bulk/deactivate/', views.AdminPropertyBulkActionView.as_view(moderation_action='deactivate'), name='properties_bulk_deactivate'),
+    path('ad/properties/bulk/delete/', views.AdminPropertyBulkDeleteView.as_view(), name='properties_bulk_delete'),
+    # bulk imports
+    path('ad/properties/imports/', views.AdminPropertyImportListView.as_view(), name='property_imports'),
+    path('ad/properties/imports/create/', views.AdminPropertyImportCreateView.as_view(), name='property_import_create'),
+    path('ad/properties/imports/<uuid:pk>/', views.AdminPropertyImportDetailView.as_view(), name='property_import'),
+    path('ad/properties/imports/<uuid:pk>/resume/', views.AdminPropertyImportResumeView.as_view(), name='property_import_resume'),
     # comments
     path('ad/properties/comments/', views.AdminCommentListView.as_view(), name='comments'),
+    path('ad/properties/comments/<uuid:pk>/thread/', views.AdminCommentThreadView.as_view(), name='comment_thread'),
     path('ad/properties/comments/<uuid:pk>/update/', views.AdminCommentUpdateView.as_view(), name='comment_update'),
     path('ad/properties/comments/<uuid:pk>/delete/', views.AdminCommentDeleteView.as_view(), name='comment_delete'),
+    path('ad/properties/comments/bulk/hide/', views.AdminCommentBulkActionView.as_view(moderation_action='hide'), name='comments_bulk_hide'),
+    path('ad/properties/comments/bulk/show/', views.AdminCommentBulkActionView.as_view(moderation_action='show'), name='comments_bulk_show'),
+    path('ad/properties/comments/bulk/delete/', views.AdminCommentBulkDeleteView.as_view(), name='comments_bulk_delete'),
 
     # ==========================================================================
     # Urls properties & comment for clients
     # ==========================================================================
     path('properties/', views.PropertyListView.as_view(), name='properties'),   
+    path('properties/clusters/', views.PropertyClusterView.as_view(), name='property_clusters'),
+    path('properties/facets/', views.PropertyFacetListView.as_view(), name='property_facets'),
     path('properties/create/', views.PropertyCreateView.as_view(), name='property_create'),  
     path('properties/<uuid:pk>/', views.PropertyDetailView.as_view(), name='property_detail'), 
+    path('properties/<uuid:pk>/daily-views/', views.PropertyDailyViewsView.as_view(), name='property_daily_views'),
+    path('properties/<uuid:pk>/similar/', views.PropertySimilarListView.as_view(), name='property_similar'),
     path('properties/<uuid:pk>/update/', views.PropertyUpdateView.as_view(), name='property_update'), 
     path('properties/<uuid:pk>/delete/', views.PropertyDeleteView.as_view(), name='property_delete'),  
     path('properties/<uuid:pk>/change-status/', views.PropertyChangeStatusView.as_view(), name='property_change_status'),   
@@ -44,6 +64,7 @@ urlpatterns = [
     # comments
     path('properties/<uuid:property_id>/comments/', views.CommentListView.as_view(), name='comments'),
     path('properties/<uuid:property_id>/comments/create/', views.CommentCreateView.as_view(), name='comment_create'),
+    path('properties/comments/<uuid:pk>/replies/', views.CommentRepliesView.as_view(), name='comment_replies'),
     path('properties/comments/<uuid:pk>/update/', views.CommentUpdateView.as_view(), name='comment_update'),
     path('properties/comments/<uuid:pk>/delete/', views.CommentDeleteView.as_view(), name='comment_delete'),
 
@@ -4,19 +4,38 @@ from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
+from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.conf import settings
+from django.core.cache import cache
 from django.db.models import Q
-from django.views.decorators.cache import cache_page
-from django.utils.decorators import method_decorator
+from django.utils import timezone
+from datetime import timedelta
 
+from categories.models import CategoryType, MainCategory, SubCategory
 from notifications.models import Notification
-from properties.filters import PropertyFilter
-from properties.permissions import CanCreatePriceType, CanDeleteComment, CanDeletePriceType, CanDeleteProperty, CanUpdateComment, CanUpdatePriceType, CanUpdateProperty, CanViewComment, CanViewPriceType, CanViewProperty, IsOwner
+from settings_app.models import City
+from properties.filters import PropertyFilter, PropertyOrderingFilter
+from properties.permissions import CanCreatePriceType, CanImportProperties, CanDeleteComment, CanDeletePriceType, CanDeleteProperty, CanUpdateComment, CanUpdatePriceType, CanUpdateProperty, CanViewComment, CanViewPriceType, CanViewProperty, IsOwner
 
-from .models import PriceType, Property, Comment
-from .serializers import (PriceTypeSerializer, PropertyListSerializer, PropertyDetailSerializer, PropertyCreateSerializer, CommentSerializer,)
+from .models import PriceType, Property, Comment, PropertyCluster, PropertyImport
+from .serializers import (PriceTypeSerializer, PropertyListSerializer, PropertyDetailSerializer, PropertyCreateSerializer, CommentSerializer, PropertyClusterSerializer, PropertyImportSerializer,
+    PropertyBulkModerationSerializer, CommentBulkModerationSerializer,)
 from utils.paginations import CustomDynamicPagination
+from utils.exports import ExportMixin
+from utils.cache import CachedResponseMixin, ConditionalGetMixin, get_cache_modified, get_cache_version, get_cache_versions, hash_query_params
+from utils.reference import get_references
+from utils.geo import geohash_cells, geohash_range, parse_bbox
+from .facets import PropertyFacets
+from .threads import CommentThreadBuilder
+from .imports import run_property_import
+from .moderation import CommentModeration, PropertyModeration
+from .tasks import notify_property_reaction
+from .tracking import property_views
+from utils.background import submit_task
 
+# reference tables rendered by the property serializers (ReferenceField), see CachedResponseMixin
+PROPERTY_REFERENCE_MODELS = (City, PriceType, CategoryType, MainCategory, SubCategory)
 
 
 
@@ -53,8 +72,16 @@ class PriceTypeListView(BasePriceTypeListView, generics.ListAPIView):
 # =============================================================================================================================
 class ActivePriceTypeListView(BasePriceTypeListView, generics.ListAPIView):
     permission_classes = [IsAuthenticated]    
+    # the plain list is read from the process-local reference cache, search / ordering / cursor go to the database
+    database_params = ('search', 'ordering', 'pagination', 'cursor')
+
     def get_queryset(self):
         return PriceType.objects.filter(status=True)
+
+    def filter_queryset(self, queryset):
+        if not any(param in self.request.query_params for param in self.database_params):
+            return get_references(PriceType, status=True)
+        return super().filter_queryset(queryset)
 # =============================================================================================================================
 # 
 # =============================================================================================================================
@@ -96,6 +123,11 @@ class BasePropertyView:
     model = Property 
     def get_base_queryset(self):
         return self.model.objects.all()
+
+    # everything PropertyDetailSerializer reads except the comments, in three queries
+    # (the city, price type and categories come from the reference cache, see utils/reference.py)
+    def get_detail_queryset(self):
+        return self.get_base_queryset().select_related('user').prefetch_related('images', 'images__variants')
 # =============================================================================================================================
 # 
 # =============================================================================================================================
@@ -105,11 +137,21 @@ class BasePropertyView:
 class BasePropertyListView(BasePropertyView):
     serializer_class = PropertyListSerializer
     pagination_class = CustomDynamicPagination
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    # ?search= is handled by PropertyFilter on the search index (see the search app)
+    filter_backends = [DjangoFilterBackend, PropertyOrderingFilter]
     filterset_class = PropertyFilter
-    search_fields = ['title', 'description', 'address']
-    ordering_fields = ['price', 'area', 'created_at']
+    ordering_fields = ['price', 'area', 'created_at', 'views_count', 'likes_count', 'favorites_count', 'comments_count']
     ordering = ['-created_at']
+    # the total count of each filtered list is cached until a property is written (see signals.py)
+    count_cache_namespace = 'properties'
+
+    # After filtering, load everything the list serializer reads in a fixed number of queries:
+    # the user is joined, the city / price type / categories are read from the reference cache
+    # (utils/reference.py), the images are prefetched once for the whole page,
+    # the counters are plain columns on Property (see signals.py).
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        return queryset.select_related('user').prefetch_related('images', 'images__variants')
 # =============================================================================================================================
 # 
 # =============================================================================================================================
@@ -121,21 +163,117 @@ class BasePropertyAPIView(BasePropertyView, APIView):
 # 
 # =============================================================================================================================
 # View all active and unrestricted properties: Available to all (visitors)
+# The responses of visitors are cached until a property is written or one of the displayed rows changes
+# (see Property.bump_cache_versions), the lists sorted by a counter also until a counter changes
 # =============================================================================================================================
-class PropertyListView(BasePropertyListView, generics.ListAPIView):
+class PropertyListView(CachedResponseMixin, BasePropertyListView, generics.ListAPIView):
     permission_classes = [AllowAny]
+    response_reference_models = PROPERTY_REFERENCE_MODELS
+
+    def get_response_cache_namespaces(self):
+        ordering = self.request.query_params.get('ordering', '').split(',')
+        if any(term.strip().lstrip('-') in Property.COUNTER_SOURCES for term in ordering):
+            return [self.count_cache_namespace, Property.COUNTERS_CACHE_NAMESPACE]
+        return [self.count_cache_namespace]
+
+    def get_response_row_namespaces(self, data):
+        return [Property.cache_namespace(row['id']) for row in data['results']]
+
     def get_queryset(self):
         return self.get_base_queryset().filter(status=True, is_blocked=False)
 # =============================================================================================================================
 # 
 # =============================================================================================================================
+# Same list as PropertyListView with the facet counts of the current filters (cities, categories, price types,
+# price and area ranges) so the search UI gets every option count in one request.
+# The facets are cached per filters until a property is written (see signals.py)
+# =============================================================================================================================
+class PropertyFacetListView(PropertyListView):
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        response.data['facets'] = self.get_facets()
+        return response
+
+    def get_facets(self):
+        filters_hash = hash_query_params(self.request.query_params, exclude=CustomDynamicPagination.count_cache_exclude)
+        key = f"facets:{self.count_cache_namespace}:{get_cache_version(self.count_cache_namespace)}:{filters_hash}"
+        facets = cache.get(key)
+        if facets is None:
+            facets = PropertyFacets(self.get_queryset(), self.request.query_params, request=self.request).as_dict()
+            cache.set(key, facets, getattr(settings, 'FACETS_CACHE_TIMEOUT', 60 * 5))
+        return facets
+# =============================================================================================================================
+# 
+# =============================================================================================================================
+# Map markers: the precomputed clusters of the visible area for a zoom level (see PropertyCluster)
+# GET properties/clusters/?bbox=min_lat,min_lng,max_lat,max_lng&zoom=12
+# =============================================================================================================================
+class PropertyClusterView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request, *args, **kwargs):
+        box = parse_bbox(request.query_params.get('bbox'))
+        try:
+            zoom = int(request.query_params.get('zoom', ''))
+        except ValueError:
+            zoom = None
+        if box is None or zoom is None or not 0 <= zoom <= 22:
+            return Response({"message": "bbox=min_lat,min_lng,max_lat,max_lng and zoom (0-22) are required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        precision = PropertyCluster.precision_for_zoom(zoom)
+        min_lat, min_lng, max_lat, max_lng = box
+        # cells covering the area, cut to the precision of the zoom, matched as ranges on the unique (precision, cell) index
+        cells = Q()
+        for cell in sorted({cell[:precision] for cell in geohash_cells(*box)}):
+            lower, upper = geohash_range(cell)
+            cells |= Q(cell__gte=lower, cell__lt=upper) if upper else Q(cell__gte=lower)
+        clusters = PropertyCluster.objects.filter(
+            cells, precision=precision,
+            latitude__range=(min_lat, max_lat), longitude__range=(min_lng, max_lng),
+        ).order_by('-count')
+        return Response({
+            'zoom': zoom,
+            'precision': precision,
+            'clusters': PropertyClusterSerializer(clusters, many=True).data,
+        })
+# =============================================================================================================================
+# 
+# =============================================================================================================================
 # Displaying details of a single property, Loading comments and replies to reduce the number of inquiries
+# The responses of visitors are cached until the property, its images, comments or counters change
+# Polling clients get a 304 from updated_at, the counters and the version stamps of the property (one small query)
 # =============================================================================================================================
-class PropertyDetailView(BasePropertyView, generics.RetrieveAPIView):
+class PropertyDetailView(ConditionalGetMixin, CachedResponseMixin, BasePropertyView, generics.RetrieveAPIView):
     serializer_class = PropertyDetailSerializer
     permission_classes = [AllowAny]   
+    # is_liked / is_favorited depend on the user
+    conditional_vary_on_user = True
+    response_reference_models = PROPERTY_REFERENCE_MODELS
+
+    def get_response_cache_namespaces(self):
+        return [Property.cache_namespace(self.kwargs['pk']), 'properties:related']
+
+    def get_conditional_validators(self, request):
+        row = self.get_base_queryset().filter(pk=self.kwargs['pk']).values_list(
+            'updated_at', 'views_count', 'likes_count', 'favorites_count', 'comments_count'
+        ).first()
+        if row is None:
+            return None
+        namespaces = self.get_response_cache_namespaces()
+        versions = get_cache_versions(namespaces)
+        values = [*row, *(versions[namespace] for namespace in namespaces), *self.get_response_reference_versions()]
+        return values, max(row[0], get_cache_modified(namespaces))
+
+    # the comment threads are loaded by the serializer (see threads.py)
     def get_queryset(self):
-        return self.get_base_queryset().prefetch_related('comments', 'comments__replies')
+        return self.get_detail_queryset()
+
+    # the view is recorded for the served pages (200 or 304), written later by the buffer (see tracking.py)
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method == 'GET' and response.status_code in (200, 304):
+            property_views.record(request, self.kwargs['pk'])
+        return response
     
     # def retrieve(self, request, *args, **kwargs):
     #     instance = self.get_object()
@@ -144,6 +282,28 @@ class PropertyDetailView(BasePropertyView, generics.RetrieveAPIView):
 # =============================================================================================================================
 # 
 # =============================================================================================================================
+# Similar properties of a property: its precomputed nearest active listings of the same city, best first
+# (see similar.py), one read of the (property, rank) index, cached for visitors like the lists
+# =============================================================================================================================
+class PropertySimilarListView(CachedResponseMixin, BasePropertyListView, generics.ListAPIView):
+    permission_classes = [AllowAny]
+    pagination_class = None
+    filter_backends = []
+    response_reference_models = PROPERTY_REFERENCE_MODELS
+
+    def get_response_cache_namespaces(self):
+        return [Property.cache_namespace(self.kwargs['pk']), 'properties:similar']
+
+    def get_response_row_namespaces(self, data):
+        return [Property.cache_namespace(row['id']) for row in data]
+
+    def get_queryset(self):
+        return self.get_base_queryset().filter(
+            similar_to__property_id=self.kwargs['pk'], status=True, is_blocked=False
+        ).order_by('similar_to__rank')
+# =============================================================================================================================
+# 
+# =============================================================================================================================
 # Displaying properties of a specific user
 # If it's the same user → Sees all their properties
 # Otherwise → Sees only active and unrestricted properties
@@ -172,6 +332,12 @@ class MyPropertyListView(BasePropertyListView, generics.ListAPIView):
 # =============================================================================================================================
 class UserFavoritesView(BasePropertyListView, generics.ListAPIView):
     permission_classes = [IsAuthenticated]    
+
+    # the count is cached until a property is written or the favorites of this user change
+    @property
+    def count_cache_namespace(self):
+        return ('properties', Property.favorites_cache_namespace(self.request.user.pk))
+
     def get_queryset(self):
         return self.request.user.property_favorites.filter(status=True, is_blocked=False)
 # =============================================================================================================================
@@ -186,7 +352,7 @@ class PropertyCreateView(BasePropertyView, generics.CreateAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         created = serializer.save(user=self.request.user)
-        detail = PropertyDetailSerializer(created, context={"request": request})
+        detail = PropertyDetailSerializer(self.get_detail_queryset().get(pk=created.pk), context={"request": request})
         return Response(detail.data, status=status.HTTP_201_CREATED)
 # =============================================================================================================================
 # 
@@ -204,7 +370,7 @@ class PropertyUpdateView(BasePropertyView, generics.UpdateAPIView):
         serializer = self.get_serializer(instance, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
         self.perform_update(serializer)
-        updated = self.model.objects.get(id=instance.id)
+        updated = self.get_detail_queryset().get(id=instance.id)
         detail = PropertyDetailSerializer(updated, context={"request": request})
         return Response(detail.data, status=status.HTTP_200_OK)
 # =============================================================================================================================
@@ -243,35 +409,36 @@ class PropertyChangeStatusView(BasePropertyActionView):
 # =============================================================================================================================
 # 
 # =============================================================================================================================
+# Daily views of a property for its owner: ?days=30 (1 to 365), from the rollup written by tracking.py
+# =============================================================================================================================
+class PropertyDailyViewsView(BasePropertyActionView):
+    permission_classes = [IsAuthenticated, IsOwner]
+    def get(self, request, pk, *args, **kwargs):
+        property = self.get_property(pk)
+        try:
+            days = min(max(int(request.query_params.get('days', 30)), 1), 365)
+        except ValueError:
+            days = 30
+        since = timezone.localdate() - timedelta(days=days - 1)
+        rows = property.daily_views.filter(date__gte=since).order_by('date').values('date', 'views')
+        return Response({'views_count': property.views_count, 'days': list(rows)})
+# =============================================================================================================================
+# 
+# =============================================================================================================================
 # Base Toggle (Like / Favorite) and create notification to this action
 # Used to reduce duplication
 # =============================================================================================================================
 class BaseToggleView(BasePropertyActionView):
     relation_field = None  
     action_name = None        
+    # one transaction: conditional DELETE or INSERT on the through table + F() update of the counter,
+    # the notification of the owner is created in the background (see Property.toggle_relation)
     def post(self, request, pk, *args, **kwargs):
         property = self.get_property(pk)
-        user = request.user
+        action_status, changed, count = self.model.toggle_relation(property.pk, request.user.pk, f'{self.relation_field}_count')
+        if action_status and changed and property.user_id != request.user.pk:
+            submit_task(notify_property_reaction, property.pk, request.user.pk, self.action_name)
 
-        if getattr(property, self.relation_field).filter(id=user.id).exists():
-            getattr(property, self.relation_field).remove(user)
-            action_status = False
-        else:
-            getattr(property, self.relation_field).add(user)
-            action_status = True 
-
-            if action_status:
-                Notification.objects.create_notification(
-                    target_user = property.user,  
-                    action_user = request.user,   
-                    notification_type = self.action_name,
-                    type_item = "property",
-                    item_id = str(property.id),
-                    item_name = property.title,
-                    action= self.action_name, 
-                )       
-        count = getattr(property, self.relation_field).count()
-        
         return Response({'action': self.action_name, 'status': action_status, 'count': count
  })
 # =============================================================================================================================
@@ -296,14 +463,40 @@ class ToggleFavoriteView(BaseToggleView):
 # =============================================================================================================================
 # get all comment for property item with replies
 # =============================================================================================================================
-class CommentListView(generics.ListAPIView):
+class BaseCommentThreadListView(generics.ListAPIView):
     serializer_class = CommentSerializer
-    permission_classes = [AllowAny]
     pagination_class = CustomDynamicPagination
+
+    # the page of comments gets its visible threads with one more query (see threads.py)
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        return CommentThreadBuilder(self.request).attach(page) if page is not None else None
+
+
+class CommentListView(CachedResponseMixin, BaseCommentThreadListView):
+    permission_classes = [AllowAny]
+
+    # the responses of visitors are cached until a comment of the property is written
+    def get_response_cache_namespaces(self):
+        return [Property.cache_namespace(self.kwargs['property_id'])]
     
     def get_queryset(self):
         property_id = self.kwargs.get('property_id')
-        return Comment.objects.filter(property_id=property_id, parent__isnull=True, status=True).select_related('user').prefetch_related('replies', 'replies__user')
+        return Comment.objects.filter(property_id=property_id, parent__isnull=True, status=True).select_related('user')
+# =============================================================================================================================
+# 
+# =============================================================================================================================
+# Visible replies of a comment with their own threads, target of the "more_replies" links
+# =============================================================================================================================
+class CommentRepliesView(BaseCommentThreadListView):
+    permission_classes = [AllowAny]
+
+    # a hidden comment hides its replies at every depth: the comment and all its parents (read from its path) must be visible
+    def get_queryset(self):
+        comment = get_object_or_404(Comment, pk=self.kwargs.get('pk'), status=True)
+        if Comment.objects.filter(pk__in=comment.ancestor_ids(), status=False).exists():
+            raise Http404
+        return Comment.objects.filter(parent_id=comment.pk, status=True).select_related('user')
 # =============================================================================================================================
 # 
 # =============================================================================================================================
@@ -354,15 +547,31 @@ class CommentDeleteView(generics.DestroyAPIView):
 # =============================================================================================================================
 # admin section: get all comments
 # =============================================================================================================================
-class AdminCommentListView(generics.ListAPIView):
-    serializer_class = CommentSerializer
+class AdminCommentListView(BaseCommentThreadListView):
     permission_classes = [IsAuthenticated, IsAdminUser, CanViewComment]
-    pagination_class = CustomDynamicPagination
     
+    # root comments of all the properties, or of one with ?property=<uuid>
     def get_queryset(self):
-        property_id = self.kwargs.get('property_id')
-        return Comment.objects.filter(property_id=property_id, parent__isnull=True, status=True
-        ).select_related('user').prefetch_related('replies', 'replies__user')
+        queryset = Comment.objects.filter(parent__isnull=True, status=True).select_related('user')
+        property_id = self.request.query_params.get('property')
+        if property_id:
+            queryset = queryset.filter(property_id=property_id)
+        return queryset
+# =============================================================================================================================
+# 
+# =============================================================================================================================
+# admin section: a comment and all its replies at any depth, hidden ones included, oldest first.
+# The whole sub thread is one indexed range scan on the path of the comment (see Comment.subtree_range)
+# =============================================================================================================================
+class AdminCommentThreadView(generics.ListAPIView):
+    serializer_class = CommentSerializer
+    pagination_class = CustomDynamicPagination
+    permission_classes = [IsAuthenticated, IsAdminUser, CanViewComment]
+
+    def get_queryset(self):
+        comment = get_object_or_404(Comment, pk=self.kwargs.get('pk'))
+        lower, upper = Comment.subtree_range(comment.path)
+        return Comment.objects.filter(path__gte=lower, path__lt=upper).select_related('user').order_by('created_at', 'pk')
 # =============================================================================================================================
 # 
 # =============================================================================================================================
@@ -371,6 +580,8 @@ class AdminCommentListView(generics.ListAPIView):
 class AdminCommentUpdateView(generics.UpdateAPIView):
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticated, IsAdminUser, CanUpdateComment]
+    def get_queryset(self):
+        return Comment.objects.all()
 # =============================================================================================================================
 # 
 # =============================================================================================================================
@@ -379,6 +590,27 @@ class AdminCommentUpdateView(generics.UpdateAPIView):
 class AdminCommentDeleteView(generics.DestroyAPIView):
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticated, IsAdminUser, CanDeleteComment]
+    def get_queryset(self):
+        return Comment.objects.all()
+# =============================================================================================================================
+# 
+# =============================================================================================================================
+# hide / show / delete many comments at once (ids in the body), see moderation.py
+# =============================================================================================================================
+class AdminCommentBulkActionView(APIView):
+    permission_classes = [IsAuthenticated, IsAdminUser, CanUpdateComment]
+    moderation_action = None
+
+    def post(self, request, *args, **kwargs):
+        serializer = CommentBulkModerationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        count = CommentModeration(request.user).apply(self.moderation_action, serializer.validated_data['ids'])
+        return Response({'message': 'Comments moderated successfully', 'action': self.moderation_action, 'count': count})
+
+
+class AdminCommentBulkDeleteView(AdminCommentBulkActionView):
+    permission_classes = [IsAuthenticated, IsAdminUser, CanDeleteComment]
+    moderation_action = 'delete'
 # =============================================================================================================================
 # 
 # =============================================================================================================================
@@ -391,6 +623,22 @@ class AdminPropertyListView(BasePropertyListView, generics.ListAPIView):
 # =============================================================================================================================
 # 
 # =============================================================================================================================
+# export the admin list (same filters, search and ordering) as a CSV or NDJSON stream: ?output=csv|ndjson
+# =============================================================================================================================
+class AdminPropertyExportView(ExportMixin, AdminPropertyListView):
+    export_filename = 'properties'
+    export_columns = [
+        ('id', 'id'), ('title', 'title'), ('owner', 'user__username'), ('owner_phone', 'user__phone'),
+        ('category_type', 'category_type__title'), ('main_category', 'main_category__title'), ('sub_category', 'sub_category__title'),
+        ('city', 'city__name'), ('address', 'address'), ('latitude', 'latitude'), ('longitude', 'longitude'),
+        ('area', 'area'), ('price', 'price'), ('price_type', 'price_type__name'), ('is_owner', 'is_owner'),
+        ('status', 'status'), ('is_blocked', 'is_blocked'),
+        ('views_count', 'views_count'), ('likes_count', 'likes_count'), ('favorites_count', 'favorites_count'), ('comments_count', 'comments_count'),
+        ('created_at', 'created_at'), ('updated_at', 'updated_at'),
+    ]
+# =============================================================================================================================
+# 
+# =============================================================================================================================
 # get detail property for admin
 # =============================================================================================================================
 class AdminPropertyDetailView(BasePropertyView, generics.RetrieveAPIView):
@@ -440,5 +688,91 @@ class AdminPropertyBlockView(BasePropertyActionView):
             )
         return Response({'message': 'Chnage status blocked successfully', 'status': property.is_blocked})
 # =============================================================================================================================
+# 
+# =============================================================================================================================
+# block / unblock / activate / deactivate many properties at once, see moderation.py
+# body: {"ids": [uuid, ...]} or {"filters": {...}} with the filters of the admin list (city, user, search ...),
+# or {"all": true} for every property
+# =============================================================================================================================
+class AdminPropertyBulkActionView(BasePropertyAPIView):
+    permission_classes = [IsAuthenticated, IsAdminUser, CanUpdateProperty]
+    moderation_action = None
+
+    def post(self, request, *args, **kwargs):
+        serializer = PropertyBulkModerationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        targets = serializer.validated_data.get('ids')
+        if not targets:
+            # the filters are validated by the serializer
+            targets = PropertyFilter(data=serializer.validated_data.get('filters') or {}, queryset=self.get_base_queryset(), request=request).qs
+            if not targets.exists():
+                return Response({'filters': ['No property matches these filters.']}, status=status.HTTP_400_BAD_REQUEST)
+        count = PropertyModeration(request.user).apply(self.moderation_action, targets)
+        return Response({'message': 'Properties moderated successfully', 'action': self.moderation_action, 'count': count})
+
+
+class AdminPropertyBulkDeleteView(AdminPropertyBulkActionView):
+    permission_classes = [IsAuthenticated, IsAdminUser, CanDeleteProperty]
+    moderation_action = 'delete'
+# =============================================================================================================================
 
 
+# 
+# =============================================================================================================================
+# Bulk imports of listings from a feed file (CSV or JSON Lines) for admin: the file is saved and imported
+# in the background (see imports.py), the import is followed and resumed with the endpoints below.
+# =============================================================================================================================
+class BasePropertyImportView:
+    serializer_class = PropertyImportSerializer
+    permission_classes = [IsAuthenticated, CanImportProperties]
+    queryset = PropertyImport.objects.select_related('owner')
+# =============================================================================================================================
+# 
+# =============================================================================================================================
+# list of the imports
+# =============================================================================================================================
+class AdminPropertyImportListView(BasePropertyImportView, generics.ListAPIView):
+    pagination_class = CustomDynamicPagination
+# =============================================================================================================================
+# 
+# =============================================================================================================================
+# send a feed: multipart with "file", "format" (csv|jsonl, default from the extension), "owner" (default: yourself)
+# =============================================================================================================================
+class AdminPropertyImportCreateView(BasePropertyImportView, generics.CreateAPIView):
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = serializer.save(created_by=request.user, owner=serializer.validated_data.get('owner') or request.user)
+        submit_task(run_property_import, job.pk)
+        return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED)
+# =============================================================================================================================
+# 
+# =============================================================================================================================
+# progress of an import: status, offset (rows processed), created / rejected counts and the rejected rows
+# =============================================================================================================================
+class AdminPropertyImportDetailView(BasePropertyImportView, generics.RetrieveAPIView):
+    pass
+# =============================================================================================================================
+# 
+# =============================================================================================================================
+# resume a failed (or interrupted) import from its offset.
+# The import is claimed by a conditional update: of two requests resuming it at the same time,
+# only the one that moved it back to pending submits it, the other answers 409.
+# =============================================================================================================================
+class AdminPropertyImportResumeView(BasePropertyImportView, generics.GenericAPIView):
+    def post(self, request, pk, *args, **kwargs):
+        job = self.get_object()
+        if job.status == PropertyImport.STATUS_DONE:
+            return Response({"message": "This import is already done"}, status=status.HTTP_400_BAD_REQUEST)
+        now = timezone.now()
+        stale = Q(status__in=[PropertyImport.STATUS_PENDING, PropertyImport.STATUS_RUNNING], updated_at__lt=now - timedelta(minutes=PropertyImport.STALE_MINUTES))
+        claimed = PropertyImport.objects.filter(Q(status=PropertyImport.STATUS_FAILED) | stale, pk=job.pk).update(
+            status=PropertyImport.STATUS_PENDING, updated_at=now
+        )
+        if not claimed:
+            job.refresh_from_db()
+            return Response({"message": "This import is running", "status": job.status, "offset": job.offset}, status=status.HTTP_409_CONFLICT)
+        submit_task(run_property_import, job.pk)
+        job.refresh_from_db()
+        return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED)
+# =============================================================================================================================
@@ -45,6 +45,8 @@ INSTALLED_APPS = [
     'settings_app',
     'categories',
     'properties',
+    'search',
+    'uploads',
     'chats',
     'notifications',
     'policies',
@@ -183,6 +185,59 @@ CACHES = {
         'LOCATION': 'unique-snowflake',
     }
 }
+# Paginated lists: the total count is cached per filters for this many seconds,
+# above the threshold the database estimate is used instead of an exact COUNT (PostgreSQL only)
+PAGINATION_COUNT_CACHE_TIMEOUT = 60 * 5
+PAGINATION_COUNT_ESTIMATE_THRESHOLD = 10000
+# Fuzzy search (?search=...&fuzzy=1): time spent looking for similar words before falling back to prefix matching
+SEARCH_FUZZY_BUDGET_MS = 150
+# Facet counts of the property search (properties/facets/), cached per filters for this many seconds
+FACETS_CACHE_TIMEOUT = 60 * 5
+# Responses of the public property endpoints for visitors, invalidated by version stamps on every write (see utils/cache.py);
+# the timeout only removes the entries nobody reads anymore
+RESPONSE_CACHE_TIMEOUT = 60 * 10
+# Seconds between two checks of the versions of the reference tables kept in memory by each process
+# (cities, price types, categories), see utils/reference.py
+REFERENCE_CACHE_CHECK_SECONDS = 5
+# Worker threads of each process running the background tasks (image variants ...), see utils/background.py
+BACKGROUND_WORKERS = 2
+BACKGROUND_TASKS_EAGER = False
+# Threads decoding / verifying the images of one property create or update request concurrently
+IMAGE_VALIDATION_WORKERS = 4
+# Bulk imports of listings (properties/imports.py): rows per batch and transaction, validation processes,
+# rejected rows kept on a PropertyImport, and the images of the feeds (paths are relative to IMPORT_MEDIA_ROOT)
+IMPORT_BATCH_SIZE = 500
+IMPORT_WORKERS = 2
+IMPORT_MAX_REPORTED_ERRORS = 1000
+IMPORT_MEDIA_ROOT = BASE_DIR / 'imports'
+IMPORT_IMAGE_MAX_SIZE = 10 * 1024 * 1024
+IMPORT_IMAGE_TIMEOUT = 15
+# image URLs of the feeds are fetched from public addresses only, a non-empty list also limits them to these domains
+IMPORT_IMAGE_HOSTS = []
+# Streamed CSV / NDJSON exports of the admin lists (utils/exports.py): rows per database fetch and per sent block
+EXPORT_CHUNK_SIZE = 2000
+# Bulk moderation of the admin (properties/moderation.py): rows per UPDATE / DELETE and transaction
+BULK_MODERATION_CHUNK_SIZE = 500
+# Views of the property pages (properties/tracking.py): a visitor counts once per property every PROPERTY_VIEW_WINDOW_SECONDS,
+# the buffered views are written every PROPERTY_VIEW_FLUSH_SECONDS or as soon as PROPERTY_VIEW_FLUSH_EVENTS are waiting
+PROPERTY_VIEW_WINDOW_SECONDS = 30 * 60
+PROPERTY_VIEW_FLUSH_SECONDS = 10
+PROPERTY_VIEW_FLUSH_EVENTS = 500
+# Similar properties (properties/similar.py): neighbours kept per property, processes of the rebuild_similar_properties command,
+# seconds the saves are collected before one background refresh
+SIMILAR_PROPERTIES_COUNT = 12
+SIMILAR_PROPERTIES_WORKERS = 2
+SIMILAR_PROPERTIES_REFRESH_DELAY = 5
+# Map clusters (properties/clusters.py): seconds the saves are collected before one background refresh of their cells
+PROPERTY_CLUSTERS_REFRESH_DELAY = 2
+# Resumable uploads (uploads app): chunks are written to UPLOAD_TEMP_DIR (on the same disk as MEDIA_ROOT
+# so finalized files are moved, not copied), sessions not attached after UPLOAD_SESSION_EXPIRY_HOURS are purged.
+# A chunk claims its session while it is written, a claim older than UPLOAD_CHUNK_LEASE_SECONDS can be taken again
+UPLOAD_TEMP_DIR = MEDIA_ROOT / 'uploads' / 'tmp'
+UPLOAD_CHUNK_MAX_SIZE = 8 * 1024 * 1024
+UPLOAD_CHUNK_LEASE_SECONDS = 10 * 60
+UPLOAD_MAX_SIZES = {'image': 20 * 1024 * 1024, 'video': 1024 * 1024 * 1024}
+UPLOAD_SESSION_EXPIRY_HOURS = 24
 
 
 
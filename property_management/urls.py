@@ -66,6 +66,7 @@ urlpatterns = [
      path('api/', include('chats.urls')),
      path('api/', include('analytics.urls')),
      path('api/', include('notifications.urls')),
+     path('api/', include('uploads.urls')),
 
     # ========================================================================================
     # Swagger URLs
@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import SearchToken, SearchTerm
+
+# ========================================================
+#  register SearchToken, SearchTerm Models
+# ========================================================
+admin.site.register(SearchToken)
+admin.site.register(SearchTerm)
+# ========================================================
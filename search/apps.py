@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class SearchConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'search'
+
+    def ready(self):
+        # =====================================================
+        # keep the search index in sync with the properties
+        # =====================================================
+        import search.signals
+        # =====================================================
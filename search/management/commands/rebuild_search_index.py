@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from properties.models import Property
+from search.models import SearchTerm, SearchToken
+
+
+# ==========================================================================================================
+# Rebuild the search index of every property (first deployment, changed tokenizer or weights).
+# The signals keep the index up to date afterwards, the properties are indexed in batches,
+# each batch is one DELETE and one bulk INSERT in a transaction.
+# The vocabulary of the fuzzy search is then synced with the indexed words (unused terms removed).
+#   python manage.py rebuild_search_index --batch-size 1000
+# ==========================================================================================================
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of the properties"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=SearchToken.objects.BATCH_SIZE, help="Number of properties indexed per batch")
+
+    def handle(self, *args, **options):
+        total = SearchToken.objects.index_queryset(Property.objects.order_by('pk'), batch_size=options['batch_size'])
+        self.stdout.write(f"{total} tokens indexed for {Property.objects.count()} properties")
+
+        tokens = SearchToken.objects.filter(field__in=SearchToken.objects.FUZZY_FIELDS).order_by().values_list('token', flat=True).distinct()
+        created, removed = SearchTerm.objects.sync(tokens)
+        self.stdout.write(self.style.SUCCESS(f"Done: vocabulary synced, {created} terms added, {removed} removed"))
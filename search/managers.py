@@ -0,0 +1,228 @@
+import math
+import time
+from collections import Counter
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Case, Count, F, FloatField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+from .normalization import tokenize, trigrams
+
+
+class SearchTokenManager(models.Manager):
+
+    # weight of one occurrence of a token per field, occurrences are capped at MAX_OCCURRENCES
+    FIELD_WEIGHTS = {
+        'title': 5,
+        'city': 4,
+        'sub_category': 3,
+        'main_category': 2,
+        'category_type': 2,
+        'price_type': 2,
+        'address': 2,
+        'user': 1,
+        'description': 1,
+    }
+    MAX_OCCURRENCES = 3
+    # fields whose words are added to the vocabulary of the fuzzy search (SearchTerm)
+    FUZZY_FIELDS = ('title', 'address', 'city', 'category_type', 'main_category', 'sub_category')
+    # a query is cut to this number of distinct tokens
+    MAX_QUERY_TOKENS = 8
+    # number of properties indexed per delete + bulk_create
+    BATCH_SIZE = 500
+
+    # =======================================================================================================
+    # The text of an indexed field of a property, the related rows must be loaded with select_related
+    # when many properties are indexed at once (see index_queryset).
+    # =======================================================================================================
+    def get_field_text(self, property, field):
+        if field == 'city':
+            return property.city.name if property.city else ""
+        if field in ('category_type', 'main_category', 'sub_category'):
+            category = getattr(property, field)
+            return category.title if category else ""
+        if field == 'price_type':
+            return property.price_type.name if property.price_type else ""
+        if field == 'user':
+            return property.user.username or ""
+        return getattr(property, field) or ""
+    # =======================================================================================================
+    #
+    #
+    #
+    # =======================================================================================================
+    # Build the index rows of one property for the given fields (all fields by default)
+    # =======================================================================================================
+    def build_tokens(self, property, fields):
+        rows = []
+        for field in fields:
+            occurrences = Counter(tokenize(self.get_field_text(property, field)))
+            for token, count in occurrences.items():
+                weight = self.FIELD_WEIGHTS[field] * min(count, self.MAX_OCCURRENCES)
+                rows.append(self.model(property_id=property.pk, field=field, token=token, weight=weight))
+        return rows
+    # =======================================================================================================
+    #
+    #
+    #
+    # =======================================================================================================
+    # Replace the index rows of the given properties (for the given fields) in one transaction:
+    # one DELETE and one bulk INSERT for the whole list, the new words are added to the fuzzy vocabulary.
+    # =======================================================================================================
+    def index_properties(self, properties, fields=None):
+        from .models import SearchTerm
+
+        fields = list(fields or self.FIELD_WEIGHTS)
+        rows = []
+        for property in properties:
+            rows.extend(self.build_tokens(property, fields))
+        with transaction.atomic():
+            self.filter(property_id__in=[property.pk for property in properties], field__in=fields).delete()
+            self.bulk_create(rows, batch_size=1000)
+            SearchTerm.objects.register(row.token for row in rows if row.field in self.FUZZY_FIELDS)
+        return len(rows)
+    # =======================================================================================================
+    #
+    #
+    #
+    # =======================================================================================================
+    # Index every property of a queryset in batches (used by the signals and the rebuild command)
+    # =======================================================================================================
+    def index_queryset(self, queryset, fields=None, batch_size=None):
+        batch_size = batch_size or self.BATCH_SIZE
+        queryset = queryset.select_related('user', 'city', 'price_type', 'category_type', 'main_category', 'sub_category')
+        batch, total = [], 0
+        for property in queryset.iterator(chunk_size=batch_size):
+            batch.append(property)
+            if len(batch) >= batch_size:
+                total += self.index_properties(batch, fields)
+                batch = []
+        if batch:
+            total += self.index_properties(batch, fields)
+        return total
+    # =======================================================================================================
+    #
+    #
+    #
+    # =======================================================================================================
+    # Filter a property queryset with a free text query and annotate it with "search_rank".
+    # Every token of the query must match (AND), a token matches the indexed tokens starting with it
+    # so "casa" finds "casablanca", exact matches weigh twice as much as prefix matches.
+    # With fuzzy=True a token also matches the vocabulary terms with a similar spelling ("casablnca"),
+    # in the FUZZY_FIELDS only, weighted by their similarity.
+    # The structured filters already applied on the queryset are kept (intersection).
+    # =======================================================================================================
+    def search(self, queryset, query, fuzzy=False):
+        tokens = list(dict.fromkeys(tokenize(query)))[:self.MAX_QUERY_TOKENS]
+        if not tokens:
+            return queryset
+
+        similar = self.get_similar_terms(tokens) if fuzzy else {}
+        matches = Q()
+        for token in tokens:
+            condition = Q(token__startswith=token)
+            if similar.get(token):
+                condition |= Q(token__in=similar[token], field__in=self.FUZZY_FIELDS)
+            queryset = queryset.filter(pk__in=self.filter(condition).values('property_id'))
+            matches |= condition
+
+        weights = [
+            When(token__in=tokens, then=F('weight') * 2.0),
+            When(Q(*[Q(token__startswith=token) for token in tokens], _connector=Q.OR), then=F('weight') * 1.0),
+        ]
+        for terms in similar.values():
+            weights += [When(token=term, then=F('weight') * Value(similarity)) for term, similarity in terms.items()]
+        rank = self.filter(matches, property_id=OuterRef('pk')).order_by().values('property_id').annotate(
+            rank=Sum(Case(*weights, default=Value(0.0), output_field=FloatField()))
+        ).values('rank')
+        return queryset.annotate(search_rank=Coalesce(Subquery(rank, output_field=FloatField()), 0.0))
+    # =======================================================================================================
+    #
+    #
+    #
+    # =======================================================================================================
+    # Similar vocabulary terms of each query token: {token: {term: similarity}}.
+    # The lookups stop once SEARCH_FUZZY_BUDGET_MS is spent, the remaining tokens keep the prefix match only,
+    # numbers and very short tokens are never expanded.
+    # =======================================================================================================
+    def get_similar_terms(self, tokens):
+        from .models import SearchTerm
+
+        budget = getattr(settings, 'SEARCH_FUZZY_BUDGET_MS', 150) / 1000
+        started = time.monotonic()
+        similar = {}
+        for token in tokens:
+            if time.monotonic() - started > budget:
+                break
+            if len(token) >= SearchTerm.objects.MIN_TERM_LENGTH and not token.isdigit():
+                similar[token] = SearchTerm.objects.similar(token)
+        return similar
+    # =======================================================================================================
+
+
+
+class SearchTermManager(models.Manager):
+
+    # minimal trigram similarity (shared / union of the trigrams) of a fuzzy match, pg_trgm uses 0.3 as well
+    SIMILARITY_THRESHOLD = 0.3
+    # a query word is expanded to this number of similar terms at most
+    MAX_EXPANSIONS = 10
+    # shorter words have too few trigrams to be compared
+    MIN_TERM_LENGTH = 3
+
+    # =======================================================================================================
+    # Add the missing terms (and their trigrams) to the vocabulary, the existing ones are left untouched
+    # =======================================================================================================
+    def register(self, tokens, batch_size=500):
+        tokens = sorted({token for token in tokens if len(token) >= self.MIN_TERM_LENGTH and not token.isdigit()})
+        created = 0
+        for start in range(0, len(tokens), batch_size):
+            batch = tokens[start:start + batch_size]
+            missing = set(batch) - set(self.filter(term__in=batch).values_list('term', flat=True))
+            if not missing:
+                continue
+            self.bulk_create([self.model(term=term, trigram_count=len(trigrams(term))) for term in missing], ignore_conflicts=True)
+            trigram_model = self.model.trigrams.rel.related_model
+            trigram_model.objects.bulk_create([
+                trigram_model(term_id=term_id, trigram=trigram)
+                for term, term_id in self.filter(term__in=missing).values_list('term', 'pk')
+                for trigram in trigrams(term)
+            ], ignore_conflicts=True)
+            created += len(missing)
+        return created
+    # =======================================================================================================
+    #
+    #
+    #
+    # =======================================================================================================
+    # Terms similar to a token with their similarity, the best first: {term: similarity}.
+    # Only the terms whose trigram count makes the threshold reachable are compared.
+    # =======================================================================================================
+    def similar(self, token):
+        grams = trigrams(token)
+        size = len(grams)
+        threshold = self.SIMILARITY_THRESHOLD
+        shared = Cast(Count('trigrams'), FloatField())
+        rows = (
+            self.filter(
+                trigrams__trigram__in=grams,
+                trigram_count__gte=math.ceil(size * threshold),
+                trigram_count__lte=math.floor(size / threshold),
+            )
+            .annotate(similarity=shared / (Value(float(size)) + F('trigram_count') - shared))
+            .filter(similarity__gte=threshold)
+            .order_by('-similarity', 'term')
+            .values_list('term', 'similarity')[:self.MAX_EXPANSIONS]
+        )
+        return dict(rows)
+    # =======================================================================================================
+    #
+    #
+    #
+    # =======================================================================================================
+    # Rebuild the vocabulary from the indexed tokens: unused terms are removed, missing ones are added
+    # =======================================================================================================
+    def sync(self, tokens):
+        _, deleted = self.exclude(term__in=tokens).delete()
+        created = self.register(tokens.iterator() if hasattr(tokens, 'iterator') else tokens)
+        return created, deleted.get(self.model._meta.label, 0)
+    # =======================================================================================================
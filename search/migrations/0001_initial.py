@@ -0,0 +1,32 @@
+# Generated by Django 4.2.13 on 2026-10-18 02:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('properties', '0002_property_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(choices=[('title', 'Title'), ('description', 'Description'), ('address', 'Address'), ('city', 'City'), ('category_type', 'Category Type'), ('main_category', 'Main Category'), ('sub_category', 'Sub Category'), ('price_type', 'Price Type'), ('user', 'User')], max_length=20)),
+                ('token', models.CharField(db_index=True, max_length=100)),
+                ('weight', models.PositiveSmallIntegerField(default=1)),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='properties.property')),
+            ],
+            options={
+                'verbose_name': 'Search Token',
+                'verbose_name_plural': 'Search Tokens',
+                'indexes': [models.Index(fields=['token', 'property'], name='search_sear_token_c4e5a2_idx')],
+                'unique_together': {('property', 'field', 'token')},
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.13 on 2026-10-18 02:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=100, unique=True)),
+                ('trigram_count', models.PositiveSmallIntegerField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Search Term',
+                'verbose_name_plural': 'Search Terms',
+            },
+        ),
+        migrations.CreateModel(
+            name='TermTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('term', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to='search.searchterm')),
+            ],
+            options={
+                'verbose_name': 'Term Trigram',
+                'verbose_name_plural': 'Term Trigrams',
+                'indexes': [models.Index(fields=['trigram', 'term'], name='search_term_trigram_ee64a5_idx')],
+                'unique_together': {('term', 'trigram')},
+            },
+        ),
+    ]
@@ -0,0 +1,85 @@
+from django.db import models
+from properties.models import Property
+from .managers import SearchTokenManager, SearchTermManager
+
+
+# ==========================================================================================================
+# Inverted index of the properties used by the search (?search=) of the property lists.
+# Each row links one normalized token to one property and the field it was found in,
+# with a weight depending on the field (a word of the title counts more than a word of the description).
+# The rows are rebuilt incrementally by signals.py when a property, a city, a category, a price type
+# or a username changes, and entirely by the rebuild_search_index command.
+# ==========================================================================================================
+class SearchToken(models.Model):
+    FIELD_CHOICES = [
+        ('title', 'Title'),
+        ('description', 'Description'),
+        ('address', 'Address'),
+        ('city', 'City'),
+        ('category_type', 'Category Type'),
+        ('main_category', 'Main Category'),
+        ('sub_category', 'Sub Category'),
+        ('price_type', 'Price Type'),
+        ('user', 'User'),
+    ]
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='search_tokens')
+    field = models.CharField(max_length=20, choices=FIELD_CHOICES)
+    token = models.CharField(max_length=100, db_index=True)
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    objects = SearchTokenManager()
+
+    class Meta:
+        verbose_name = "Search Token"
+        verbose_name_plural = "Search Tokens"
+        unique_together = [('property', 'field', 'token')]
+        indexes = [
+            models.Index(fields=['token', 'property']),
+        ]
+
+    def __str__(self):
+        return f"{self.token} ({self.field})"
+# ==========================================================================================================
+# End SearchToken Model
+# ==========================================================================================================
+
+
+
+# ==========================================================================================================
+# Vocabulary of the fuzzy search (?search=...&fuzzy=1): every distinct token found in the titles,
+# addresses, cities and categories, with its character trigrams in TermTrigram.
+# A misspelled query word is matched to the terms sharing the most trigrams with it (similarity),
+# then the terms are looked up in SearchToken like normal words.
+# New terms are registered when a property is indexed, rebuild_search_index prunes the unused ones.
+# ==========================================================================================================
+class SearchTerm(models.Model):
+    term = models.CharField(max_length=100, unique=True)
+    trigram_count = models.PositiveSmallIntegerField(db_index=True)
+
+    objects = SearchTermManager()
+
+    class Meta:
+        verbose_name = "Search Term"
+        verbose_name_plural = "Search Terms"
+
+    def __str__(self):
+        return self.term
+
+
+class TermTrigram(models.Model):
+    term = models.ForeignKey(SearchTerm, on_delete=models.CASCADE, related_name='trigrams')
+    trigram = models.CharField(max_length=3)
+
+    class Meta:
+        verbose_name = "Term Trigram"
+        verbose_name_plural = "Term Trigrams"
+        unique_together = [('term', 'trigram')]
+        indexes = [
+            models.Index(fields=['trigram', 'term']),
+        ]
+
+    def __str__(self):
+        return f"{self.trigram} ({self.term_id})"
+# ==========================================================================================================
+# End SearchTerm & TermTrigram Models
+# ==========================================================================================================
@@ -0,0 +1,63 @@
+import re
+import unicodedata
+
+
+# ==========================================================================================
+# Text normalization shared by the search index and the search queries.
+# Both sides go through the same function, so "Casablanca", "CASABLANCA" and "Càsablanca",
+# or "الدار البيضاء" written with or without harakat / hamza, produce the same tokens.
+# ==========================================================================================
+ARABIC_DIACRITICS = re.compile('[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED]')
+ARABIC_TATWEEL = '\u0640'
+ARABIC_LETTERS = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',     # alef variants
+    'ى': 'ي', 'ئ': 'ي',                        # alef maqsura / yeh with hamza
+    'ؤ': 'و',                                  # waw with hamza
+    'ة': 'ه',                                  # teh marbuta
+})
+TOKEN_PATTERN = re.compile(r'[^\W_]+')
+ARABIC_ARTICLE = 'ال'
+MAX_TOKEN_LENGTH = 100
+# ==========================================================================================
+
+
+
+# ==========================================================================================
+# lower case text without Latin accents, Arabic diacritics, tatweel and letter variants,
+# Arabic-Indic digits are converted to ASCII digits
+# ==========================================================================================
+def normalize_text(text):
+    if not text:
+        return ""
+    text = unicodedata.normalize('NFKC', str(text))
+    text = ARABIC_DIACRITICS.sub('', text).replace(ARABIC_TATWEEL, '').translate(ARABIC_LETTERS)
+    text = ''.join(
+        str(unicodedata.decimal(char)) if char.isdigit() and unicodedata.decimal(char, None) is not None else char
+        for char in unicodedata.normalize('NFKD', text)
+        if not unicodedata.combining(char)
+    )
+    return text.casefold()
+# ==========================================================================================
+
+# ==========================================================================================
+# split a text into normalized tokens (words and numbers),
+# single letters are dropped (French elisions l' d') and the Arabic article "ال" is removed
+# ==========================================================================================
+def tokenize(text):
+    tokens = []
+    for token in TOKEN_PATTERN.findall(normalize_text(text)):
+        if token.startswith(ARABIC_ARTICLE) and len(token) > 3:
+            token = token[len(ARABIC_ARTICLE):]
+        if len(token) > 1 or token.isdigit():
+            tokens.append(token[:MAX_TOKEN_LENGTH])
+    return tokens
+# ==========================================================================================
+
+# ==========================================================================================
+# character trigrams of a normalized token, padded like pg_trgm so the start and the end
+# of the word count more: "casa" => {"  c", " ca", "cas", "asa", "sa "}
+# ==========================================================================================
+def trigrams(token):
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+# ==========================================================================================
@@ -0,0 +1,81 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+from categories.models import CategoryType, MainCategory, SubCategory
+from properties.models import Property, PriceType
+from settings_app.models import City
+from utils.cache import bump_cache_version
+from .models import SearchToken
+
+
+# ==========================================================================================================
+# Keep the search index of a property in sync with its own text fields.
+# A save limited to other columns (update_fields=[...]) does not touch the index.
+# ==========================================================================================================
+INDEXED_PROPERTY_FIELDS = {'title', 'description', 'address', 'city', 'category_type', 'main_category', 'sub_category', 'price_type', 'user'}
+
+
+@receiver(post_save, sender=Property)
+def index_property(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    fields = None
+    if update_fields is not None:
+        fields = [field for field in SearchToken.objects.FIELD_WEIGHTS if field in INDEXED_PROPERTY_FIELDS & set(update_fields)]
+        if not fields:
+            return
+    SearchToken.objects.index_properties([instance], fields)
+# ==========================================================================================================
+
+
+# ==========================================================================================================
+# A renamed city / category / price type / user changes the tokens of all its properties,
+# a deleted one sets the foreign key of its properties to NULL without saving them,
+# so its tokens are removed from the index before the delete.
+# Both change the results of the searched lists, so their cached counts are invalidated,
+# and the names displayed by the cached property responses ("properties:related").
+# ==========================================================================================================
+def invalidate_searched_properties():
+    # after the commit: bumped before it, another process could cache the old names under the new versions
+    def bump():
+        bump_cache_version('properties')
+        bump_cache_version('properties:related')
+    transaction.on_commit(bump)
+
+
+RELATED_FIELDS = {
+    City: 'city',
+    CategoryType: 'category_type',
+    MainCategory: 'main_category',
+    SubCategory: 'sub_category',
+    PriceType: 'price_type',
+}
+
+
+def reindex_related_properties(sender, instance, created=False, raw=False, **kwargs):
+    if created or raw:
+        return
+    field = RELATED_FIELDS[sender]
+    SearchToken.objects.index_queryset(Property.objects.filter(**{field: instance}), fields=[field])
+    invalidate_searched_properties()
+
+
+def remove_related_tokens(sender, instance, **kwargs):
+    field = RELATED_FIELDS[sender]
+    SearchToken.objects.filter(field=field, property__in=Property.objects.filter(**{field: instance})).delete()
+    invalidate_searched_properties()
+
+
+for model in RELATED_FIELDS:
+    post_save.connect(reindex_related_properties, sender=model, dispatch_uid=f'search_reindex_{model.__name__}')
+    pre_delete.connect(remove_related_tokens, sender=model, dispatch_uid=f'search_remove_{model.__name__}')
+
+
+@receiver(post_save, sender=get_user_model())
+def reindex_user_properties(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if created or raw or (update_fields is not None and 'username' not in update_fields):
+        return
+    SearchToken.objects.index_queryset(Property.objects.filter(user=instance), fields=['user'])
+    invalidate_searched_properties()
+# ==========================================================================================================
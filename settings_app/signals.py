@@ -1,5 +1,7 @@
-from django.db.models.signals import post_migrate
+from django.db.models.signals import post_delete, post_migrate, post_save
 from django.dispatch import receiver
+from utils.reference import invalidate_references
+from .models import City
 
 @receiver(post_migrate)
 def create_default_settings(sender, **kwargs):
@@ -14,3 +16,14 @@ def create_default_settings(sender, **kwargs):
         SocialMediaSettings.get_social_media_settings()
         SeoSettings.get_seo_settings()
         SecuritySettings.get_security_settings()
+
+
+
+# ==========================================================================================================
+# the cities are read from the process-local reference cache (utils/reference.py)
+# ==========================================================================================================
+@receiver(post_save, sender=City)
+@receiver(post_delete, sender=City)
+def invalidate_cities(sender, instance, **kwargs):
+    invalidate_references(City)
+# ==========================================================================================================
@@ -17,6 +17,8 @@ from .serializers import (PlatformSettingsSerializer, SocialMediaSettingsSeriali
                           SecuritySettingsSerializer, CitySerializer, UserSettingsSerializer, UserSettingsWithUserSerializer)
 #  imprt model auth User
 from django.contrib.auth import get_user_model
+from utils.cache import ConditionalGetMixin
+from utils.reference import get_references
 User = get_user_model()
 # ============================================================================================
 
@@ -147,7 +149,8 @@ class CityViewSet(viewsets.ModelViewSet):
     pagination_class = None 
     @action(detail=False, methods=['get'])
     def active(self, request):
-        cities = City.get_active_cities()
+        # served from the process-local reference cache (utils/reference.py), ordered by name
+        cities = get_references(City, status=True)
         serializer = self.get_serializer(cities, many=True)
         return Response(serializer.data)
     
@@ -234,8 +237,19 @@ class AllUserSettingsListView(generics.ListAPIView):
 # ============================================================================================
 # Combined All Settings API 
 # ============================================================================================
+# Polling clients get a 304 from the updated_at of the three settings rows (one query)
 @permission_classes([AllowAny])  
-class AllSettingsAPIView(views.APIView):   
+class AllSettingsAPIView(ConditionalGetMixin, views.APIView):   
+    settings_models = (PlatformSettings, SocialMediaSettings, SeoSettings)
+
+    def get_conditional_validators(self, request):
+        querysets = [model.objects.order_by().values_list('updated_at', flat=True) for model in self.settings_models]
+        updated = list(querysets[0].union(*querysets[1:], all=True))
+        if len(updated) < len(self.settings_models):
+            # the missing rows are created with their defaults by get()
+            return None
+        return sorted(updated), max(updated)
+
     def get(self, request):
         try:
 
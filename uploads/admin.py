@@ -0,0 +1,14 @@
+from django.contrib import admin
+from .models import UploadSession, MediaBlob
+
+# ========================================================
+#  register UploadSession Model
+# ========================================================
+admin.site.register(UploadSession)
+# ========================================================
+
+# ========================================================
+#  register MediaBlob Model
+# ========================================================
+admin.site.register(MediaBlob)
+# ========================================================
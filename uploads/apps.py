@@ -0,0 +1,15 @@
+from django.apps import AppConfig
+
+
+class UploadsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'uploads'
+
+    def ready(self):
+        # =====================================================
+        # remove the temporary file of a deleted upload session,
+        # release the media files of the deleted rows
+        # =====================================================
+        import uploads.signals
+        uploads.signals.connect_media_fields()
+        # =====================================================
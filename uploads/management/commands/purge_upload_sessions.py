@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from uploads.models import UploadSession
+
+
+# ==========================================================================================================
+# Delete the upload sessions abandoned or never attached, with their temporary files (run it daily).
+#   python manage.py purge_upload_sessions [--hours 24]
+# ==========================================================================================================
+class Command(BaseCommand):
+    help = "Delete the expired upload sessions and their temporary files"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=None, help="Age of the sessions to delete (default: UPLOAD_SESSION_EXPIRY_HOURS)")
+
+    def handle(self, *args, **options):
+        total = UploadSession.purge_expired(options['hours'])
+        self.stdout.write(self.style.SUCCESS(f"Done: {total} upload sessions deleted"))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from uploads.models import MediaBlob
+
+
+# ==========================================================================================================
+# Rebuild the reference counts of the content-addressed media storage from the rows, and remove the blobs
+# and the files nothing references anymore (rows deleted with raw SQL, rolled back uploads). Run it weekly.
+#   python manage.py repair_media_blobs [--grace-hours 1]
+# ==========================================================================================================
+class Command(BaseCommand):
+    help = "Recount the references of the media blobs and remove the unreferenced files"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=int, default=1, help="Keep the unreferenced files younger than this (uploads in progress)")
+
+    def handle(self, *args, **options):
+        updated, deleted, removed = MediaBlob.rebuild_counts(options['grace_hours'])
+        self.stdout.write(self.style.SUCCESS(f"Done: {updated} blobs recounted, {deleted} blobs deleted, {removed} files removed"))
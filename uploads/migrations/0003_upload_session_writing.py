@@ -0,0 +1,18 @@
+# Generated by Django 4.2.13 on 2026-10-18 04:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uploads', '0002_mediablob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='uploadsession',
+            name='status',
+            field=models.CharField(choices=[('uploading', 'Uploading'), ('writing', 'Writing'), ('complete', 'Complete')], default='uploading', max_length=10, verbose_name='Status'),
+        ),
+    ]
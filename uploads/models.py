@@ -0,0 +1,259 @@
+import os
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.core.files import File
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+
+# ==========================================================================================================
+# A file uploaded in several requests (property videos, image batches from mobile clients).
+# The client creates the session with the name and the total size of the file, sends the bytes in chunks
+# at the current offset, and finalizes it. A dropped connection keeps every byte already written:
+# the client reads the offset of the session and resumes from there.
+# The chunks are written straight to a temporary file under MEDIA_ROOT (UPLOAD_TEMP_DIR), so a worker never
+# holds more than one read block in memory, and a finalized file is moved (not copied) to its final place
+# when its id is attached to a property (see PropertyCreateSerializer).
+# ==========================================================================================================
+class UploadSession(models.Model):
+    KIND_IMAGE = 'image'
+    KIND_VIDEO = 'video'
+    KIND_CHOICES = [(KIND_IMAGE, 'Image'), (KIND_VIDEO, 'Video')]
+
+    STATUS_UPLOADING = 'uploading'
+    STATUS_WRITING = 'writing'
+    STATUS_COMPLETE = 'complete'
+    STATUS_CHOICES = [(STATUS_UPLOADING, 'Uploading'), (STATUS_WRITING, 'Writing'), (STATUS_COMPLETE, 'Complete')]
+
+    # extensions accepted for each kind
+    EXTENSIONS = {
+        KIND_IMAGE: ['.jpg', '.jpeg', '.png', '.webp', '.gif'],
+        KIND_VIDEO: ['.mp4', '.mov', '.m4v', '.webm', '.3gp'],
+    }
+    # bytes read from the request and written to the file at a time
+    READ_BLOCK_SIZE = 64 * 1024
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='upload_sessions')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, verbose_name="Kind")
+    filename = models.CharField(max_length=255, verbose_name="File Name")
+    content_type = models.CharField(max_length=100, blank=True, default='', verbose_name="Content Type")
+    size = models.PositiveBigIntegerField(verbose_name="Size")
+    offset = models.PositiveBigIntegerField(default=0, verbose_name="Offset")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_UPLOADING, verbose_name="Status")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Upload Session"
+        verbose_name_plural = "Upload Sessions"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'status']),
+            models.Index(fields=['updated_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
+
+    # ======================================================================================
+    # temporary file of the session
+    # ======================================================================================
+    @property
+    def temp_path(self):
+        return os.path.join(settings.UPLOAD_TEMP_DIR, f"{self.id.hex}.part")
+
+    def create_temp_file(self):
+        os.makedirs(settings.UPLOAD_TEMP_DIR, exist_ok=True)
+        open(self.temp_path, 'wb').close()
+    # ======================================================================================
+    #
+    #
+    # ======================================================================================
+    # Write a chunk read from a stream at the given offset and move the offset of the session.
+    # Only the bytes really received are counted: a chunk interrupted by the network is kept
+    # and the next request resumes after its last byte.
+    # The session is claimed before any byte is written: a conditional UPDATE on the expected offset
+    # sets the status to writing and commits at once, so a concurrent request for the same offset
+    # finds it claimed and writes nothing, and no lock is held while the bytes come from the client.
+    # The offset is then moved by a second conditional UPDATE that releases the claim. A claim older
+    # than UPLOAD_CHUNK_LEASE_SECONDS (a worker killed during a write) can be taken again.
+    # Returns the new offset, or None when the offset moved or the session is claimed.
+    # ======================================================================================
+    def write_chunk(self, stream, offset, length):
+        sessions = UploadSession.objects.filter(pk=self.pk, offset=offset)
+        claimed_at = timezone.now()
+        expired = claimed_at - timedelta(seconds=settings.UPLOAD_CHUNK_LEASE_SECONDS)
+        claimable = Q(status=self.STATUS_UPLOADING) | Q(status=self.STATUS_WRITING, updated_at__lt=expired)
+        if not sessions.filter(claimable).update(status=self.STATUS_WRITING, updated_at=claimed_at):
+            return None
+
+        written = 0
+        try:
+            with open(self.temp_path, 'r+b') as file:
+                file.seek(offset)
+                while written < length:
+                    block = stream.read(min(self.READ_BLOCK_SIZE, length - written))
+                    if not block:
+                        break
+                    file.write(block)
+                    written += len(block)
+        finally:
+            # the claim is released even when the stream fails, keeping the bytes already written
+            released = sessions.filter(status=self.STATUS_WRITING, updated_at=claimed_at).update(
+                status=self.STATUS_UPLOADING, offset=offset + written, updated_at=timezone.now()
+            )
+        if not released:
+            # the claim expired and was taken by another request
+            return None
+        self.offset = offset + written
+        return self.offset
+    # ======================================================================================
+    #
+    #
+    # ======================================================================================
+    # The uploaded file for a FileField: the storage moves it instead of copying it
+    # (FileSystemStorage uses temporary_file_path() like for the large uploads of Django)
+    #   with session.open_file() as file:
+    #       PropertyImage.objects.create(property=property, image=file)
+    # ======================================================================================
+    def open_file(self):
+        return UploadedSessionFile(open(self.temp_path, 'rb'), name=self.filename)
+    # ======================================================================================
+    #
+    #
+    # ======================================================================================
+    # Delete the sessions not attached after UPLOAD_SESSION_EXPIRY_HOURS, with their files
+    # ======================================================================================
+    @classmethod
+    def purge_expired(modelClass, hours=None):
+        hours = hours if hours is not None else getattr(settings, 'UPLOAD_SESSION_EXPIRY_HOURS', 24)
+        expired = modelClass.objects.filter(updated_at__lt=timezone.now() - timedelta(hours=hours))
+        total = 0
+        for session in expired.iterator():
+            session.delete()
+            total += 1
+        return total
+    # ======================================================================================
+# ==========================================================================================================
+# End UploadSession Model
+# ==========================================================================================================
+
+
+class UploadedSessionFile(File):
+    def temporary_file_path(self):
+        return self.file.name
+
+
+
+# ==========================================================================================================
+# A file of the content-addressed media storage (see storage.py) and the number of model rows referencing it.
+# The file is removed when the count drops to zero, a count can be rebuilt from the rows with
+# the repair_media_blobs command (rows deleted with raw SQL, files left by rolled back transactions).
+# ==========================================================================================================
+class MediaBlob(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    name = models.CharField(max_length=255, unique=True, verbose_name="Name")
+    sha256 = models.CharField(max_length=64, db_index=True, verbose_name="SHA-256")
+    size = models.PositiveBigIntegerField(default=0, verbose_name="Size")
+    refcount = models.PositiveIntegerField(default=0, verbose_name="References")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Media Blob"
+        verbose_name_plural = "Media Blobs"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount})"
+
+    # ======================================================================================
+    # one more reference to a blob, created on its first reference
+    # ======================================================================================
+    @classmethod
+    def acquire(modelClass, name, sha256, size):
+        if modelClass.retain(name):
+            return
+        try:
+            with transaction.atomic():
+                modelClass.objects.create(name=name, sha256=sha256, size=size, refcount=1)
+        except IntegrityError:
+            # created by a concurrent upload of the same content
+            modelClass.retain(name)
+
+    @classmethod
+    def retain(modelClass, name):
+        return modelClass.objects.filter(name=name).update(refcount=F('refcount') + 1) > 0
+    # ======================================================================================
+    #
+    #
+    # ======================================================================================
+    # One reference less. Returns True when the file must be removed: last reference,
+    # or a name the storage does not count (files stored before it).
+    # ======================================================================================
+    @classmethod
+    def release(modelClass, name):
+        with transaction.atomic():
+            if modelClass.objects.filter(name=name, refcount__gt=1).update(refcount=F('refcount') - 1):
+                return False
+            modelClass.objects.filter(name=name).delete()
+        return True
+    # ======================================================================================
+    #
+    #
+    # ======================================================================================
+    # Recount the references of every blob from the rows of the file fields using the storage,
+    # drop the blobs nobody references and the files of the blob directory without a blob
+    # (left by rolled back transactions), files younger than grace_hours are kept (uploads in progress).
+    # Returns (blobs updated, blobs deleted, files removed).
+    # ======================================================================================
+    @classmethod
+    def rebuild_counts(modelClass, grace_hours=1):
+        from collections import Counter
+        from django.apps import apps
+        from .signals import media_fields
+        from .storage import media_storage
+
+        references = Counter()
+        for model in apps.get_models():
+            for field in media_fields(model):
+                names = model._base_manager.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True}).values_list(field, flat=True)
+                references.update(name for name in names.iterator() if name.startswith(f'{media_storage.BLOB_DIR}/'))
+
+        updated = deleted = 0
+        known = set()
+        for blob in modelClass.objects.iterator():
+            known.add(blob.name)
+            count = references.get(blob.name, 0)
+            if count == 0:
+                blob.delete()
+                deleted += 1
+            elif count != blob.refcount:
+                modelClass.objects.filter(pk=blob.pk).update(refcount=count)
+                updated += 1
+
+        for name in set(references) - known:
+            if media_storage.exists(name):
+                digest, size = media_storage.hash_file(media_storage.path(name))
+                modelClass.objects.create(name=name, sha256=digest, size=size, refcount=references[name])
+                updated += 1
+
+        removed = 0
+        root = media_storage.path(media_storage.BLOB_DIR)
+        limit = timezone.now().timestamp() - grace_hours * 3600
+        for directory, _, files in os.walk(root):
+            for filename in files:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, media_storage.location).replace(os.sep, '/')
+                if name not in references and os.path.getmtime(path) < limit:
+                    os.remove(path)
+                    removed += 1
+        return updated, deleted, removed
+    # ======================================================================================
+# ==========================================================================================================
+# End MediaBlob Model
+# ==========================================================================================================
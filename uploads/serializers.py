@@ -0,0 +1,64 @@
+import os
+from django.conf import settings
+from rest_framework import serializers
+from .models import UploadSession
+
+
+# ========================================================================
+# UploadSessionSerializer: create a session and report its progress
+# ========================================================================
+class UploadSessionSerializer(serializers.ModelSerializer):
+    chunk_size = serializers.SerializerMethodField(read_only=True)
+
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'kind', 'filename', 'content_type', 'size', 'offset', 'status', 'chunk_size', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'offset', 'status', 'created_at', 'updated_at']
+
+    # largest chunk accepted by the chunk endpoint
+    def get_chunk_size(self, session):
+        return settings.UPLOAD_CHUNK_MAX_SIZE
+
+    def validate_filename(self, filename):
+        filename = os.path.basename(filename.strip())
+        if not filename:
+            raise serializers.ValidationError("A file name is required.")
+        return filename
+
+    def validate(self, data):
+        extension = os.path.splitext(data['filename'])[1].lower()
+        if extension not in UploadSession.EXTENSIONS[data['kind']]:
+            raise serializers.ValidationError({'filename': f"Allowed extensions: {', '.join(UploadSession.EXTENSIONS[data['kind']])}"})
+        max_size = settings.UPLOAD_MAX_SIZES[data['kind']]
+        if not 0 < data['size'] <= max_size:
+            raise serializers.ValidationError({'size': f"The size must be between 1 and {max_size} bytes."})
+        return data
+
+    def create(self, data):
+        session = super().create(data)
+        session.create_temp_file()
+        return session
+# ========================================================================
+# 
+# 
+# 
+# ========================================================================
+# Field of the upload ids attached to a model: the finalized sessions of the current user
+#   image_uploads = UploadSessionField(kind=UploadSession.KIND_IMAGE, many=True, required=False, write_only=True)
+# ========================================================================
+class UploadSessionField(serializers.PrimaryKeyRelatedField):
+    default_error_messages = {
+        'does_not_exist': 'Upload "{pk_value}" does not exist or is not finalized.',
+    }
+
+    def __init__(self, kind, **kwargs):
+        self.kind = kind
+        super().__init__(**kwargs)
+
+    def get_queryset(self):
+        request = self.context.get('request')
+        user = request.user if request is not None else None
+        if user is None or not user.is_authenticated:
+            return UploadSession.objects.none()
+        return UploadSession.objects.filter(user=user, kind=self.kind, status=UploadSession.STATUS_COMPLETE)
+# ========================================================================
@@ -0,0 +1,45 @@
+import os
+from django.apps import apps
+from django.db.models import FileField
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from utils.helpers import safe_delete_file
+from .models import UploadSession
+from .storage import ContentAddressedStorage
+
+
+# ==========================================================================================================
+# An upload session owns its temporary file: aborted, purged or attached (the file was moved already)
+# ==========================================================================================================
+@receiver(post_delete, sender=UploadSession)
+def delete_upload_temp_file(sender, instance, **kwargs):
+    try:
+        os.remove(instance.temp_path)
+    except FileNotFoundError:
+        pass
+# ==========================================================================================================
+
+
+# ==========================================================================================================
+# A deleted row (directly or in cascade) releases its references to the content-addressed storage,
+# the blobs shared with other rows stay. Connected for every file field stored there (see apps.py).
+# ==========================================================================================================
+def media_fields(model):
+    return [
+        field.name for field in model._meta.get_fields()
+        if isinstance(field, FileField) and isinstance(field.storage, ContentAddressedStorage)
+    ]
+
+
+def release_media_files(sender, instance, **kwargs):
+    for name in sender._media_fields:
+        safe_delete_file(getattr(instance, name))
+
+
+def connect_media_fields():
+    for model in apps.get_models():
+        fields = media_fields(model)
+        if fields:
+            model._media_fields = fields
+            post_delete.connect(release_media_files, sender=model, dispatch_uid=f'release_media_files.{model._meta.label}')
+# ==========================================================================================================
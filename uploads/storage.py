@@ -0,0 +1,107 @@
+import hashlib
+import os
+import tempfile
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils.deconstruct import deconstructible
+
+
+# ==========================================================================================================
+# Content-addressed storage of the media uploaded again and again (property images and their variants,
+# property videos, chat images, avatars). A file is hashed (SHA-256) while it is written, and stored once under
+# blobs/<aa>/<bb>/<sha256><ext> whatever the name it was uploaded with: the same photo attached to ten listings
+# or sent in ten messages is one file on the disk, one URL for the browsers and the CDN, and one set of variants.
+# Each stored name has a MediaBlob row counting the model rows that reference it. Saving a file adds a reference,
+# deleting it (FieldFile.delete, safe_delete_file, handle_file_update) removes one, and the file itself is
+# removed with its last reference once the transaction is committed.
+# Names stored before this storage (no MediaBlob row) are deleted directly as before.
+# ==========================================================================================================
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    # directory of the blobs under MEDIA_ROOT
+    BLOB_DIR = 'blobs'
+    # bytes read and hashed at a time
+    CHUNK_SIZE = 64 * 1024
+
+    # ======================================================================================
+    # the name of a blob only depends on its content (and the extension of the uploaded name)
+    # ======================================================================================
+    def blob_name(self, digest, name):
+        extension = os.path.splitext(name)[1].lower()
+        return f"{self.BLOB_DIR}/{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+    def get_available_name(self, name, max_length=None):
+        # the requested name is never used as is, there is nothing to make unique
+        return name
+    # ======================================================================================
+    #
+    #
+    # ======================================================================================
+    # Files already on the disk (large uploads, upload sessions) are hashed in place and moved,
+    # other files are streamed to a temporary file of the blob directory while they are hashed.
+    # An existing blob is not written again: the new copy is dropped and the blob gets one more reference.
+    # ======================================================================================
+    def _save(self, name, content):
+        from .models import MediaBlob
+
+        temporary = None
+        if hasattr(content, 'temporary_file_path'):
+            source = content.temporary_file_path()
+            digest, size = self.hash_file(source)
+        else:
+            directory = self.path(self.BLOB_DIR)
+            os.makedirs(directory, exist_ok=True)
+            hasher, size = hashlib.sha256(), 0
+            with tempfile.NamedTemporaryFile(dir=directory, suffix='.part', delete=False) as temporary:
+                for chunk in content.chunks(self.CHUNK_SIZE):
+                    hasher.update(chunk)
+                    temporary.write(chunk)
+                    size += len(chunk)
+            source, digest = temporary.name, hasher.hexdigest()
+
+        final_name = self.blob_name(digest, name)
+        path = self.path(final_name)
+        MediaBlob.acquire(final_name, digest, size)
+
+        if os.path.exists(path):
+            if temporary is not None:
+                os.remove(source)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            file_move_safe(source, path, allow_overwrite=True)
+            if self.file_permissions_mode is not None:
+                os.chmod(path, self.file_permissions_mode)
+        return final_name
+
+    def hash_file(self, path):
+        hasher, size = hashlib.sha256(), 0
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(self.CHUNK_SIZE), b''):
+                hasher.update(chunk)
+                size += len(chunk)
+        return hasher.hexdigest(), size
+    # ======================================================================================
+    #
+    #
+    # ======================================================================================
+    # remove one reference, the file goes with the last one after the commit
+    # (and stays if the same content was stored again meanwhile)
+    # ======================================================================================
+    def delete(self, name):
+        from .models import MediaBlob
+
+        if not name or not MediaBlob.release(name):
+            return
+
+        def remove():
+            if not MediaBlob.objects.filter(name=name).exists():
+                super(ContentAddressedStorage, self).delete(name)
+        transaction.on_commit(remove)
+    # ======================================================================================
+# ==========================================================================================================
+# End ContentAddressedStorage
+# ==========================================================================================================
+
+
+media_storage = ContentAddressedStorage()
@@ -0,0 +1,276 @@
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+from PIL import Image
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+from categories.models import CategoryType, MainCategory, SubCategory
+from properties.images import ImageVariantGenerator
+from properties.models import PriceType, Property, PropertyImage
+from settings_app.models import City
+from .models import MediaBlob, UploadSession
+from .storage import media_storage
+
+
+# ==========================================================================================
+# Media files of the tests are written to a temporary directory removed after each test,
+# the background tasks (image variants, refreshes) run inline after the commit
+# ==========================================================================================
+def image_content(color='red', size=(40, 30)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class MediaTestMixin:
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media_settings = override_settings(MEDIA_ROOT=media_root, UPLOAD_TEMP_DIR=f"{media_root}/uploads/tmp", BACKGROUND_TASKS_EAGER=True)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        self.user = get_user_model().objects.create_user(username='owner', email='owner@example.com', phone='0600000001', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_session(self, size, kind=UploadSession.KIND_VIDEO, filename='video.mp4'):
+        response = self.client.post('/api/uploads/create/', {'kind': kind, 'filename': filename, 'size': size}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return UploadSession.objects.get(pk=response.data['id'])
+
+    def put_chunk(self, session, offset, data):
+        return self.client.generic('PUT', f'/api/uploads/{session.pk}/chunk/', data, content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET=str(offset))
+
+    def upload(self, data, kind=UploadSession.KIND_VIDEO, filename='video.mp4'):
+        session = self.create_session(len(data), kind=kind, filename=filename)
+        self.assertEqual(self.put_chunk(session, 0, data).status_code, 200)
+        return session, self.client.post(f'/api/uploads/{session.pk}/finalize/')
+
+    def create_property(self, **fields):
+        if not hasattr(self, 'city'):
+            self.city = City.objects.create(name='Casablanca')
+            self.category_type = CategoryType.objects.create(title='Sale')
+            self.main_category = MainCategory.objects.create(title='Residential')
+            self.sub_category = SubCategory.objects.create(title='Apartment', main=self.main_category)
+            self.price_type = PriceType.objects.create(name='Total')
+        return Property.objects.create(
+            title='Apartment', description='Bright apartment', user=self.user, city=self.city, address='Maarif',
+            category_type=self.category_type, main_category=self.main_category, sub_category=self.sub_category,
+            area=80, price=1000000, price_type=self.price_type, **fields,
+        )
+
+    def blob_exists(self, name):
+        return MediaBlob.objects.filter(name=name).exists() and media_storage.exists(name)
+
+    def refcount(self, name):
+        return MediaBlob.objects.get(name=name).refcount
+# ==========================================================================================
+#
+#
+#
+# ==========================================================================================
+# A stream that sends its first block, then waits to be released before the rest:
+# a client slow to send the body of its chunk
+# ==========================================================================================
+class SlowStream:
+    def __init__(self, data):
+        self.data = data
+        self.position = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def read(self, size):
+        if self.position:
+            self.release.wait(10)
+        block = self.data[self.position:self.position + size]
+        self.position += len(block)
+        self.started.set()
+        return block
+# ==========================================================================================
+#
+#
+#
+# ==========================================================================================
+# Chunks: a chunk claims its session while its bytes are received, without holding a lock
+# ==========================================================================================
+class UploadChunkTests(MediaTestMixin, TransactionTestCase):
+    def test_chunks_are_written_at_the_offset(self):
+        session = self.create_session(6)
+        self.assertEqual(self.put_chunk(session, 0, b'abc').data['offset'], 3)
+        self.assertEqual(self.put_chunk(session, 3, b'def').data['offset'], 6)
+        with open(session.temp_path, 'rb') as file:
+            self.assertEqual(file.read(), b'abcdef')
+
+    def test_duplicate_chunk_is_refused(self):
+        session = self.create_session(6)
+        self.assertEqual(self.put_chunk(session, 0, b'abc').status_code, 200)
+        response = self.put_chunk(session, 0, b'xyz')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['offset'], 3)
+        with open(session.temp_path, 'rb') as file:
+            self.assertEqual(file.read(3), b'abc')
+
+    def test_concurrent_chunks_at_the_same_offset(self):
+        data = b'a' * (UploadSession.READ_BLOCK_SIZE * 2)
+        session = self.create_session(len(data))
+        other = self.create_session(3)
+        stream = SlowStream(data)
+        results = []
+
+        def write_slowly():
+            try:
+                results.append(UploadSession.objects.get(pk=session.pk).write_chunk(stream, 0, len(data)))
+            finally:
+                connection.close()
+
+        writer = threading.Thread(target=write_slowly)
+        writer.start()
+        try:
+            self.assertTrue(stream.started.wait(10))
+            # the same offset is refused while the first chunk is received
+            response = self.put_chunk(session, 0, b'b' * 10)
+            self.assertEqual(response.status_code, 409)
+            self.assertEqual(UploadSession.objects.get(pk=session.pk).status, UploadSession.STATUS_WRITING)
+            # another upload is not blocked by the chunk in progress
+            self.assertEqual(self.put_chunk(other, 0, b'xyz').status_code, 200)
+        finally:
+            stream.release.set()
+            writer.join(10)
+
+        self.assertEqual(results, [len(data)])
+        session.refresh_from_db()
+        self.assertEqual((session.offset, session.status), (len(data), UploadSession.STATUS_UPLOADING))
+        with open(session.temp_path, 'rb') as file:
+            self.assertEqual(file.read(), data)
+
+    def test_expired_claim_can_be_taken_again(self):
+        session = self.create_session(3)
+        UploadSession.objects.filter(pk=session.pk).update(status=UploadSession.STATUS_WRITING)
+        self.assertEqual(self.put_chunk(session, 0, b'abc').status_code, 409)
+        with self.settings(UPLOAD_CHUNK_LEASE_SECONDS=0):
+            self.assertEqual(self.put_chunk(session, 0, b'abc').status_code, 200)
+# ==========================================================================================
+#
+#
+#
+# ==========================================================================================
+# Finalize: all the bytes are required, and the images are checked
+# ==========================================================================================
+class UploadFinalizeTests(MediaTestMixin, TransactionTestCase):
+    def test_incomplete_upload_is_refused(self):
+        session = self.create_session(6)
+        self.put_chunk(session, 0, b'abc')
+        self.assertEqual(self.client.post(f'/api/uploads/{session.pk}/finalize/').status_code, 400)
+
+    def test_image_is_finalized(self):
+        session, response = self.upload(image_content(), kind=UploadSession.KIND_IMAGE, filename='photo.png')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], UploadSession.STATUS_COMPLETE)
+
+    def test_non_image_is_refused(self):
+        session, response = self.upload(b'not an image at all', kind=UploadSession.KIND_IMAGE, filename='photo.png')
+        self.assertEqual(response.status_code, 400)
+        session.refresh_from_db()
+        self.assertEqual(session.status, UploadSession.STATUS_UPLOADING)
+# ==========================================================================================
+#
+#
+#
+# ==========================================================================================
+# Content-addressed storage: one file per content, counted by MediaBlob and removed with its last reference
+# ==========================================================================================
+class MediaBlobTests(MediaTestMixin, TransactionTestCase):
+    def test_same_content_is_stored_once(self):
+        first = media_storage.save('a.txt', ContentFile(b'same content'))
+        second = media_storage.save('b.txt', ContentFile(b'same content'))
+        self.assertEqual(first, second)
+        self.assertEqual(self.refcount(first), 2)
+        self.assertNotEqual(media_storage.save('c.txt', ContentFile(b'other content')), first)
+
+    def test_file_is_removed_with_its_last_reference(self):
+        name = media_storage.save('a.txt', ContentFile(b'same content'))
+        media_storage.save('b.txt', ContentFile(b'same content'))
+        media_storage.delete(name)
+        self.assertTrue(self.blob_exists(name))
+        self.assertEqual(self.refcount(name), 1)
+        media_storage.delete(name)
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+        self.assertFalse(media_storage.exists(name))
+
+    def test_two_properties_share_one_blob(self):
+        content = image_content()
+        first, second = self.create_property(), self.create_property()
+        image = PropertyImage.objects.create(property=first, image=ContentFile(content, name='a.png'))
+        PropertyImage.objects.create(property=second, image=ContentFile(content, name='b.png'))
+        name = image.image.name
+        self.assertEqual(PropertyImage.objects.filter(image=name).count(), 2)
+
+        # the images and their variants are deleted in cascade
+        first.delete()
+        self.assertTrue(self.blob_exists(name))
+        self.assertEqual(self.refcount(name), 1)
+        second.delete()
+        self.assertFalse(media_storage.exists(name))
+        self.assertFalse(MediaBlob.objects.exists())
+
+    def test_same_image_shares_its_variants(self):
+        content = image_content()
+        property = self.create_property()
+        first = PropertyImage.objects.create(property=property, image=ContentFile(content, name='a.png'))
+        names = sorted(first.variants.values_list('file', flat=True))
+        self.assertTrue(names)
+        # the sizes larger than a small image encode the same bytes: count the references per file
+        counts = {name: self.refcount(name) for name in names}
+
+        # nothing is decoded nor encoded again
+        with mock.patch.object(ImageVariantGenerator, 'build_variants', side_effect=AssertionError):
+            second = PropertyImage.objects.create(property=property, image=ContentFile(content, name='b.png'))
+        self.assertEqual(sorted(second.variants.values_list('file', flat=True)), names)
+        self.assertEqual({name: self.refcount(name) for name in names}, {name: count * 2 for name, count in counts.items()})
+
+        second.delete()
+        self.assertEqual({name: self.refcount(name) for name in names}, counts)
+        self.assertTrue(all(media_storage.exists(name) for name in names))
+
+    def test_video_update_releases_the_old_blob(self):
+        property = self.create_property(video=ContentFile(b'old video', name='old.mp4'))
+        old_name = property.video.name
+        self.assertTrue(self.blob_exists(old_name))
+
+        session, response = self.upload(b'new video')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.patch(f'/api/properties/{property.pk}/update/', {'video_upload': str(session.pk)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        property.refresh_from_db()
+        self.assertNotEqual(property.video.name, old_name)
+        self.assertEqual(self.refcount(property.video.name), 1)
+        self.assertFalse(MediaBlob.objects.filter(name=old_name).exists())
+        self.assertFalse(media_storage.exists(old_name))
+
+    def test_rebuild_counts(self):
+        property = self.create_property(video=ContentFile(b'video', name='video.mp4'))
+        name = property.video.name
+        MediaBlob.objects.filter(name=name).update(refcount=5)
+        unused = media_storage.save('unused.txt', ContentFile(b'unused'))
+        # a file left by a rolled back transaction: no blob, older than the grace period
+        orphan = media_storage.path(f'{media_storage.BLOB_DIR}/00/00/orphan.txt')
+        os.makedirs(os.path.dirname(orphan), exist_ok=True)
+        with open(orphan, 'wb') as file:
+            file.write(b'orphan')
+        os.utime(orphan, (time.time() - 7200, time.time() - 7200))
+
+        self.assertEqual(MediaBlob.rebuild_counts(grace_hours=1), (1, 1, 1))
+        self.assertEqual(self.refcount(name), 1)
+        self.assertFalse(MediaBlob.objects.filter(name=unused).exists())
+        self.assertFalse(os.path.exists(orphan))
+        self.assertTrue(media_storage.exists(name))
+# ==========================================================================================
@@ -0,0 +1,13 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    # ==========================================================================
+    # resumable chunked uploads: create, send chunks, finalize, then attach the id
+    # ==========================================================================
+    path('uploads/create/', views.UploadSessionCreateView.as_view(), name='upload_create'),
+    path('uploads/<uuid:pk>/', views.UploadSessionDetailView.as_view(), name='upload_detail'),
+    path('uploads/<uuid:pk>/chunk/', views.UploadSessionChunkView.as_view(), name='upload_chunk'),
+    path('uploads/<uuid:pk>/finalize/', views.UploadSessionFinalizeView.as_view(), name='upload_finalize'),
+    path('uploads/<uuid:pk>/delete/', views.UploadSessionDeleteView.as_view(), name='upload_delete'),
+]
@@ -0,0 +1,122 @@
+from PIL import Image
+from django.conf import settings
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from rest_framework import generics, status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from .models import UploadSession
+from .serializers import UploadSessionSerializer
+# ===========================================================================================
+
+
+# ===========================================================================================
+# Base view of the upload endpoints: only the owner of a session can see or write it
+# ===========================================================================================
+class BaseUploadSessionView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get_session(self, pk):
+        return get_object_or_404(UploadSession, pk=pk, user=self.request.user)
+
+    def session_response(self, session, status_code=status.HTTP_200_OK):
+        return Response(UploadSessionSerializer(session).data, status=status_code)
+# ===========================================================================================
+#
+#
+#
+# ===========================================================================================
+# Create an upload session: {"kind": "image"|"video", "filename", "size", "content_type"}
+# ===========================================================================================
+class UploadSessionCreateView(generics.CreateAPIView):
+    serializer_class = UploadSessionSerializer
+    permission_classes = [IsAuthenticated]
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+# ===========================================================================================
+#
+#
+#
+# ===========================================================================================
+# State of a session: the offset tells a client where to resume after a dropped connection
+# ===========================================================================================
+class UploadSessionDetailView(BaseUploadSessionView):
+    def get(self, request, pk, *args, **kwargs):
+        return self.session_response(self.get_session(pk))
+# ===========================================================================================
+#
+#
+#
+# ===========================================================================================
+# Send a chunk: PUT with the raw bytes as body and the offset of its first byte
+# in the Upload-Offset header (or ?offset=). The body is streamed to the temporary file,
+# never parsed nor buffered. A wrong offset, or a chunk already being written at this offset
+# by another request, answers 409 with the offset to resume from.
+# ===========================================================================================
+class UploadSessionChunkView(BaseUploadSessionView):
+    def put(self, request, pk, *args, **kwargs):
+        session = self.get_session(pk)
+        if session.status == UploadSession.STATUS_COMPLETE:
+            return Response({"message": "This upload is already finalized", "offset": session.offset}, status=status.HTTP_409_CONFLICT)
+
+        try:
+            offset = int(request.headers.get('Upload-Offset', request.query_params.get('offset', '')))
+            length = int(request.headers.get('Content-Length') or 0)
+        except ValueError:
+            return Response({"message": "Upload-Offset and Content-Length are required"}, status=status.HTTP_400_BAD_REQUEST)
+        if offset != session.offset:
+            return Response({"message": "The offset does not match the upload", "offset": session.offset}, status=status.HTTP_409_CONFLICT)
+        if length > settings.UPLOAD_CHUNK_MAX_SIZE:
+            return Response({"message": f"A chunk cannot exceed {settings.UPLOAD_CHUNK_MAX_SIZE} bytes"}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        if offset + length > session.size:
+            return Response({"message": "The chunk goes beyond the size of the upload", "offset": session.offset}, status=status.HTTP_400_BAD_REQUEST)
+
+        if session.write_chunk(request.stream, offset, length) is None:
+            session.refresh_from_db()
+            return Response({"message": "The offset does not match the upload", "offset": session.offset}, status=status.HTTP_409_CONFLICT)
+        return self.session_response(session)
+# ===========================================================================================
+#
+#
+#
+# ===========================================================================================
+# Finalize a session once all its bytes are received, images are checked with Pillow.
+# The id of a finalized session can then be attached to a property (image_uploads / video_upload).
+# ===========================================================================================
+class UploadSessionFinalizeView(BaseUploadSessionView):
+    def post(self, request, pk, *args, **kwargs):
+        session = self.get_session(pk)
+        if session.status == UploadSession.STATUS_COMPLETE:
+            return self.session_response(session)
+        if session.offset != session.size:
+            return Response({"message": "The upload is not complete", "offset": session.offset, "size": session.size}, status=status.HTTP_400_BAD_REQUEST)
+
+        if session.kind == UploadSession.KIND_IMAGE:
+            try:
+                with Image.open(session.temp_path) as image:
+                    image.verify()
+            except Exception:
+                return Response({"message": "The uploaded file is not a valid image"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # a chunk written at the same time would still hold the session
+        finalized = UploadSession.objects.filter(pk=session.pk, status=UploadSession.STATUS_UPLOADING, offset=session.size).update(
+            status=UploadSession.STATUS_COMPLETE, updated_at=timezone.now()
+        )
+        session.refresh_from_db()
+        if not finalized and session.status != UploadSession.STATUS_COMPLETE:
+            return Response({"message": "The upload is not complete", "offset": session.offset, "size": session.size}, status=status.HTTP_409_CONFLICT)
+        return self.session_response(session)
+# ===========================================================================================
+#
+#
+#
+# ===========================================================================================
+# Abort a session and remove its temporary file
+# ===========================================================================================
+class UploadSessionDeleteView(BaseUploadSessionView):
+    def delete(self, request, pk, *args, **kwargs):
+        self.get_session(pk).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+# ===========================================================================================
@@ -0,0 +1,110 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+
+# =========================================================================================
+# Pool of worker threads of the current process running slow work off the request path
+# (image variants ...). A task is submitted once the current transaction is committed so it
+# always reads the saved rows, and closes its database connections when it is done.
+# BACKGROUND_WORKERS sets the size of the pool, BACKGROUND_TASKS_EAGER = True runs the tasks
+# inline right after the commit (management commands, tests, debugging).
+# =========================================================================================
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'BACKGROUND_WORKERS', 2),
+                    thread_name_prefix='background',
+                )
+    return _executor
+# =========================================================================================
+
+# =========================================================================================
+# body of a worker thread: errors are logged, never raised into the pool
+# =========================================================================================
+def run_task(func, *args, **kwargs):
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    except Exception:
+        logger.exception("Background task %s failed", getattr(func, '__name__', func))
+    finally:
+        connections.close_all()
+# =========================================================================================
+
+# =========================================================================================
+# run func(*args, **kwargs) in the pool after the commit of the current transaction
+# =========================================================================================
+def submit_task(func, *args, **kwargs):
+    def submit():
+        if getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+            try:
+                func(*args, **kwargs)
+            except Exception:
+                logger.exception("Background task %s failed", getattr(func, '__name__', func))
+        else:
+            get_executor().submit(run_task, func, *args, **kwargs)
+    transaction.on_commit(submit)
+# =========================================================================================
+
+
+# =========================================================================================
+# Coalescing queue of a refresh: the writes schedule keys instead of running the refresh,
+# the keys of the committed writes are collected by the process for a delay (setting delay_setting),
+# then one background task runs refresh(keys) for all of them. A burst of writes costs one refresh,
+# and the keys arriving while it runs are taken by the same task once it is done, never by a second
+# task running at the same time.
+#   similar_refreshes = RefreshQueue(refresh_similar_properties, 'SIMILAR_PROPERTIES_REFRESH_DELAY')
+#   similar_refreshes.schedule([property.pk])
+# =========================================================================================
+class RefreshQueue:
+    def __init__(self, refresh, delay_setting, default_delay=5):
+        self.refresh = refresh
+        self.delay_setting = delay_setting
+        self.default_delay = default_delay
+        self.lock = threading.Lock()
+        self.pending = set()
+        self.scheduled = False
+
+    def schedule(self, keys):
+        keys = {key for key in keys if key}
+        if keys:
+            transaction.on_commit(lambda: self.add(keys))
+
+    def add(self, keys):
+        with self.lock:
+            self.pending.update(keys)
+            if self.scheduled:
+                return
+            self.scheduled = True
+        delay = getattr(settings, self.delay_setting, self.default_delay)
+        if delay <= 0 or getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+            submit_task(self.run)
+        else:
+            timer = threading.Timer(delay, submit_task, (self.run,))
+            timer.daemon = True
+            timer.start()
+
+    def run(self):
+        while True:
+            with self.lock:
+                keys, self.pending = self.pending, set()
+                if not keys:
+                    self.scheduled = False
+                    return
+            try:
+                self.refresh(keys)
+            except Exception:
+                logger.exception("Background refresh %s of %s keys failed", getattr(self.refresh, '__name__', self.refresh), len(keys))
+# =========================================================================================
@@ -0,0 +1,210 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+
+
+# =========================================================================================
+# Version stamps stored in the configured cache backend (shared by all worker processes).
+# A cached entry embeds the version of the data it was computed from in its key,
+# bumping the version makes every old entry unreachable without having to find and delete it.
+# When the version key is evicted it restarts from the current time, never from an old value.
+# =========================================================================================
+def get_cache_version(namespace):
+    key = f"version:{namespace}"
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+# =========================================================================================
+
+# =========================================================================================
+# versions of several namespaces in one round trip: {namespace: version}
+# =========================================================================================
+def get_cache_versions(namespaces):
+    versions = cache.get_many([f"version:{namespace}" for namespace in namespaces])
+    return {
+        namespace: versions.get(f"version:{namespace}") or get_cache_version(namespace)
+        for namespace in namespaces
+    }
+# =========================================================================================
+
+# =========================================================================================
+# increment the version of a namespace (called from the signals when the data changes)
+# =========================================================================================
+def bump_cache_version(namespace):
+    key = f"version:{namespace}"
+    cache.set(f"modified:{namespace}", time.time(), timeout=None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = time.time_ns()
+        cache.set(key, version, timeout=None)
+        return version
+# =========================================================================================
+
+# =========================================================================================
+# last time one of the namespaces was bumped (Last-Modified of the responses built from them),
+# an evicted time restarts from now so a client is never told that a changed response is not modified
+# =========================================================================================
+def get_cache_modified(namespaces):
+    keys = [f"modified:{namespace}" for namespace in namespaces]
+    times = cache.get_many(keys)
+    for key in keys:
+        if key not in times:
+            cache.add(key, time.time(), timeout=None)
+            times[key] = cache.get(key) or time.time()
+    return datetime.fromtimestamp(max(times.values()), tz=timezone.utc) if times else None
+# =========================================================================================
+
+# =========================================================================================
+# stable hash of query parameters: same filters in any order => same hash
+# parameters listed in exclude (page number, page size ...) are ignored
+# =========================================================================================
+def hash_query_params(params, exclude=()):
+    items = []
+    for key in sorted(params.keys()):
+        if key in exclude:
+            continue
+        values = sorted(value.strip() for value in params.getlist(key) if value.strip())
+        if values:
+            items.append(f"{key}={','.join(values)}")
+    return hashlib.sha1("&".join(items).encode()).hexdigest()
+# =========================================================================================
+
+# =========================================================================================
+# Response cache of the public GET endpoints, shared by all the worker processes.
+# Only anonymous requests are cached (authenticated responses contain per user flags),
+# the key contains the absolute URL, the normalized query parameters and the versions of the
+# namespaces returned by get_response_cache_namespaces(), so a write bumping one of them
+# makes the entries unreachable at once; the timeout only bounds the lifetime of unused entries.
+# A list also depends on the rows it contains: get_response_row_namespaces() gives their namespaces
+# and the entry is only served while none of them was bumped since it was computed (the time of the last
+# bump of each namespace, see bump_cache_version), so a write on one row only invalidates the entries showing it.
+# The names of the reference tables (utils/reference.py) are rendered from the copy of the process, which may be
+# a few seconds old: the key also holds the versions of the copies of response_reference_models used to render it,
+# so a process that did not reload a renamed city yet never stores the old name where the others read.
+# The response data is cached, not the rendered content, so the renderer is still negotiated.
+# =========================================================================================
+class CachedResponseMixin:
+    response_cache_timeout = None
+    response_reference_models = ()
+
+    def get_response_cache_namespaces(self):
+        return []
+
+    # versions of the reference tables of this process the response is rendered with
+    def get_response_reference_versions(self):
+        from utils.reference import get_reference_table
+        return [get_reference_table(model).version for model in self.response_reference_models]
+
+    def get_response_row_namespaces(self, data):
+        return []
+
+    def get_response_cache_key(self, request):
+        if request.method != 'GET' or request.user.is_authenticated:
+            return None
+        namespaces = self.get_response_cache_namespaces()
+        if not namespaces:
+            return None
+        versions = get_cache_versions(namespaces)
+        stamps = [*(versions[namespace] for namespace in namespaces), *self.get_response_reference_versions()]
+        url = request.build_absolute_uri(request.path)
+        location = hashlib.sha1(f"{url}?{hash_query_params(request.query_params)}".encode()).hexdigest()
+        return f"response:{'.'.join(str(stamp) for stamp in stamps)}:{location}"
+
+    def get_response_cache_timeout(self):
+        if self.response_cache_timeout is not None:
+            return self.response_cache_timeout
+        return getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 60 * 10)
+
+    # a row bumped after the entry was computed, or whose bump time was evicted, makes it stale
+    def rows_unchanged(self, rows, computed_at):
+        if not rows:
+            return True
+        keys = [f"modified:{namespace}" for namespace in rows]
+        times = cache.get_many(keys)
+        return len(times) == len(keys) and max(times.values()) < computed_at
+
+    def get(self, request, *args, **kwargs):
+        key = self.get_response_cache_key(request)
+        if key is None:
+            return super().get(request, *args, **kwargs)
+        entry = cache.get(key)
+        if entry is not None and self.rows_unchanged(entry['rows'], entry['computed_at']):
+            return Response(entry['data'])
+        # taken before the queries: a write committed while the response is built is bumped after this time
+        computed_at = time.time()
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            rows = self.get_response_row_namespaces(response.data)
+            # the rows never bumped start at this time, they were read unchanged
+            for namespace in rows:
+                cache.add(f"modified:{namespace}", computed_at, timeout=None)
+            cache.set(key, {'data': response.data, 'rows': rows, 'computed_at': computed_at}, self.get_response_cache_timeout())
+        return response
+# =========================================================================================
+
+# =========================================================================================
+# Conditional GET: strong ETag and Last-Modified computed from cheap validators
+# (updated_at columns, counters, version stamps) before the view runs its queries and serializers.
+# A request whose If-None-Match / If-Modified-Since still matches is answered 304 right after
+# the authentication and permission checks, the other responses get both headers.
+# The ETag also covers the URL, the query parameters and the rendered format,
+# and the user when the response contains per user data (vary_on_user).
+# =========================================================================================
+class NotModified(Exception):
+    def __init__(self, response):
+        self.response = response
+
+
+class ConditionalGetMixin:
+    conditional_vary_on_user = False
+
+    # [values the response depends on], last modification datetime or None; None skips the conditional GET
+    def get_conditional_validators(self, request):
+        return None
+
+    def get_etag(self, request, values):
+        parts = [request.build_absolute_uri(request.path), hash_query_params(request.query_params), request.accepted_renderer.format]
+        if self.conditional_vary_on_user:
+            parts.append(str(request.user.pk) if request.user.is_authenticated else 'anonymous')
+        parts.extend(str(value) for value in values)
+        return quote_etag(hashlib.sha1("|".join(parts).encode()).hexdigest())
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.etag = self.last_modified = None
+        if request.method not in ('GET', 'HEAD'):
+            return
+        validators = self.get_conditional_validators(request)
+        if validators is None:
+            return
+        values, last_modified = validators
+        self.etag = self.get_etag(request, values)
+        self.last_modified = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request, etag=self.etag, last_modified=self.last_modified)
+        if response is not None:
+            raise NotModified(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if response.status_code in (200, 304) and getattr(self, 'etag', None):
+            response['ETag'] = self.etag
+            if self.last_modified:
+                response['Last-Modified'] = http_date(self.last_modified)
+            if self.conditional_vary_on_user:
+                patch_vary_headers(response, ('Authorization',))
+        return response
+# =========================================================================================
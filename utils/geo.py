@@ -0,0 +1,119 @@
+import math
+
+
+# ==================================================================================
+# Geohash helpers used by the geographic filters of the properties (no PostGIS needed).
+# A geohash is a string where every character splits the cell of the previous one in 32,
+# so all the points of a cell share the same prefix and a radius / bounding box search
+# becomes a few prefix range lookups on a plain B-tree index.
+# ==================================================================================
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 12
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+# ==================================================================================
+
+
+
+# ==================================================================================
+# geohash of a point: encode_geohash(33.5731, -7.5898) => "evfx4..."
+# ==================================================================================
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    geohash, bits, value, even = [], 0, 0, True
+    while len(geohash) < precision:
+        interval, coordinate = (lng_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            geohash.append(GEOHASH_ALPHABET[value])
+            bits, value = 0, 0
+    return ''.join(geohash)
+# ==================================================================================
+
+# ==================================================================================
+# size in degrees (latitude, longitude) of the cells of a precision
+# ==================================================================================
+def geohash_cell_size(precision):
+    bits = precision * 5
+    lng_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+# ==================================================================================
+
+# ==================================================================================
+# geohash prefixes covering a bounding box, the longest precision giving at most max_cells cells
+# ==================================================================================
+def geohash_cells(min_lat, min_lng, max_lat, max_lng, max_cells=16):
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = geohash_cell_size(precision)
+        rows = math.floor(max_lat / height) - math.floor(min_lat / height) + 1
+        columns = math.floor(max_lng / width) - math.floor(min_lng / width) + 1
+        if rows * columns <= max_cells:
+            break
+
+    cells = set()
+    start_lat = (math.floor(min_lat / height) + 0.5) * height
+    start_lng = (math.floor(min_lng / width) + 0.5) * width
+    for row in range(rows):
+        for column in range(columns):
+            latitude = min(max(start_lat + row * height, -90.0), 90.0)
+            longitude = min(max(start_lng + column * width, -180.0), 180.0)
+            cells.add(encode_geohash(latitude, longitude, precision))
+    return sorted(cells)
+# ==================================================================================
+
+# ==================================================================================
+# (lower, upper) bounds of the geohashes starting with a prefix: lower <= geohash < upper,
+# upper is None for the last cell. A range uses the B-tree index on every database,
+# unlike LIKE 'prefix%' which depends on the collation / LIKE settings of the database.
+# ==================================================================================
+def geohash_range(prefix):
+    for index in range(len(prefix) - 1, -1, -1):
+        position = GEOHASH_ALPHABET.index(prefix[index])
+        if position + 1 < len(GEOHASH_ALPHABET):
+            return prefix, prefix[:index] + GEOHASH_ALPHABET[position + 1]
+    return prefix, None
+# ==================================================================================
+
+# ==================================================================================
+# bounding box (min_lat, min_lng, max_lat, max_lng) containing a circle
+# ==================================================================================
+def bounding_box(latitude, longitude, radius_km):
+    delta_lat = radius_km / KM_PER_DEGREE
+    delta_lng = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01))
+    return (
+        max(latitude - delta_lat, -90.0), max(longitude - delta_lng, -180.0),
+        min(latitude + delta_lat, 90.0), min(longitude + delta_lng, 180.0),
+    )
+# ==================================================================================
+
+# ==================================================================================
+# "lat,lng" => (lat, lng) and "min_lat,min_lng,max_lat,max_lng" => tuple, None when invalid
+# ==================================================================================
+def parse_point(value):
+    try:
+        latitude, longitude = (float(part) for part in value.split(','))
+    except (AttributeError, ValueError):
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    return latitude, longitude
+
+
+def parse_bbox(value):
+    try:
+        min_lat, min_lng, max_lat, max_lng = (float(part) for part in value.split(','))
+    except (AttributeError, ValueError):
+        return None
+    if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lng <= max_lng <= 180):
+        return None
+    return min_lat, min_lng, max_lat, max_lng
+# ==================================================================================
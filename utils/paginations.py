@@ -1,30 +1,255 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import date, datetime
+from decimal import Decimal
+from functools import partial
+from uuid import UUID
 
-from rest_framework.pagination import PageNumberPagination
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from utils.cache import get_cache_versions, hash_query_params
 
 
 
 # ==================================================================================
-# Custom pagination users 
+# Custom pagination users
 # ==================================================================================
 class CustomDynamicPagination(PageNumberPagination):
     # number items in each page
-    page_size = 10  
-    # option url change page size pagination /api/accounts/ad/users/?page_size=10 
-    page_size_query_param = 'page_size' 
+    page_size = 10
+    # option url change page size pagination /api/accounts/ad/users/?page_size=10
+    page_size_query_param = 'page_size'
     # max page size can user custom  => /api/accounts/ad/users/?page_size=100 => stop
-    max_page_size = 100  
-    
+    max_page_size = 100
+    # option url switch to cursor (keyset) pagination /api/properties/?pagination=cursor
+    mode_query_param = 'pagination'
+
+    # parameters that do not change the number of results
+    count_cache_exclude = ('page', 'page_size', 'ordering', 'pagination', 'cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self.wants_cursor(request):
+            self.cursor_paginator = KeysetCursorPagination(self.page_size, self.max_page_size)
+            return self.cursor_paginator.paginate_queryset(queryset, request, view)
+
+        # views declaring count_cache_namespace (one namespace or a tuple of them) get their COUNT cached per filters
+        # (see CachedCountPaginator)
+        namespace = getattr(view, 'count_cache_namespace', None)
+        if namespace:
+            self.django_paginator_class = partial(CachedCountPaginator, cache_key=self.get_count_cache_key(request, namespace))
+        return super().paginate_queryset(queryset, request, view)
+
+    # the key contains the versions of the namespaces, bumped by the signals whenever their rows are written
+    def get_count_cache_key(self, request, namespace):
+        namespaces = [namespace] if isinstance(namespace, str) else list(namespace)
+        versions = get_cache_versions(namespaces)
+        version = '.'.join(str(versions[name]) for name in namespaces)
+        filters_hash = hash_query_params(request.query_params, exclude=self.count_cache_exclude)
+        user_id = request.user.pk if request.user.is_authenticated else 'anonymous'
+        return f"count:{':'.join(namespaces)}:{version}:{request.path}:{user_id}:{filters_hash}"
+
+    def wants_cursor(self, request):
+        params = request.query_params
+        return params.get(self.mode_query_param) == 'cursor' or KeysetCursorPagination.cursor_query_param in params
+
     def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
         return Response({
             'pagination': {
                 'next': self.get_next_link(),                   # url next page
                 'previous': self.get_previous_link(),           # url previous page
-                'count': self.page.paginator.count,             # count all items in databse 
+                'count': self.page.paginator.count,             # count all items in databse
                 'total_pages': self.page.paginator.num_pages,   # count pages paginations
-                'current_page': self.page.number,               # number this page 
-                'page_size': self.page.paginator.per_page,      # count items in this page 
+                'current_page': self.page.number,               # number this page
+                'page_size': self.page.paginator.per_page,      # count items in this page
+                'count_estimated': getattr(self.page.paginator, 'count_estimated', False),  # count is an estimate
+            },
+            'results': data
+        })
+# ==================================================================================
+
+
+
+# ==================================================================================
+# Paginator whose total count is cached for PAGINATION_COUNT_CACHE_TIMEOUT seconds.
+# The count is first computed with a LIMIT of PAGINATION_COUNT_ESTIMATE_THRESHOLD + 1 rows,
+# above the threshold the planner estimate of the database is used when it is available (PostgreSQL),
+# so a large filtered listing never pays for an exact COUNT over all its joins.
+# ==================================================================================
+class CachedCountPaginator(DjangoPaginator):
+    def __init__(self, object_list, per_page, cache_key=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.cache_key = cache_key
+        self.count_estimated = False
+
+    @cached_property
+    def count(self):
+        cached = cache.get(self.cache_key)
+        if cached is not None:
+            self.count_estimated = cached['estimated']
+            return cached['count']
+
+        threshold = getattr(settings, 'PAGINATION_COUNT_ESTIMATE_THRESHOLD', 10000)
+        total = self.object_list.order_by()[:threshold + 1].count()
+        if total > threshold:
+            estimate = estimate_count(self.object_list)
+            if estimate is not None:
+                total = max(estimate, threshold + 1)
+                self.count_estimated = True
+            else:
+                total = self.object_list.count()
+
+        timeout = getattr(settings, 'PAGINATION_COUNT_CACHE_TIMEOUT', 60 * 5)
+        cache.set(self.cache_key, {'count': total, 'estimated': self.count_estimated}, timeout)
+        return total
+# ==================================================================================
+
+# ==================================================================================
+# Number of rows of a queryset according to the query planner, None if the database has no estimate
+# ==================================================================================
+def estimate_count(queryset):
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+# ==================================================================================
+
+
+
+# ==================================================================================
+# Keyset (cursor) pagination used by CustomDynamicPagination with ?pagination=cursor
+# The cursor stores the value of the ordering field and the id of the last row of the page,
+# the next page is read with WHERE (field, id) < (value, id) ORDER BY field, id LIMIT n
+# so every page costs the same whatever its depth, and no COUNT(*) is executed.
+# The ordering field is the one applied by OrderingFilter (price, area, created_at ...)
+# or the default ordering of the model, the id breaks the ties.
+# ==================================================================================
+class KeysetCursorPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    default_ordering = '-created_at'
+
+    def __init__(self, page_size=10, max_page_size=100):
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = remove_query_param(request.build_absolute_uri(), 'page')
+        self.limit = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+
+        name = self.ordering.lstrip('-')
+        cursor = self.decode_cursor(request, queryset, name)
+        backwards = cursor is not None and cursor['direction'] == 'previous'
+        # walking to the previous page reads the rows in the opposite direction
+        descending = self.ordering.startswith('-') != backwards
+
+        queryset = queryset.order_by(f'-{name}', '-pk') if descending else queryset.order_by(name, 'pk')
+        if cursor is not None:
+            lookup = 'lt' if descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{name}__{lookup}': cursor['value']}) |
+                Q(**{name: cursor['value'], f'pk__{lookup}': cursor['pk']})
+            )
+
+        rows = list(queryset[:self.limit + 1])
+        has_more = len(rows) > self.limit
+        rows = rows[:self.limit]
+        if backwards:
+            rows.reverse()
+
+        self.has_next = True if backwards else has_more
+        self.has_previous = has_more if backwards else cursor is not None
+        self.first_row = rows[0] if rows else None
+        self.last_row = rows[-1] if rows else None
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'pagination': {
+                'next': self.get_next_link(),           # url next page
+                'previous': self.get_previous_link(),   # url previous page
+                'page_size': self.limit,                # count items in this page
             },
             'results': data
         })
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(size, self.max_page_size) if size > 0 else self.page_size
+
+    # first term of the current ordering when it is a plain field or annotation of the queryset
+    def get_ordering(self, queryset):
+        ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+        if ordering and isinstance(ordering[0], str):
+            name = ordering[0].lstrip('-')
+            if '__' not in name and name != '?':
+                return ordering[0]
+        return self.default_ordering
+
+    def get_next_link(self):
+        if not self.has_next or self.last_row is None:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(self.last_row, 'next'))
+
+    def get_previous_link(self):
+        if not self.has_previous or self.first_row is None:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(self.first_row, 'previous'))
+
+    def encode_cursor(self, row, direction):
+        value = getattr(row, self.ordering.lstrip('-'))
+        if isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        elif isinstance(value, (Decimal, UUID)):
+            value = str(value)
+        payload = json.dumps({'value': value, 'pk': str(row.pk), 'direction': direction})
+        return urlsafe_b64encode(payload.encode()).decode()
+
+    # the cursor is sent by the client: its value and id are converted with the fields of the ordering,
+    # a forged cursor is a 404 instead of an error of the query
+    def decode_cursor(self, request, queryset, name):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode()).decode())
+            if cursor['direction'] not in ('next', 'previous'):
+                raise ValueError
+            cursor['value'] = self.get_ordering_field(queryset, name).to_python(cursor['value'])
+            cursor['pk'] = queryset.model._meta.pk.to_python(cursor['pk'])
+            if cursor['value'] is None or cursor['pk'] is None:
+                raise ValueError
+            return cursor
+        except (TypeError, ValueError, KeyError, AttributeError, ValidationError, FieldDoesNotExist):
+            raise NotFound('Invalid cursor')
+
+    def get_ordering_field(self, queryset, name):
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        if name == 'pk':
+            return queryset.model._meta.pk
+        return queryset.model._meta.get_field(name)
 # ==================================================================================
@@ -0,0 +1,116 @@
+import time
+from django.conf import settings
+from django.db import transaction
+from rest_framework import serializers
+from utils.cache import bump_cache_version, get_cache_version
+
+
+# =========================================================================================
+# Process-local copy of the small read-mostly tables (cities, price types, categories).
+# Each table is loaded whole on first use and kept in the memory of the worker process with the
+# version it was loaded at. The version lives in the shared cache, so a write in any process
+# (post_save / post_delete, see the signals of each app) makes every process reload the table.
+# The version is checked at most every REFERENCE_CACHE_CHECK_SECONDS, a process may serve
+# a renamed city for that long; the process that wrote it reloads right away.
+# The instances are shared between the threads of the process: they must never be modified.
+# =========================================================================================
+_tables = {}
+
+
+def reference_namespace(model):
+    return f"reference:{model._meta.label_lower}"
+
+
+class ReferenceTable:
+    def __init__(self, version, rows):
+        self.version = version
+        self.rows = rows
+        self.by_pk = {row.pk: row for row in rows}
+        self.checked_at = time.monotonic()
+# =========================================================================================
+
+# =========================================================================================
+# the current table of a model, reloaded (one query) when its version changed
+# =========================================================================================
+def get_reference_table(model):
+    label = model._meta.label_lower
+    table = _tables.get(label)
+    interval = getattr(settings, 'REFERENCE_CACHE_CHECK_SECONDS', 5)
+    if table is not None and time.monotonic() - table.checked_at < interval:
+        return table
+
+    # the version is read before the rows: a write in between reloads the table at the next check
+    version = get_cache_version(reference_namespace(model))
+    if table is not None and table.version == version:
+        table.checked_at = time.monotonic()
+        return table
+    table = ReferenceTable(version, list(model.objects.all()))
+    _tables[label] = table
+    return table
+# =========================================================================================
+
+# =========================================================================================
+# rows of a table in the ordering of the model, optionally filtered on field values
+#   get_references(City, status=True)
+# =========================================================================================
+def get_references(model, **filters):
+    rows = get_reference_table(model).rows
+    if filters:
+        rows = [row for row in rows if all(getattr(row, field) == value for field, value in filters.items())]
+    return rows
+# =========================================================================================
+
+# =========================================================================================
+# one row by primary key, a row created since the last check is read from the database
+# =========================================================================================
+def get_reference(model, pk):
+    if pk is None:
+        return None
+    row = get_reference_table(model).by_pk.get(pk)
+    if row is None:
+        row = model.objects.filter(pk=pk).first()
+    return row
+# =========================================================================================
+
+# =========================================================================================
+# called by the signals once the write is committed: every process reloads the table
+# =========================================================================================
+def invalidate_references(model):
+    def invalidate():
+        bump_cache_version(reference_namespace(model))
+        _tables.pop(model._meta.label_lower, None)
+    transaction.on_commit(invalidate)
+# =========================================================================================
+
+
+# =========================================================================================
+# Read-only serializer field of a foreign key to a reference table: the row is taken from the
+# process-local cache by the <field>_id column, the foreign key is never joined nor fetched.
+# Rendered with str() (like StringRelatedField) or with the given serializer.
+#   city = ReferenceField(City)
+#   category_type = ReferenceField(CategoryType, serializer=CateforyTypeSerializer)
+# =========================================================================================
+class ReferenceField(serializers.Field):
+    def __init__(self, model, serializer=None, **kwargs):
+        self.model = model
+        # built once, not for every row
+        self.serializer = serializer(read_only=True) if serializer is not None else None
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def bind(self, field_name, parent):
+        super().bind(field_name, parent)
+        if self.serializer is not None:
+            self.serializer.bind(field_name, parent)
+
+    def get_attribute(self, instance):
+        return getattr(instance, f"{self.source}_id")
+
+    def to_representation(self, pk):
+        row = get_reference(self.model, pk)
+        if row is None:
+            return None
+        if self.serializer is None:
+            return str(row)
+        return self.serializer.to_representation(row)
+# =========================================================================================
@@ -1,6 +1,7 @@
 # ==========================================================================================
 #  imports
 # ==========================================================================================
+import copy
 import re
 import os
 from django.core.exceptions import ValidationError
@@ -43,7 +44,8 @@ class DynamicValidator:
     # ==========================================================================================
     def validate(self, data, rules_config, is_update=False):
         errors = {}
-        cleaned_data = data.copy()
+        # shallow copy: QueryDict.copy() deep copies the uploaded files (fails on temporary files)
+        cleaned_data = copy.copy(data)
         
         # Clean all data (HTML sanitization)
         for field_name, rules in rules_config.items():
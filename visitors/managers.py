@@ -21,9 +21,7 @@ class VisitorManager(models.Manager):
         # =====================================================================
         # get or create visitor hash key if not exists in request
         # =====================================================================
-        visitor_key = request.COOKIES.get('visitor_hash')
-        if not visitor_key:
-            visitor_key = self.create_visitor_hash(ip_address, browser_agent, clean_referrer)
+        visitor_key = self.get_visitor_key(request)
 
         # =====================================================================
         # get or create new vistor if not exists in databse with some key
@@ -83,6 +81,17 @@ class VisitorManager(models.Manager):
         }
 
 
+    # =========================================================================
+    # visitor hash key of a request: the cookie, or the hash of its ip, agent and referrer
+    # (also used by the property view tracking, without touching the database)
+    # =========================================================================
+    def get_visitor_key(self, request):
+        visitor_key = request.COOKIES.get('visitor_hash')
+        if not visitor_key:
+            referrer = self.clean_referrer(request.META.get('HTTP_REFERER', ''))
+            visitor_key = self.create_visitor_hash(self.get_client_ip(request), request.META.get('HTTP_USER_AGENT', ''), referrer)
+        return visitor_key
+
     # =========================================================================
     # Create visitor hash key
     # =========================================================================
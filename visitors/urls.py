@@ -1,11 +1,13 @@
 from django.urls import path
-from .views import TrackVisitAPIView, VisitorListVisitors, VisitorDeleteVisitor, VisitorDetailVisitor
+from .views import TrackVisitAPIView, VisitorListVisitors, VisitorExportVisitors, VisitorDeleteVisitor, VisitorDetailVisitor
 
 urlpatterns = [
     # track and get data visitor and visit
     path('visitors/track/', TrackVisitAPIView.as_view(), name='visitor-track'),
     # get all lis visitors with visitis: admin  
     path('ad/visitors/', VisitorListVisitors.as_view(), name='visitor_list'),
+    # export all visitors as CSV / NDJSON: admin
+    path('ad/visitors/export/', VisitorExportVisitors.as_view(), name='visitor_export'),
     # get visitor item data with visits: admin
     path('ad/visitors/<uuid:pk>/', VisitorDetailVisitor.as_view(), name='view_visitor'),
     # delete visitor item with visits : admin 
@@ -5,6 +5,8 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework import status, generics
+from django.db.models import Count
+from utils.exports import ExportMixin
 
 from visitors.permissions import CanDeleteVisitor, CanViewListVisitor, CanViewVisitor
 from .models import Visitor
@@ -58,6 +60,27 @@ class VisitorListVisitors(generics.ListAPIView):
 # 
 # 
 # ===========================================================================================
+# Export all visitors as CSV or NDJSON (?output=csv|ndjson)
+# - Same permissions and ordering (?ordering=) as the list.
+# - One row per visitor with the number of its visits, streamed in chunks:
+#   the visits are counted in the query, never loaded.
+# ===========================================================================================
+class VisitorExportVisitors(ExportMixin, VisitorListVisitors):
+    export_filename = 'visitors'
+    export_columns = [
+        ('id', 'id'), ('key', 'key'), ('ip_address', 'ip_address'), ('device_type', 'device_type'),
+        ('browser', 'browser'), ('browser_agent', 'browser_agent'), ('country', 'country'),
+        ('first_visit', 'first_visit'), ('last_visit', 'last_visit'), ('visits', 'visits_count'),
+    ]
+    ordering_fields = ['first_visit', 'last_visit', 'country', 'browser', 'visits_count']
+
+    def get_queryset(self):
+        return Visitor.objects.annotate(visits_count=Count('visits')).order_by('-first_visit')
+# ===========================================================================================
+# 
+# 
+# 
+# ===========================================================================================
 # Fetch data for a specific visitor
 # - Displays information for a single visitor based on the identifier (id).
 # - Protected by administrative privileges and the CanViewVisitor custom view permission.